@@ -0,0 +1,57 @@
+"""Track embedded content hashes and maintain updated_at
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EMBEDDED_TABLES = ('architectural_features', 'historical_events')
+TIMESTAMPED_TABLES = ('locations', 'architectural_features', 'historical_events', 'relationships')
+
+UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.update_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+UPDATED_AT_TRIGGER = """
+CREATE OR REPLACE TRIGGER update_{table}_updated_at
+    BEFORE UPDATE ON geolens.{table}
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.update_updated_at()
+"""
+
+def upgrade() -> None:
+    # Hash of the text each embedding was computed from, used to find stale vectors
+    for table in EMBEDDED_TABLES:
+        op.add_column(
+            table,
+            sa.Column('content_hash', sa.String(64), nullable=True),
+            schema='geolens'
+        )
+
+    # Keep updated_at current for every UPDATE, including raw SQL ones
+    op.execute(UPDATED_AT_FUNCTION)
+    for table in TIMESTAMPED_TABLES:
+        op.execute(UPDATED_AT_TRIGGER.format(table=table))
+
+def downgrade() -> None:
+    for table in TIMESTAMPED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS update_{table}_updated_at ON geolens.{table}")
+    op.execute("DROP FUNCTION IF EXISTS geolens.update_updated_at()")
+
+    for table in EMBEDDED_TABLES:
+        op.drop_column(table, 'content_hash', schema='geolens')
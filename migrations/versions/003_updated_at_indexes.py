@@ -0,0 +1,28 @@
+"""Index updated_at for incremental snapshot refreshes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('architectural_features', 'historical_events')
+
+def upgrade() -> None:
+    # Keyset scans over (updated_at, id) find rows changed since a watermark
+    for table in TABLES:
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_updated_at
+            ON geolens.{table} (updated_at, id)
+        """)
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS geolens.idx_{table}_updated_at")
@@ -0,0 +1,23 @@
+"""Index locations.updated_at for incremental spatial index refreshes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_locations_updated_at
+        ON geolens.locations (updated_at, id)
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS geolens.idx_locations_updated_at")
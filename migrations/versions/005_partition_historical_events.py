@@ -0,0 +1,149 @@
+"""Range-partition historical_events by event_date
+
+Creates the partitioned table as a shadow of historical_events and mirrors
+writes into it. Existing rows are copied and the tables swapped online by
+`geolens partitions migrate`. event_date becomes NOT NULL, as it is part of
+the new primary key.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes of the partitioned table, by name on the shadow table
+PARTITIONED_INDEXES = {
+    "idx_historical_events_partitioned_embedding": "USING ivfflat (embedding vector_cosine_ops)",
+    "idx_historical_events_partitioned_date": "(event_date)",
+    "idx_historical_events_partitioned_location": "(location_id, event_date)",
+    "idx_historical_events_partitioned_updated_at": "(updated_at, id)",
+}
+
+CREATE_RANGE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.create_range_partition(
+    parent regclass,
+    partition_name text,
+    key_column text,
+    range_start date,
+    range_end date
+) RETURNS boolean AS $$
+DECLARE
+    default_partition regclass;
+    column_list text;
+BEGIN
+    IF to_regclass(format('geolens.%I', partition_name)) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    SELECT c.oid INTO default_partition
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent
+    AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+
+    EXECUTE format(
+        'CREATE TABLE geolens.%I (LIKE %s INCLUDING DEFAULTS INCLUDING GENERATED)',
+        partition_name, parent
+    );
+
+    IF default_partition IS NOT NULL THEN
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO column_list
+        FROM pg_attribute
+        WHERE attrelid = parent AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING %s) '
+            'INSERT INTO geolens.%I (%s) SELECT %s FROM moved',
+            default_partition, key_column, range_start, key_column, range_end,
+            column_list, partition_name, column_list, column_list
+        );
+    END IF;
+
+    EXECUTE format(
+        'ALTER TABLE %s ATTACH PARTITION geolens.%I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, range_start, range_end
+    );
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+MIRROR_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.mirror_historical_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM geolens.historical_events_partitioned WHERE id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO geolens.historical_events_partitioned SELECT (NEW).*;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+MIRROR_TRIGGER = """
+CREATE OR REPLACE TRIGGER mirror_historical_events
+    AFTER INSERT OR UPDATE OR DELETE ON geolens.historical_events
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.mirror_historical_events()
+"""
+
+def upgrade() -> None:
+    # event_date joins the primary key of the partitioned table. Undated rows
+    # could be neither copied nor mirrored, so reject them up front and let
+    # the live table refuse new ones (a no-op where 001 already did)
+    undated = op.get_bind().execute(
+        text("SELECT count(*) FROM geolens.historical_events WHERE event_date IS NULL")
+    ).scalar()
+    if undated:
+        raise RuntimeError(
+            f"{undated} historical_events rows have no event_date; "
+            "set or delete them before partitioning"
+        )
+    op.execute("ALTER TABLE geolens.historical_events ALTER COLUMN event_date SET NOT NULL")
+
+    op.execute(CREATE_RANGE_PARTITION_FUNCTION)
+
+    # The primary key must include the partition key
+    op.execute("""
+        CREATE TABLE geolens.historical_events_partitioned (
+            LIKE geolens.historical_events INCLUDING DEFAULTS INCLUDING GENERATED,
+            PRIMARY KEY (id, event_date),
+            FOREIGN KEY (location_id) REFERENCES geolens.locations (id)
+        ) PARTITION BY RANGE (event_date)
+    """)
+    op.execute("""
+        CREATE TABLE geolens.historical_events_partitioned_default
+        PARTITION OF geolens.historical_events_partitioned DEFAULT
+    """)
+
+    # Created on the parent, so every partition gets its own copy
+    for name, definition in PARTITIONED_INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON geolens.historical_events_partitioned {definition}")
+
+    op.execute(MIRROR_FUNCTION)
+    op.execute(MIRROR_TRIGGER)
+
+def downgrade() -> None:
+    swapped = op.get_bind().execute(
+        text("SELECT to_regclass('geolens.historical_events_unpartitioned')")
+    ).scalar()
+    if swapped is not None:
+        raise RuntimeError(
+            "historical_events has already been swapped for the partitioned table; "
+            "swap geolens.historical_events_unpartitioned back before downgrading"
+        )
+    op.execute("DROP TRIGGER IF EXISTS mirror_historical_events ON geolens.historical_events")
+    op.execute("DROP FUNCTION IF EXISTS geolens.mirror_historical_events()")
+    op.execute("DROP TABLE IF EXISTS geolens.historical_events_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS geolens.create_range_partition(regclass, text, text, date, date)")
@@ -0,0 +1,227 @@
+"""Store influence paths and index edges by strength for pruned traversal
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.refresh_influence_closure(changed integer[])
+RETURNS integer AS $$
+DECLARE
+    closure_depth integer;
+    affected integer[];
+    refreshed integer;
+BEGIN
+    IF cardinality(changed) = 0 THEN
+        RETURN 0;
+    END IF;
+    -- Serialise maintenance so each refresh sees the previous one's result
+    PERFORM pg_advisory_xact_lock(hashtext('geolens.influence_closure'));
+    SELECT max_depth INTO closure_depth FROM geolens.influence_closure_settings;
+
+    -- Sources reaching a changed edge's origin, before (closure) or after (graph)
+    WITH RECURSIVE upstream AS (
+        SELECT DISTINCT unnest(changed) AS location_id, 0 AS depth
+        UNION
+        SELECT r.from_location_id, u.depth + 1
+        FROM upstream u
+        JOIN geolens.relationships r
+            ON r.to_location_id = u.location_id
+            AND r.relationship_type = 'influences'
+        WHERE u.depth < closure_depth - 1
+    )
+    SELECT array_agg(DISTINCT location_id) INTO affected
+    FROM (
+        SELECT location_id FROM upstream
+        UNION
+        SELECT c.source_location_id
+        FROM geolens.influence_closure c
+        WHERE c.target_location_id = ANY(changed)
+        AND c.depth < closure_depth
+    ) sources;
+
+    DELETE FROM geolens.influence_closure
+    WHERE source_location_id = ANY(affected);
+
+    INSERT INTO geolens.influence_closure (
+        source_location_id, target_location_id, depth, strength, via_location_id, path, path_count
+    )
+    WITH RECURSIVE chain AS (
+        SELECT
+            from_location_id AS source_location_id,
+            from_location_id,
+            to_location_id,
+            ARRAY[from_location_id] AS path,
+            1 AS depth,
+            strength
+        FROM geolens.relationships
+        WHERE from_location_id = ANY(affected)
+        AND relationship_type = 'influences'
+
+        UNION ALL
+
+        SELECT
+            c.source_location_id,
+            r.from_location_id,
+            r.to_location_id,
+            c.path || r.from_location_id,
+            c.depth + 1,
+            c.strength * r.strength
+        FROM geolens.relationships r
+        JOIN chain c ON r.from_location_id = c.to_location_id
+        WHERE r.relationship_type = 'influences'
+        AND c.depth < closure_depth
+        AND NOT r.from_location_id = ANY(c.path)
+    )
+    SELECT DISTINCT ON (source_location_id, depth, to_location_id)
+        source_location_id,
+        to_location_id,
+        depth,
+        strength,
+        from_location_id,
+        path || to_location_id,
+        count(*) OVER (PARTITION BY source_location_id, depth, to_location_id)
+    FROM chain
+    ORDER BY source_location_id, depth, to_location_id, strength DESC NULLS LAST, from_location_id;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+DELETE_ORPHANS = """
+DELETE FROM geolens.influence_closure c
+WHERE NOT EXISTS (
+    SELECT 1 FROM geolens.relationships r
+    WHERE r.from_location_id = c.source_location_id
+    AND r.relationship_type = 'influences'
+)
+"""
+
+REBUILD = """
+SELECT geolens.refresh_influence_closure(ARRAY(
+    SELECT DISTINCT from_location_id
+    FROM geolens.relationships
+    WHERE relationship_type = 'influences'
+))
+"""
+
+# The refresh function of revision 006, which does not fill path
+PREVIOUS_REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.refresh_influence_closure(changed integer[])
+RETURNS integer AS $$
+DECLARE
+    closure_depth integer;
+    affected integer[];
+    refreshed integer;
+BEGIN
+    IF cardinality(changed) = 0 THEN
+        RETURN 0;
+    END IF;
+    -- Serialise maintenance so each refresh sees the previous one's result
+    PERFORM pg_advisory_xact_lock(hashtext('geolens.influence_closure'));
+    SELECT max_depth INTO closure_depth FROM geolens.influence_closure_settings;
+
+    -- Sources reaching a changed edge's origin, before (closure) or after (graph)
+    WITH RECURSIVE upstream AS (
+        SELECT DISTINCT unnest(changed) AS location_id, 0 AS depth
+        UNION
+        SELECT r.from_location_id, u.depth + 1
+        FROM upstream u
+        JOIN geolens.relationships r
+            ON r.to_location_id = u.location_id
+            AND r.relationship_type = 'influences'
+        WHERE u.depth < closure_depth - 1
+    )
+    SELECT array_agg(DISTINCT location_id) INTO affected
+    FROM (
+        SELECT location_id FROM upstream
+        UNION
+        SELECT c.source_location_id
+        FROM geolens.influence_closure c
+        WHERE c.target_location_id = ANY(changed)
+        AND c.depth < closure_depth
+    ) sources;
+
+    DELETE FROM geolens.influence_closure
+    WHERE source_location_id = ANY(affected);
+
+    INSERT INTO geolens.influence_closure (
+        source_location_id, target_location_id, depth, strength, via_location_id, path_count
+    )
+    WITH RECURSIVE chain AS (
+        SELECT
+            from_location_id AS source_location_id,
+            from_location_id,
+            to_location_id,
+            ARRAY[from_location_id] AS path,
+            1 AS depth,
+            strength
+        FROM geolens.relationships
+        WHERE from_location_id = ANY(affected)
+        AND relationship_type = 'influences'
+
+        UNION ALL
+
+        SELECT
+            c.source_location_id,
+            r.from_location_id,
+            r.to_location_id,
+            c.path || r.from_location_id,
+            c.depth + 1,
+            c.strength * r.strength
+        FROM geolens.relationships r
+        JOIN chain c ON r.from_location_id = c.to_location_id
+        WHERE r.relationship_type = 'influences'
+        AND c.depth < closure_depth
+        AND NOT r.from_location_id = ANY(c.path)
+    )
+    SELECT DISTINCT ON (source_location_id, depth, to_location_id)
+        source_location_id,
+        to_location_id,
+        depth,
+        strength,
+        from_location_id,
+        count(*) OVER (PARTITION BY source_location_id, depth, to_location_id)
+    FROM chain
+    ORDER BY source_location_id, depth, to_location_id, strength DESC NULLS LAST, from_location_id;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_relationships_from_type_strength
+        ON geolens.relationships (from_location_id, relationship_type, strength DESC NULLS LAST)
+    """)
+    # Covered by the index above
+    op.execute("DROP INDEX IF EXISTS geolens.idx_relationships_from_type")
+
+    op.execute("ALTER TABLE geolens.influence_closure ADD COLUMN path integer[]")
+    op.execute(REFRESH_FUNCTION)
+    op.execute(DELETE_ORPHANS)
+    op.execute(REBUILD)
+    op.execute("ALTER TABLE geolens.influence_closure ALTER COLUMN path SET NOT NULL")
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_relationships_from_type
+        ON geolens.relationships (from_location_id, relationship_type)
+    """)
+    op.execute("DROP INDEX IF EXISTS geolens.idx_relationships_from_type_strength")
+
+    op.execute(PREVIOUS_REFRESH_FUNCTION)
+    op.execute("ALTER TABLE geolens.influence_closure DROP COLUMN path")
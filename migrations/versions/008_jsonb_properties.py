@@ -0,0 +1,61 @@
+"""Convert properties columns to JSONB with GIN indexes
+
+Migration 001 created the `properties` columns as JSON although the models
+declare JSONB. Converting rewrites each table under an exclusive lock.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["locations", "architectural_features", "historical_events", "relationships"]
+
+# The partitioned copy of historical_events before and the original after the swap
+SHADOW_TABLE = "historical_events_partitioned"
+LEGACY_TABLE = "historical_events_unpartitioned"
+
+def _existing(tables):
+    bind = op.get_bind()
+    return [
+        table for table in tables
+        if bind.execute(text("SELECT to_regclass(:table)"), {"table": f"geolens.{table}"}).scalar()
+    ]
+
+def upgrade() -> None:
+    # The partitioned copy of historical_events (before or after the swap) must
+    # keep the same column types, since the mirror trigger copies whole rows
+    for table in _existing(TABLES + [SHADOW_TABLE, LEGACY_TABLE]):
+        op.execute(f"""
+            ALTER TABLE geolens.{table}
+            ALTER COLUMN properties TYPE jsonb USING properties::jsonb
+        """)
+
+    for table in TABLES:
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_properties
+            ON geolens.{table} USING gin (properties jsonb_path_ops)
+        """)
+    if _existing([SHADOW_TABLE]):
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{SHADOW_TABLE}_properties
+            ON geolens.{SHADOW_TABLE} USING gin (properties jsonb_path_ops)
+        """)
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS geolens.idx_{SHADOW_TABLE}_properties")
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS geolens.idx_{table}_properties")
+    for table in _existing(TABLES + [SHADOW_TABLE, LEGACY_TABLE]):
+        op.execute(f"""
+            ALTER TABLE geolens.{table}
+            ALTER COLUMN properties TYPE json USING properties::json
+        """)
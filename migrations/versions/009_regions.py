@@ -0,0 +1,72 @@
+"""Add region and corridor features with subdivided parts
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPDATED_AT_TRIGGER = """
+CREATE OR REPLACE TRIGGER update_{table}_updated_at
+    BEFORE UPDATE ON geolens.{table}
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.update_updated_at()
+"""
+
+REGION_SUBDIVIDE_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.subdivide_region()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM geolens.region_parts WHERE region_id = NEW.id;
+    INSERT INTO geolens.region_parts (region_id, geometry)
+    SELECT NEW.id, part::geography
+    FROM ST_Subdivide(ST_Segmentize(NEW.geometry, 5000)::geometry, 256) AS part;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+REGION_SUBDIVIDE_TRIGGER = """
+CREATE OR REPLACE TRIGGER subdivide_region
+    AFTER INSERT OR UPDATE OF geometry ON geolens.regions
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.subdivide_region()
+"""
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE geolens.regions (
+            id serial PRIMARY KEY,
+            name varchar NOT NULL,
+            region_type varchar NOT NULL,
+            geometry geography(GEOMETRY, 4326) NOT NULL,
+            properties jsonb NOT NULL DEFAULT '{}',
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("""
+        CREATE TABLE geolens.region_parts (
+            id serial PRIMARY KEY,
+            region_id integer NOT NULL REFERENCES geolens.regions (id) ON DELETE CASCADE,
+            geometry geography(GEOMETRY, 4326) NOT NULL
+        )
+    """)
+    op.execute("CREATE INDEX idx_region_parts_region ON geolens.region_parts (region_id)")
+    op.execute("CREATE INDEX idx_region_parts_geometry ON geolens.region_parts USING gist (geometry)")
+
+    op.execute(UPDATED_AT_TRIGGER.format(table="regions"))
+    op.execute(REGION_SUBDIVIDE_FUNCTION)
+    op.execute(REGION_SUBDIVIDE_TRIGGER)
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS geolens.region_parts")
+    op.execute("DROP TABLE IF EXISTS geolens.regions")
+    op.execute("DROP FUNCTION IF EXISTS geolens.subdivide_region()")
@@ -0,0 +1,86 @@
+"""Add the change log and triggers feeding the change feed
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANGE_TABLES = ("locations", "architectural_features", "historical_events", "relationships")
+
+RECORD_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.record_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    recorded integer;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO geolens.change_log (table_name, operation, row_id)
+        SELECT TG_TABLE_NAME, TG_OP, id FROM old_rows;
+    ELSE
+        INSERT INTO geolens.change_log (table_name, operation, row_id)
+        SELECT TG_TABLE_NAME, TG_OP, id FROM new_rows;
+    END IF;
+    GET DIAGNOSTICS recorded = ROW_COUNT;
+    IF recorded > 0 THEN
+        PERFORM pg_notify('geolens_changes', TG_TABLE_NAME);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGER = """
+CREATE OR REPLACE TRIGGER record_{table}_{operation}
+    AFTER {event} ON geolens.{table}
+    REFERENCING {transition}
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION geolens.record_changes()
+"""
+
+TRANSITIONS = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "UPDATE": "NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+}
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE geolens.change_log (
+            id bigserial PRIMARY KEY,
+            txid bigint NOT NULL DEFAULT (pg_current_xact_id()::text::bigint),
+            table_name varchar NOT NULL,
+            operation varchar NOT NULL,
+            row_id integer NOT NULL,
+            changed_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX idx_change_log_position ON geolens.change_log (txid, id)")
+    op.execute("""
+        CREATE TABLE geolens.change_feed_consumers (
+            name varchar PRIMARY KEY,
+            txid bigint NOT NULL,
+            change_id bigint NOT NULL,
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+
+    op.execute(RECORD_FUNCTION)
+    for table in CHANGE_TABLES:
+        for event, transition in TRANSITIONS.items():
+            op.execute(TRIGGER.format(table=table, operation=event.lower(), event=event, transition=transition))
+
+def downgrade() -> None:
+    for table in CHANGE_TABLES:
+        for event in TRANSITIONS:
+            op.execute(f"DROP TRIGGER IF EXISTS record_{table}_{event.lower()} ON geolens.{table}")
+    op.execute("DROP FUNCTION IF EXISTS geolens.record_changes()")
+    op.execute("DROP TABLE IF EXISTS geolens.change_feed_consumers")
+    op.execute("DROP TABLE IF EXISTS geolens.change_log")
@@ -0,0 +1,99 @@
+"""Add generated full-text search columns with GIN indexes
+
+Adding a stored generated column rewrites each table under an exclusive lock.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["locations", "architectural_features", "historical_events"]
+
+SHADOW_TABLE = "historical_events_partitioned"
+LEGACY_TABLE = "historical_events_unpartitioned"
+
+# Weighted documents; the partitioned copies use the historical_events one
+SEARCH_DOCUMENTS = {
+    "locations": (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ),
+    "architectural_features": (
+        "setweight(to_tsvector('english', coalesce(style, '') || ' ' || coalesce(architect, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ),
+    "historical_events": (
+        "setweight(to_tsvector('english', coalesce(description, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(event_type, '')), 'B')"
+    ),
+}
+
+MIRROR_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.mirror_historical_events()
+RETURNS TRIGGER AS $$
+DECLARE
+    column_list text;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM geolens.historical_events_partitioned WHERE id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO column_list
+        FROM pg_attribute
+        WHERE attrelid = 'geolens.historical_events_partitioned'::regclass
+        AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+        EXECUTE format(
+            'INSERT INTO geolens.historical_events_partitioned (%s) SELECT %s FROM (SELECT ($1).*) new_row',
+            column_list, column_list
+        ) USING NEW;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def _existing(tables):
+    bind = op.get_bind()
+    return [
+        table for table in tables
+        if bind.execute(text("SELECT to_regclass(:table)"), {"table": f"geolens.{table}"}).scalar()
+    ]
+
+def upgrade() -> None:
+    # The mirror trigger must skip generated columns before the shadow table has one
+    if _existing([SHADOW_TABLE]):
+        op.execute(MIRROR_FUNCTION)
+
+    for table in _existing(TABLES + [SHADOW_TABLE, LEGACY_TABLE]):
+        document = SEARCH_DOCUMENTS.get(table, SEARCH_DOCUMENTS["historical_events"])
+        op.execute(f"""
+            ALTER TABLE geolens.{table}
+            ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({document}) STORED
+        """)
+
+    for table in TABLES:
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_search
+            ON geolens.{table} USING gin (search_vector)
+        """)
+    if _existing([SHADOW_TABLE]):
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{SHADOW_TABLE}_search
+            ON geolens.{SHADOW_TABLE} USING gin (search_vector)
+        """)
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS geolens.idx_{SHADOW_TABLE}_search")
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS geolens.idx_{table}_search")
+    for table in _existing(TABLES + [SHADOW_TABLE, LEGACY_TABLE]):
+        op.execute(f"ALTER TABLE geolens.{table} DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,31 @@
+"""Add relationship candidates proposed by the similarity join
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE geolens.relationship_candidates (
+            from_location_id integer NOT NULL REFERENCES geolens.locations (id) ON DELETE CASCADE,
+            to_location_id integer NOT NULL REFERENCES geolens.locations (id) ON DELETE CASCADE,
+            from_feature_id integer NOT NULL REFERENCES geolens.architectural_features (id) ON DELETE CASCADE,
+            to_feature_id integer NOT NULL REFERENCES geolens.architectural_features (id) ON DELETE CASCADE,
+            similarity double precision NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (from_location_id, to_location_id)
+        )
+    """)
+    op.execute("CREATE INDEX idx_relationship_candidates_to ON geolens.relationship_candidates (to_location_id)")
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS geolens.relationship_candidates")
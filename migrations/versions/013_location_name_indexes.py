@@ -0,0 +1,32 @@
+"""Index location names for fuzzy, exact and prefix resolution
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Key names are matched on
+NAME_KEY = "lower(name)"
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_locations_name_trgm
+        ON geolens.locations USING gin ({NAME_KEY} gin_trgm_ops)
+    """)
+    op.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_locations_name
+        ON geolens.locations ({NAME_KEY} text_pattern_ops)
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS geolens.idx_locations_name")
+    op.execute("DROP INDEX IF EXISTS geolens.idx_locations_name_trgm")
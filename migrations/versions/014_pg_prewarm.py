@@ -0,0 +1,20 @@
+"""Install pg_prewarm for the startup warm-up
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+
+def downgrade() -> None:
+    op.execute("DROP EXTENSION IF EXISTS pg_prewarm")
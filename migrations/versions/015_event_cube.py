@@ -0,0 +1,161 @@
+"""Aggregate historical events per geohash cell, time bucket and type
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Adds the events selected by {changes} (geometry, event_date, event_type, sign) to the cube.
+# Keys are upserted in order so concurrent writers lock shared cells in the same order.
+_APPLY = """
+    INSERT INTO geolens.event_cube AS cube (
+        resolution, bucket, period_start, event_type, cell, lon, lat, event_count
+    )
+    SELECT
+        resolution,
+        bucket,
+        period_start,
+        event_type,
+        cell,
+        ST_X(ST_PointFromGeoHash(cell)),
+        ST_Y(ST_PointFromGeoHash(cell)),
+        events
+    FROM (
+        SELECT
+            r.resolution,
+            b.bucket,
+            (floor(extract(year FROM c.event_date) / b.years) * b.years)::integer AS period_start,
+            c.event_type,
+            ST_GeoHash(c.geometry::geometry, r.resolution) AS cell,
+            sum(c.sign) AS events
+        FROM ({changes}) c
+        CROSS JOIN unnest(ARRAY[3, 4, 5]) AS r(resolution)
+        CROSS JOIN (VALUES ('year', 1), ('decade', 10), ('century', 100)) AS b(bucket, years)
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING sum(c.sign) <> 0
+    ) deltas
+    ORDER BY resolution, bucket, period_start, event_type, cell
+    ON CONFLICT (resolution, bucket, period_start, event_type, cell)
+    DO UPDATE SET event_count = cube.event_count + EXCLUDED.event_count
+"""
+
+def _events(rows: str, sign: int) -> str:
+    return f"""
+        SELECT l.geometry, e.event_date, e.event_type, {sign} AS sign
+        FROM {rows} e
+        JOIN geolens.locations l ON l.id = e.location_id
+    """
+
+EVENTS_TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.maintain_event_cube()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_APPLY.format(changes=_events("new_rows", 1))};
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY.format(changes=_events("old_rows", -1))};
+    ELSE
+        -- Unchanged rows cancel out
+        {_APPLY.format(changes=_events("old_rows", -1) + " UNION ALL " + _events("new_rows", 1))};
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def _moved_events(rows: str, sign: int) -> str:
+    return f"""
+        SELECT l.geometry, e.event_date, e.event_type, {sign} AS sign
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        JOIN {rows} l ON l.id = o.id
+        JOIN geolens.historical_events e ON e.location_id = o.id
+        WHERE NOT ST_Equals(o.geometry::geometry, n.geometry::geometry)
+    """
+
+# Moves the events of relocated locations to their new cells
+LOCATIONS_TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.maintain_event_cube_locations()
+RETURNS TRIGGER AS $$
+BEGIN
+    {_APPLY.format(changes=_moved_events("old_rows", -1) + " UNION ALL " + _moved_events("new_rows", 1))};
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Transition tables allow only one event per trigger
+EVENTS_TRIGGERS = [
+    """
+    CREATE OR REPLACE TRIGGER event_cube_insert
+        AFTER INSERT ON geolens.historical_events
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER event_cube_update
+        AFTER UPDATE ON geolens.historical_events
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER event_cube_delete
+        AFTER DELETE ON geolens.historical_events
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+]
+
+LOCATIONS_TRIGGER = """
+CREATE OR REPLACE TRIGGER event_cube_locations_update
+    AFTER UPDATE ON geolens.locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION geolens.maintain_event_cube_locations()
+"""
+
+REBUILD = [
+    "TRUNCATE geolens.event_cube",
+    _APPLY.format(changes=_events("geolens.historical_events", 1)),
+]
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE geolens.event_cube (
+            resolution integer NOT NULL,
+            bucket varchar NOT NULL,
+            period_start integer NOT NULL,
+            event_type varchar NOT NULL,
+            cell varchar NOT NULL,
+            lon double precision NOT NULL,
+            lat double precision NOT NULL,
+            event_count bigint NOT NULL,
+            PRIMARY KEY (resolution, bucket, period_start, event_type, cell)
+        )
+    """)
+    op.execute(EVENTS_TRIGGER_FUNCTION)
+    for statement in EVENTS_TRIGGERS:
+        op.execute(statement)
+    op.execute(LOCATIONS_TRIGGER_FUNCTION)
+    op.execute(LOCATIONS_TRIGGER)
+    for statement in REBUILD:
+        op.execute(statement)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS event_cube_locations_update ON geolens.locations")
+    for trigger in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS event_cube_{trigger} ON geolens.historical_events")
+    op.execute("DROP FUNCTION IF EXISTS geolens.maintain_event_cube_locations()")
+    op.execute("DROP FUNCTION IF EXISTS geolens.maintain_event_cube()")
+    op.execute("DROP TABLE IF EXISTS geolens.event_cube")
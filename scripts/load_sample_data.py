@@ -7,10 +7,11 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncpg
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from datetime import datetime
 
+from geolens.services.embeddings import get_embedding_service
+from geolens.services.reembed import content_hash, embedded_text
+
 # Load environment variables
 load_dotenv()
 
@@ -22,11 +23,6 @@ DB_PORT = os.getenv('POSTGRES_PORT', '5433')
 DB_HOST = 'localhost'
 
 
-def convert_embedding_to_pgvector(embedding: np.ndarray) -> str:
-    """Convert numpy array to pgvector format [x,y,z,...]"""
-    return f"[{','.join(str(x) for x in embedding)}]"
-
-
 async def load_sample_data():
     # Connect to the database through pgpool
     conn_str: str = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
@@ -35,8 +31,8 @@ async def load_sample_data():
         conn_str
     )
     
-    # Load sentence transformer for generating embeddings
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Embedding service behind the shared embedding cache
+    embedding_service = get_embedding_service()
     
     try:
         # Sample architectural landmarks
@@ -122,6 +118,9 @@ async def load_sample_data():
             }
         ]
 
+        # Ids of inserted locations by name, so events and relationships need no lookups
+        location_ids = {}
+
         # Insert locations and architectural features
         for landmark in landmarks:
             # Insert location
@@ -137,61 +136,53 @@ async def load_sample_data():
             landmark["location"][0],  # longitude
             landmark["location"][1]   # latitude
             )
+            location_ids[landmark["name"]] = location_id
 
-            # Generate and insert architectural features with embedding
+            # Generate and insert architectural features with embedding,
+            # from the same text `geolens reembed` embeds
             features = landmark["architectural_features"]
-            feature_text = f"{features['style']} {features['description']}"
-            embedding = model.encode(feature_text)
-            
-            # Convert embedding to pgvector format
-            embedding_str = convert_embedding_to_pgvector(embedding)
+            feature_text = embedded_text("architectural_features", features)
+            embedding_str = embedding_service.get_embedding(feature_text)
 
             await conn.execute("""
                 INSERT INTO geolens.architectural_features 
-                (location_id, style, year_built, architect, description, embedding)
-                VALUES ($1, $2, $3, $4, $5, $6::vector)
+                (location_id, style, year_built, architect, description, embedding, content_hash)
+                VALUES ($1, $2, $3, $4, $5, $6::vector, $7)
             """,
             location_id,
             features["style"],
             features["year_built"],
             features["architect"],
             features["description"],
-            embedding_str
+            embedding_str,
+            content_hash(feature_text)
             )
 
         # Insert historical events
         for event in events:
-            # Find associated location
-            location_id = await conn.fetchval("""
-                SELECT id FROM geolens.locations WHERE name = $1
-            """, event["location_name"])
+            location_id = location_ids[event["location_name"]]
 
             # Generate embedding for event description
-            embedding = model.encode(event["description"])
-            embedding_str = convert_embedding_to_pgvector(embedding)
+            event_text = embedded_text("historical_events", event)
+            embedding_str = embedding_service.get_embedding(event_text)
 
             await conn.execute("""
                 INSERT INTO geolens.historical_events 
-                (location_id, event_date, event_type, description, embedding)
-                VALUES ($1, $2, $3, $4, $5::vector)
+                (location_id, event_date, event_type, description, embedding, content_hash)
+                VALUES ($1, $2, $3, $4, $5::vector, $6)
             """,
             location_id,
             event["event_date"],
             event["event_type"],
             event["description"],
-            embedding_str
+            embedding_str,
+            content_hash(event_text)
             )
 
         # Insert relationships
         for rel in relationships:
-            # Find location IDs
-            from_id = await conn.fetchval("""
-                SELECT id FROM geolens.locations WHERE name = $1
-            """, rel["from"])
-            
-            to_id = await conn.fetchval("""
-                SELECT id FROM geolens.locations WHERE name = $1
-            """, rel["to"])
+            from_id = location_ids[rel["from"]]
+            to_id = location_ids[rel["to"]]
 
             await conn.execute("""
                 INSERT INTO geolens.relationships 
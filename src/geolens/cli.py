@@ -2,10 +2,28 @@
 Command line interface for GeoLens.
 """
 import asyncio
+from datetime import timedelta
+from pathlib import Path
+
 import click
 from geolens.database.engine import create_async_engine
 from geolens.database.init import init_database, load_sample_data
 from geolens.config import get_settings
+from geolens.database import partitions as event_partitions
+from geolens.database.changes import CHANGE_TABLES, prune_change_log
+from geolens.database.closure import rebuild_closure
+from geolens.database.cube import rebuild_cube
+from geolens.services.change_feed import ChangeFeed
+from geolens.services.embedding_cache import CachedEmbeddingService
+from geolens.services.embedding_pool import EmbeddingPool
+from geolens.services.embeddings import configured_cache, get_embedding_service
+from geolens.services.export import EXPORT_TABLES, FORMATS as EXPORT_FORMATS, export_table
+from geolens.services.sharding import ShardRouter
+from geolens.services.similarity_join import similarity_join as run_similarity_join
+from geolens.services.reembed import EMBEDDED_TEXT, Checkpoint, reembed as run_reembed
+from geolens.services import vector_index as vector_indexes
+from geolens.services.vector_snapshot import SNAPSHOT_TABLES, SnapshotWriter
+from geolens.services.warmup import warm_up as run_warm_up
 from sqlalchemy.ext.asyncio import AsyncSession
 from alembic.config import Config
 from alembic import command
@@ -60,5 +78,338 @@ def db_revision(message: str):
     command.revision(alembic_cfg, message=message, autogenerate=True)
     click.echo("Created new database revision!")
 
+@cli.command()
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(EMBEDDED_TEXT)),
+              help='Table to re-embed (repeatable, defaults to all)')
+@click.option('--batch-size', default=1024, show_default=True, help='Rows embedded and written per batch')
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(path_type=Path),
+              default='.reembed-checkpoint.json', show_default=True, help='Resume position file')
+@click.option('--restart', is_flag=True, help='Ignore any saved checkpoint and scan from the start')
+@click.option('--workers', default=1, show_default=True,
+              help='Processes embedding in parallel, each with its own model (use a larger --batch-size too)')
+@click.option('--threads-per-worker', default=1, show_default=True, help='Intra-op threads of each worker')
+def reembed(tables: tuple, batch_size: int, checkpoint_path: Path, restart: bool,
+            workers: int, threads_per_worker: int):
+    """Re-embed rows whose text changed or that have no embedding."""
+    checkpoint = Checkpoint(checkpoint_path)
+    if restart:
+        checkpoint.clear()
+
+    def report(result):
+        click.echo(f"{result.table}: {result.embedded} rows re-embedded")
+
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        pool = EmbeddingPool(workers, threads_per_worker) if workers > 1 else None
+        embedding_service = (
+            CachedEmbeddingService(pool, configured_cache(pool.model_name, pool.dimension))
+            if pool is not None else get_embedding_service()
+        )
+        try:
+            results = await run_reembed(
+                engine,
+                embedding_service,
+                tables=tables or None,
+                batch_size=batch_size,
+                checkpoint=checkpoint,
+                progress=report,
+            )
+        finally:
+            if pool is not None:
+                pool.close()
+            await engine.dispose()
+        for result in results:
+            click.echo(f"{result.table}: done, {result.embedded} rows in {result.batches} batches")
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(vector_indexes.VECTOR_INDEXES)),
+              help='Table whose vector index to rebuild (repeatable, defaults to all)')
+@click.option('--method', type=click.Choice(vector_indexes.METHODS), default='ivfflat', show_default=True)
+@click.option('--sample-size', default=50, show_default=True, help='Query vectors sampled for recall measurement')
+@click.option('-k', 'k', default=10, show_default=True, help='Neighbours compared for recall@k')
+@click.option('--dry-run', is_flag=True, help='Only show the chosen parameters')
+def vector_index(tables: tuple, method: str, sample_size: int, k: int, dry_run: bool):
+    """Rebuild vector indexes with parameters sized to the current data."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            for table in tables or vector_indexes.VECTOR_INDEXES:
+                async with engine.connect() as conn:
+                    row_count = await vector_indexes.count_embedded_rows(conn, table)
+                plan = vector_indexes.plan_index(table, row_count, method)
+                click.echo(
+                    f"{table}: {row_count} rows -> {plan.method} "
+                    f"WITH ({plan.with_clause()}), search {plan.search_settings()}"
+                )
+                if dry_run:
+                    continue
+
+                report = await vector_indexes.rebuild_index(engine, plan)
+                report = await vector_indexes.measure_recall(engine, report, sample_size, k)
+                await vector_indexes.record_report(engine, report)
+                recall = f"{report.recall:.3f}" if report.recall is not None else "n/a"
+                click.echo(
+                    f"{table}: built in {report.build_seconds:.1f}s, "
+                    f"{report.size_bytes / 1024 / 1024:.1f} MiB, recall@{k} {recall} "
+                    f"over {report.sample_size} queries"
+                )
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--table', 'tables', multiple=True, type=click.Choice(SNAPSHOT_TABLES),
+              help='Table to snapshot (repeatable, defaults to all)')
+@click.option('--directory', type=click.Path(), help='Snapshot directory (defaults to VECTOR_SNAPSHOT_DIR)')
+@click.option('--full', is_flag=True, help='Rebuild from scratch instead of merging changes')
+def vector_snapshot(tables: tuple, directory: str, full: bool):
+    """Build or incrementally refresh in-process vector snapshots."""
+    settings = get_settings()
+    directory = directory or settings.VECTOR_SNAPSHOT_DIR
+    if not directory:
+        raise click.UsageError("Set VECTOR_SNAPSHOT_DIR or pass --directory")
+
+    async def run():
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            for table in tables or SNAPSHOT_TABLES:
+                writer = SnapshotWriter(engine, directory, table)
+                manifest = await (writer.build() if full else writer.refresh())
+                click.echo(f"{table}: generation {manifest.generation}, {manifest.count} vectors")
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--max-depth', type=click.IntRange(min=1), help='New maximum path length (keeps the current one if omitted)')
+def influence_closure(max_depth: int):
+    """Rebuild the materialized influence closure."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            rows = await rebuild_closure(engine, max_depth)
+        finally:
+            await engine.dispose()
+        click.echo(f"Influence closure rebuilt with {rows} rows")
+
+    asyncio.run(run())
+
+@cli.command()
+def event_cube():
+    """Rebuild the event aggregate cube."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            rows = await rebuild_cube(engine)
+        finally:
+            await engine.dispose()
+        click.echo(f"Event cube rebuilt with {rows} rows")
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('-k', 'k', default=10, show_default=True, help='Most similar features kept per feature')
+@click.option('--min-similarity', default=0.8, show_default=True, help='Cosine similarity a pair must reach')
+@click.option('--temporal/--no-temporal', default=True, show_default=True,
+              help='Only propose influences from features built earlier')
+@click.option('--block-size', default=4096, show_default=True, help='Rows per block of the matrix product')
+@click.option('--workers', default=1, show_default=True, help='Processes computing blocks')
+def similarity_join(k: int, min_similarity: float, temporal: bool, block_size: int, workers: int):
+    """Propose influences relationships from feature similarity."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            result = await run_similarity_join(
+                engine,
+                k=k,
+                min_similarity=min_similarity,
+                temporal=temporal,
+                block_size=block_size,
+                workers=workers,
+                progress=lambda done, total: click.echo(f"{done}/{total} features compared"),
+            )
+        finally:
+            await engine.dispose()
+        click.echo(
+            f"{result.candidates} relationship candidates from "
+            f"{result.feature_pairs} similar pairs of {result.features} features"
+        )
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--consumer', default='cli', show_default=True, help='Consumer name whose position is tracked')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(CHANGE_TABLES),
+              help='Tables to follow (defaults to all)')
+def change_feed(consumer: str, tables: tuple):
+    """Follow row changes, printing one line per coalesced change."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            async for batch in ChangeFeed(engine, consumer, tables or None):
+                for change in batch:
+                    click.echo(f"{change.table} {change.operation} {change.row_id}")
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--max-lag-hours', type=float,
+              help='First drop consumers that left a change older than this unprocessed')
+def change_log_prune(max_lag_hours):
+    """Delete change log entries every consumer has processed."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        max_lag = timedelta(hours=max_lag_hours) if max_lag_hours is not None else None
+        try:
+            deleted = await prune_change_log(engine, max_lag)
+        finally:
+            await engine.dispose()
+        click.echo(f"Pruned {deleted} change log entries")
+
+    asyncio.run(run())
+
+@cli.command()
+@click.option('--connections', type=int, help='Connections to open at once (defaults to the pool size)')
+@click.option('--prewarm/--no-prewarm', default=True, show_default=True,
+              help='Load vector and spatial indexes into shared buffers')
+@click.option('--statements/--no-statements', default=True, show_default=True,
+              help='Run each hot query once')
+@click.option('--model/--no-model', default=True, show_default=True, help='Load and run the embedding model')
+def warm_up(connections: int, prewarm: bool, statements: bool, model: bool):
+    """Warm the database and embedding model, exiting once ready."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL, pool_size=settings.DATABASE_POOL_SIZE)
+        try:
+            return await run_warm_up(
+                engine,
+                connections=connections,
+                prewarm=prewarm,
+                statements=statements,
+                model=model,
+            )
+        finally:
+            await engine.dispose()
+
+    report = asyncio.run(run())
+    for index, blocks in report.prewarmed.items():
+        click.echo(f"Prewarmed {index}: {blocks} blocks")
+    for error in report.errors:
+        click.echo(f"Failed: {error}", err=True)
+    click.echo(
+        f"Ready after {report.seconds:.1f}s: {report.connections} connections, "
+        f"{len(report.statements)} statements, model in {report.model_seconds:.1f}s"
+    )
+
+@cli.command()
+@click.option('--table', 'tables', multiple=True, type=click.Choice(EXPORT_TABLES),
+              help='Tables to export (defaults to all)')
+@click.option('--format', 'output_format', type=click.Choice(EXPORT_FORMATS), default='geoparquet',
+              show_default=True, help='Output format')
+@click.option('--output', type=click.Path(file_okay=False), required=True,
+              help='Directory receiving one subdirectory of part files per table')
+@click.option('--workers', default=4, show_default=True, help='Id ranges exported concurrently per table')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows fetched per cursor round trip')
+@click.option('--row-group-size', default=50000, show_default=True, help='Rows per Parquet row group')
+def export(tables: tuple, output_format: str, output: str, workers: int, batch_size: int, row_group_size: int):
+    """Stream tables to GeoParquet or GeoJSON-seq files."""
+    async def run():
+        settings = get_settings()
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            for table in tables or EXPORT_TABLES:
+                result = await export_table(
+                    engine,
+                    table,
+                    output,
+                    output_format=output_format,
+                    workers=workers,
+                    batch_size=batch_size,
+                    row_group_size=row_group_size,
+                )
+                click.echo(f"{table}: {result.rows} rows in {len(result.files)} files")
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+@cli.command()
+def shard_id_ranges():
+    """Give each shard's id sequences a disjoint range."""
+    async def run():
+        router = ShardRouter.from_settings(get_settings())
+        try:
+            ranges = await router.provision_id_ranges()
+        finally:
+            await router.dispose()
+        for shard, (first, last) in ranges.items():
+            click.echo(f"{shard}: ids {first}..{last}")
+
+    asyncio.run(run())
+
+@cli.group()
+def partitions():
+    """Manage range partitions of historical events."""
+    pass
+
+@partitions.command()
+@click.option('--start-year', type=int, required=True, help='First year to cover')
+@click.option('--end-year', type=int, required=True, help='Last year to cover')
+@click.option('--span-years', type=int, help='Years per partition (defaults to HISTORICAL_EVENTS_PARTITION_YEARS)')
+def ensure(start_year: int, end_year: int, span_years: int):
+    """Create the partitions covering a range of years."""
+    settings = get_settings()
+
+    async def run():
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            created = await event_partitions.ensure_partitions(
+                engine,
+                start_year,
+                end_year,
+                span_years or settings.HISTORICAL_EVENTS_PARTITION_YEARS,
+            )
+        finally:
+            await engine.dispose()
+        for name in created:
+            click.echo(f"Created {name}")
+        click.echo(f"{len(created)} partitions created")
+
+    asyncio.run(run())
+
+@partitions.command()
+@click.option('--batch-size', default=5000, show_default=True, help='Rows copied per transaction')
+def migrate(batch_size: int):
+    """Copy events into the partitioned table and swap it in."""
+    settings = get_settings()
+
+    async def run():
+        engine = create_async_engine(settings.DATABASE_URL)
+        try:
+            copied = await event_partitions.migrate_to_partitioned(
+                engine,
+                batch_size=batch_size,
+                span_years=settings.HISTORICAL_EVENTS_PARTITION_YEARS,
+                progress=lambda count: click.echo(f"{count} rows copied"),
+            )
+        finally:
+            await engine.dispose()
+        click.echo(f"historical_events is partitioned ({copied} rows copied)")
+
+    asyncio.run(run())
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -3,12 +3,32 @@ Configuration management for GeoLens.
 Environment variables are loaded from .env file if present.
 """
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 
-from pydantic import PostgresDsn, field_validator, ConfigDict
+from pydantic import BaseModel, PostgresDsn, field_validator, ConfigDict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class ShardSpec(BaseModel):
+    """One database node of a geographically sharded deployment."""
+    name: str
+    url: str
+    # Geohash prefixes owned by this shard; the longest match wins, "" matches everywhere
+    prefixes: List[str] = [""]
+
+
+class QueryClassLimits(BaseModel):
+    """Admission limits for one class of queries."""
+    # Queries of the class running at once
+    concurrency: int
+    # Queries allowed to wait for a slot; more are shed immediately
+    queue_size: int
+    # Seconds a query may wait for a slot before it is shed
+    queue_timeout: float
+    # Server-side limit on each statement of the class
+    statement_timeout_ms: int
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
     
@@ -40,6 +60,39 @@ class Settings(BaseSettings):
         
         raise ValueError("Database connection details incomplete")
 
+    # In-process vector snapshots (disabled when no directory is set)
+    VECTOR_SNAPSHOT_DIR: Optional[str] = None
+    VECTOR_SNAPSHOT_MAX_STALENESS: float = 300.0
+
+    # Embedding cache: in-process LRU entries, plus a disk tier shared by all
+    # processes on the host when a directory is set
+    EMBEDDING_CACHE_DIR: Optional[str] = None
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 10000
+    EMBEDDING_CACHE_DISK_ENTRIES: int = 1000000
+
+    # Width in years of each historical_events range partition
+    HISTORICAL_EVENTS_PARTITION_YEARS: int = 100
+
+    # Geographic shards, as JSON; empty means a single database (DATABASE_URL).
+    # Append new shards: a shard's id range follows from its position.
+    SHARDS: List[ShardSpec] = []
+
+    # Admission control per query class, as JSON; see geolens.services.admission.
+    # Keep the summed concurrency below DATABASE_POOL_SIZE.
+    # - spatial: radius, box and nearest lookups, timelines
+    # - search: name search and batch name resolution (trigram / full-text indexes)
+    # - aggregate: event heatmaps and trends, read from the event cube
+    # - vector, graph: similarity search and influence traversal
+    # - bulk: region scans and large batch lookups
+    QUERY_CLASSES: Dict[str, QueryClassLimits] = {
+        "spatial": QueryClassLimits(concurrency=6, queue_size=200, queue_timeout=1.0, statement_timeout_ms=2000),
+        "search": QueryClassLimits(concurrency=2, queue_size=100, queue_timeout=1.0, statement_timeout_ms=3000),
+        "aggregate": QueryClassLimits(concurrency=2, queue_size=20, queue_timeout=2.0, statement_timeout_ms=5000),
+        "vector": QueryClassLimits(concurrency=4, queue_size=50, queue_timeout=2.0, statement_timeout_ms=10000),
+        "graph": QueryClassLimits(concurrency=3, queue_size=20, queue_timeout=2.0, statement_timeout_ms=15000),
+        "bulk": QueryClassLimits(concurrency=2, queue_size=10, queue_timeout=10.0, statement_timeout_ms=120000),
+    }
+
     # Application
     DEBUG: bool = False
     API_HOST: str = "0.0.0.0"
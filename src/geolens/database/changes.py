@@ -0,0 +1,116 @@
+"""
+Change log feeding `geolens.services.change_feed`.
+
+Statement-level triggers append one `change_log` row per changed row of the
+tracked tables and send a NOTIFY on `CHANNEL` so listeners wake up at once.
+Each row records the writing transaction's id; consumers only read entries
+of transactions older than every transaction still running, so an entry can
+never appear behind a position a consumer has already passed.
+"""
+import logging
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+CHANGE_TABLES = ("locations", "architectural_features", "historical_events", "relationships")
+
+CHANNEL = "geolens_changes"
+
+RECORD_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.record_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    recorded integer;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO geolens.change_log (table_name, operation, row_id)
+        SELECT TG_TABLE_NAME, TG_OP, id FROM old_rows;
+    ELSE
+        INSERT INTO geolens.change_log (table_name, operation, row_id)
+        SELECT TG_TABLE_NAME, TG_OP, id FROM new_rows;
+    END IF;
+    GET DIAGNOSTICS recorded = ROW_COUNT;
+    IF recorded > 0 THEN
+        PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+_TRIGGER = """
+CREATE OR REPLACE TRIGGER record_{table}_{operation}
+    AFTER {event} ON geolens.{table}
+    REFERENCING {transition}
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION geolens.record_changes()
+"""
+
+_TRANSITIONS = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "UPDATE": "NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+}
+
+
+def change_triggers(table: str) -> List[str]:
+    """Statements creating the change triggers of one table (one per event)."""
+    return [
+        _TRIGGER.format(table=table, operation=event.lower(), event=event, transition=transition)
+        for event, transition in _TRANSITIONS.items()
+    ]
+
+
+def drop_change_triggers(table: str) -> List[str]:
+    return [
+        f"DROP TRIGGER IF EXISTS record_{table}_{event.lower()} ON geolens.{table}"
+        for event in _TRANSITIONS
+    ]
+
+
+# Entries every registered consumer has passed; with no consumers, every
+# entry of a finished transaction
+PRUNE = """
+DELETE FROM geolens.change_log l
+WHERE CASE
+    WHEN EXISTS (SELECT FROM geolens.change_feed_consumers)
+    THEN (l.txid, l.id) <= (
+        SELECT txid, change_id
+        FROM geolens.change_feed_consumers
+        ORDER BY txid, change_id
+        LIMIT 1
+    )
+    ELSE l.txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+END
+"""
+
+# Consumers that have left an entry older than :max_lag unprocessed
+DROP_LAGGING_CONSUMERS = """
+DELETE FROM geolens.change_feed_consumers c
+WHERE EXISTS (
+    SELECT FROM geolens.change_log l
+    WHERE (l.txid, l.id) > (c.txid, c.change_id)
+    AND l.changed_at < now() - CAST(:max_lag AS interval)
+)
+RETURNING name
+"""
+
+
+async def prune_change_log(engine: AsyncEngine, max_lag: Optional[timedelta] = None) -> int:
+    """
+    Delete log entries all consumers have processed. Returns the number deleted.
+
+    An abandoned consumer holds back pruning for good. With `max_lag`,
+    consumers that have left an entry older than that unprocessed are
+    dropped first; they resume from the end of the log when they return.
+    """
+    async with engine.begin() as conn:
+        if max_lag is not None:
+            dropped = (await conn.execute(text(DROP_LAGGING_CONSUMERS), {"max_lag": max_lag})).scalars().all()
+            for name in dropped:
+                logger.warning("Dropped change feed consumer %s, more than %s behind", name, max_lag)
+        return (await conn.execute(text(PRUNE))).rowcount
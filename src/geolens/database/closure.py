@@ -0,0 +1,206 @@
+"""
+Materialized transitive closure of `influences` relationships.
+
+`geolens.influence_closure` holds, for every source location, each location
+it reaches within `max_depth` hops with the strongest compound strength at
+that depth and the strongest path itself. Statement-level
+triggers on `relationships` keep it current: a change re-derives the closure
+only for the sources whose paths can pass through the changed edges.
+"""
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+DEFAULT_MAX_DEPTH = 4
+
+CLOSURE_SETTINGS = [
+    """
+    CREATE TABLE IF NOT EXISTS geolens.influence_closure_settings (
+        singleton boolean PRIMARY KEY DEFAULT true CHECK (singleton),
+        max_depth integer NOT NULL CHECK (max_depth > 0)
+    )
+    """,
+    f"""
+    INSERT INTO geolens.influence_closure_settings (max_depth)
+    VALUES ({DEFAULT_MAX_DEPTH})
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+# Paths follow the same rules as the recursive query in
+# DatabaseService.find_architectural_influences: no location is left twice.
+REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.refresh_influence_closure(changed integer[])
+RETURNS integer AS $$
+DECLARE
+    closure_depth integer;
+    affected integer[];
+    refreshed integer;
+BEGIN
+    IF cardinality(changed) = 0 THEN
+        RETURN 0;
+    END IF;
+    -- Serialise maintenance so each refresh sees the previous one's result
+    PERFORM pg_advisory_xact_lock(hashtext('geolens.influence_closure'));
+    SELECT max_depth INTO closure_depth FROM geolens.influence_closure_settings;
+
+    -- Sources reaching a changed edge's origin, before (closure) or after (graph)
+    WITH RECURSIVE upstream AS (
+        SELECT DISTINCT unnest(changed) AS location_id, 0 AS depth
+        UNION
+        SELECT r.from_location_id, u.depth + 1
+        FROM upstream u
+        JOIN geolens.relationships r
+            ON r.to_location_id = u.location_id
+            AND r.relationship_type = 'influences'
+        WHERE u.depth < closure_depth - 1
+    )
+    SELECT array_agg(DISTINCT location_id) INTO affected
+    FROM (
+        SELECT location_id FROM upstream
+        UNION
+        SELECT c.source_location_id
+        FROM geolens.influence_closure c
+        WHERE c.target_location_id = ANY(changed)
+        AND c.depth < closure_depth
+    ) sources;
+
+    DELETE FROM geolens.influence_closure
+    WHERE source_location_id = ANY(affected);
+
+    INSERT INTO geolens.influence_closure (
+        source_location_id, target_location_id, depth, strength, via_location_id, path, path_count
+    )
+    WITH RECURSIVE chain AS (
+        SELECT
+            from_location_id AS source_location_id,
+            from_location_id,
+            to_location_id,
+            ARRAY[from_location_id] AS path,
+            1 AS depth,
+            strength
+        FROM geolens.relationships
+        WHERE from_location_id = ANY(affected)
+        AND relationship_type = 'influences'
+
+        UNION ALL
+
+        SELECT
+            c.source_location_id,
+            r.from_location_id,
+            r.to_location_id,
+            c.path || r.from_location_id,
+            c.depth + 1,
+            c.strength * r.strength
+        FROM geolens.relationships r
+        JOIN chain c ON r.from_location_id = c.to_location_id
+        WHERE r.relationship_type = 'influences'
+        AND c.depth < closure_depth
+        AND NOT r.from_location_id = ANY(c.path)
+    )
+    SELECT DISTINCT ON (source_location_id, depth, to_location_id)
+        source_location_id,
+        to_location_id,
+        depth,
+        strength,
+        from_location_id,
+        path || to_location_id,
+        count(*) OVER (PARTITION BY source_location_id, depth, to_location_id)
+    FROM chain
+    ORDER BY source_location_id, depth, to_location_id, strength DESC NULLS LAST, from_location_id;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Collects the origins of changed `influences` edges from the transition tables
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.maintain_influence_closure()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := ARRAY(
+            SELECT from_location_id FROM new_rows WHERE relationship_type = 'influences'
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        changed := ARRAY(
+            SELECT from_location_id FROM old_rows WHERE relationship_type = 'influences'
+        );
+    ELSE
+        changed := ARRAY(
+            SELECT unnest(ARRAY[o.from_location_id, n.from_location_id])
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE 'influences' IN (o.relationship_type, n.relationship_type)
+            AND (o.from_location_id, o.to_location_id, o.relationship_type, o.strength)
+                IS DISTINCT FROM (n.from_location_id, n.to_location_id, n.relationship_type, n.strength)
+        );
+    END IF;
+    PERFORM geolens.refresh_influence_closure(changed);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Transition tables allow only one event per trigger
+TRIGGERS = [
+    """
+    CREATE OR REPLACE TRIGGER influence_closure_insert
+        AFTER INSERT ON geolens.relationships
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_influence_closure()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER influence_closure_update
+        AFTER UPDATE ON geolens.relationships
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_influence_closure()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER influence_closure_delete
+        AFTER DELETE ON geolens.relationships
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_influence_closure()
+    """,
+]
+
+# Sources without outgoing influences keep no rows
+DELETE_ORPHANS = """
+DELETE FROM geolens.influence_closure c
+WHERE NOT EXISTS (
+    SELECT 1 FROM geolens.relationships r
+    WHERE r.from_location_id = c.source_location_id
+    AND r.relationship_type = 'influences'
+)
+"""
+
+REBUILD = """
+SELECT geolens.refresh_influence_closure(ARRAY(
+    SELECT DISTINCT from_location_id
+    FROM geolens.relationships
+    WHERE relationship_type = 'influences'
+))
+"""
+
+
+async def rebuild_closure(engine: AsyncEngine, max_depth: Optional[int] = None) -> int:
+    """
+    Recompute the whole closure, optionally changing its maximum depth.
+    Returns the number of closure rows.
+    """
+    async with engine.begin() as conn:
+        if max_depth is not None:
+            await conn.execute(
+                text("UPDATE geolens.influence_closure_settings SET max_depth = :max_depth"),
+                {"max_depth": max_depth}
+            )
+        await conn.execute(text(DELETE_ORPHANS))
+        return (await conn.execute(text(REBUILD))).scalar_one()
@@ -0,0 +1,193 @@
+"""
+Spatio-temporal aggregate cube of historical events.
+
+`geolens.event_cube` counts events per geohash cell (at each of
+`RESOLUTIONS`), time bucket (the year, decade or century the event falls in)
+and event type, so heatmaps and trends over large regions and long windows
+read a few cube cells instead of every event. Statement-level triggers keep
+it current: inserted, deleted and updated events add their deltas, as do
+locations moving to another cell. Cells whose events are all gone stay at
+zero until the next rebuild.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Geohash lengths: cells about 156, 39 and 5 km wide
+RESOLUTIONS = (3, 4, 5)
+
+# Years per bucket, largest last
+BUCKETS = {"year": 1, "decade": 10, "century": 100}
+
+# Cells a query may span before a coarser resolution is used
+MAX_CELLS = 4096
+
+_PERIODS = ", ".join(f"('{bucket}', {years})" for bucket, years in BUCKETS.items())
+
+# Adds the events selected by {changes} (geometry, event_date, event_type, sign) to the cube.
+# Keys are upserted in order so concurrent writers lock shared cells in the same order.
+_APPLY = f"""
+    INSERT INTO geolens.event_cube AS cube (
+        resolution, bucket, period_start, event_type, cell, lon, lat, event_count
+    )
+    SELECT
+        resolution,
+        bucket,
+        period_start,
+        event_type,
+        cell,
+        ST_X(ST_PointFromGeoHash(cell)),
+        ST_Y(ST_PointFromGeoHash(cell)),
+        events
+    FROM (
+        SELECT
+            r.resolution,
+            b.bucket,
+            (floor(extract(year FROM c.event_date) / b.years) * b.years)::integer AS period_start,
+            c.event_type,
+            ST_GeoHash(c.geometry::geometry, r.resolution) AS cell,
+            sum(c.sign) AS events
+        FROM ({{changes}}) c
+        CROSS JOIN unnest(ARRAY{list(RESOLUTIONS)}) AS r(resolution)
+        CROSS JOIN (VALUES {_PERIODS}) AS b(bucket, years)
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING sum(c.sign) <> 0
+    ) deltas
+    ORDER BY resolution, bucket, period_start, event_type, cell
+    ON CONFLICT (resolution, bucket, period_start, event_type, cell)
+    DO UPDATE SET event_count = cube.event_count + EXCLUDED.event_count
+"""
+
+
+def _events(rows: str, sign: int) -> str:
+    return f"""
+        SELECT l.geometry, e.event_date, e.event_type, {sign} AS sign
+        FROM {rows} e
+        JOIN geolens.locations l ON l.id = e.location_id
+    """
+
+
+EVENTS_TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.maintain_event_cube()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_APPLY.format(changes=_events("new_rows", 1))};
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY.format(changes=_events("old_rows", -1))};
+    ELSE
+        -- Unchanged rows cancel out
+        {_APPLY.format(changes=_events("old_rows", -1) + " UNION ALL " + _events("new_rows", 1))};
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def _moved_events(rows: str, sign: int) -> str:
+    return f"""
+        SELECT l.geometry, e.event_date, e.event_type, {sign} AS sign
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        JOIN {rows} l ON l.id = o.id
+        JOIN geolens.historical_events e ON e.location_id = o.id
+        WHERE NOT ST_Equals(o.geometry::geometry, n.geometry::geometry)
+    """
+
+
+# Moves the events of relocated locations to their new cells
+LOCATIONS_TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.maintain_event_cube_locations()
+RETURNS TRIGGER AS $$
+BEGIN
+    {_APPLY.format(changes=_moved_events("old_rows", -1) + " UNION ALL " + _moved_events("new_rows", 1))};
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Transition tables allow only one event per trigger
+EVENTS_TRIGGERS = [
+    """
+    CREATE OR REPLACE TRIGGER event_cube_insert
+        AFTER INSERT ON geolens.historical_events
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER event_cube_update
+        AFTER UPDATE ON geolens.historical_events
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER event_cube_delete
+        AFTER DELETE ON geolens.historical_events
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION geolens.maintain_event_cube()
+    """,
+]
+
+DROP_EVENTS_TRIGGERS = [
+    f"DROP TRIGGER IF EXISTS event_cube_{operation} ON geolens.historical_events"
+    for operation in ("insert", "update", "delete")
+]
+
+LOCATIONS_TRIGGER = """
+CREATE OR REPLACE TRIGGER event_cube_locations_update
+    AFTER UPDATE ON geolens.locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION geolens.maintain_event_cube_locations()
+"""
+
+REBUILD = [
+    "TRUNCATE geolens.event_cube",
+    _APPLY.format(changes=_events("geolens.historical_events", 1)),
+]
+
+
+async def rebuild_cube(engine: AsyncEngine) -> int:
+    """Recompute the whole cube. Returns the number of cube rows."""
+    async with engine.begin() as conn:
+        for statement in REBUILD:
+            await conn.execute(text(statement))
+        return (await conn.execute(text("SELECT count(*) FROM geolens.event_cube"))).scalar_one()
+
+
+def cell_size(resolution: int) -> Tuple[float, float]:
+    """Width and height in degrees of a geohash cell of the given length."""
+    bits = 5 * resolution
+    return 360 / 2 ** ((bits + 1) // 2), 180 / 2 ** (bits // 2)
+
+
+def cube_resolution(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> int:
+    """Finest resolution at which the box spans at most `MAX_CELLS` cells."""
+    for resolution in sorted(RESOLUTIONS, reverse=True):
+        width, height = cell_size(resolution)
+        if ((max_lon - min_lon) // width + 1) * ((max_lat - min_lat) // height + 1) <= MAX_CELLS:
+            return resolution
+    return min(RESOLUTIONS)
+
+
+def window_periods(start_year: int, end_year: int) -> List[Tuple[str, int, int]]:
+    """
+    Cover the years `start_year` to `end_year` (inclusive) with the fewest
+    whole periods, as (bucket, first period start, last period start) runs.
+    """
+    def cover(start: int, end: int, buckets: List[Tuple[str, int]]) -> List[Tuple[str, int, int]]:
+        if start > end:
+            return []
+        (bucket, years), smaller = buckets[0], buckets[1:]
+        first = -(-start // years) * years
+        stop = (end + 1) // years * years
+        if first >= stop:
+            return cover(start, end, smaller)
+        return cover(start, first - 1, smaller) + [(bucket, first, stop - years)] + cover(stop, end, smaller)
+
+    return cover(start_year, end_year, sorted(BUCKETS.items(), key=lambda item: -item[1]))
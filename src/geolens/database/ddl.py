@@ -0,0 +1,107 @@
+"""
+Raw DDL for database objects SQLAlchemy metadata cannot express
+(functions and triggers). Shared by migrations and `init_database`.
+"""
+from sqlalchemy import DDL, Table, event
+
+UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.update_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+UPDATED_AT_TRIGGER = """
+CREATE OR REPLACE TRIGGER update_{table}_updated_at
+    BEFORE UPDATE ON geolens.{table}
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.update_updated_at()
+"""
+
+
+def attach_updated_at_trigger(table: Table) -> None:
+    """Create the `updated_at` maintenance trigger whenever `table` is created."""
+    event.listen(table, "before_create", DDL(UPDATED_AT_FUNCTION))
+    event.listen(table, "after_create", DDL(UPDATED_AT_TRIGGER.format(table=table.name)))
+
+# Create one range partition of a partitioned table. Rows for the range that
+# already sit in the DEFAULT partition are moved in the same transaction, so
+# readers never see them missing.
+CREATE_RANGE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.create_range_partition(
+    parent regclass,
+    partition_name text,
+    key_column text,
+    range_start date,
+    range_end date
+) RETURNS boolean AS $$
+DECLARE
+    default_partition regclass;
+    column_list text;
+BEGIN
+    IF to_regclass(format('geolens.%I', partition_name)) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    SELECT c.oid INTO default_partition
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent
+    AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+
+    EXECUTE format(
+        'CREATE TABLE geolens.%I (LIKE %s INCLUDING DEFAULTS INCLUDING GENERATED)',
+        partition_name, parent
+    );
+
+    IF default_partition IS NOT NULL THEN
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO column_list
+        FROM pg_attribute
+        WHERE attrelid = parent AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING %s) '
+            'INSERT INTO geolens.%I (%s) SELECT %s FROM moved',
+            default_partition, key_column, range_start, key_column, range_end,
+            column_list, partition_name, column_list, column_list
+        );
+    END IF;
+
+    EXECUTE format(
+        'ALTER TABLE %s ATTACH PARTITION geolens.%I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, range_start, range_end
+    );
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+HISTORICAL_EVENTS_DEFAULT_PARTITION = """
+CREATE TABLE IF NOT EXISTS geolens.historical_events_default
+PARTITION OF geolens.historical_events DEFAULT
+"""
+
+# Keep `region_parts` in step with `regions`. Regions are segmentized to 5 km
+# first so that the subdivided pieces' straight edges stay close to geodesics.
+REGION_SUBDIVIDE_FUNCTION = """
+CREATE OR REPLACE FUNCTION geolens.subdivide_region()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM geolens.region_parts WHERE region_id = NEW.id;
+    INSERT INTO geolens.region_parts (region_id, geometry)
+    SELECT NEW.id, part::geography
+    FROM ST_Subdivide(ST_Segmentize(NEW.geometry, 5000)::geometry, 256) AS part;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+REGION_SUBDIVIDE_TRIGGER = """
+CREATE OR REPLACE TRIGGER subdivide_region
+    AFTER INSERT OR UPDATE OF geometry ON geolens.regions
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.subdivide_region()
+"""
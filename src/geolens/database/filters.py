@@ -0,0 +1,43 @@
+"""
+Attribute filters on the JSONB `properties` columns.
+
+Two kinds of predicate are supported, both served by the `jsonb_path_ops` GIN
+index on each table, so they combine with spatial, temporal and vector
+conditions in a single query:
+- containment: `{"style": "Gothic"}` matches rows whose properties include it
+- SQL/JSON path: `'$.height_m > 50'` matches rows for which the path predicate holds
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import ColumnElement
+
+
+def property_criteria(
+    column,
+    properties: Optional[Dict[str, Any]] = None,
+    property_path: Optional[str] = None
+) -> List[ColumnElement]:
+    """Filter criteria for ORM queries on a `properties` column."""
+    criteria = []
+    if properties:
+        criteria.append(column.contains(properties))
+    if property_path:
+        criteria.append(column.path_match(property_path))
+    return criteria
+
+
+def property_conditions(
+    alias: str,
+    properties: Optional[Dict[str, Any]] = None,
+    property_path: Optional[str] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """`AND ...` lines and bind parameters for raw SQL queries over `alias`."""
+    conditions, params = [], {}
+    if properties:
+        conditions.append(f"AND {alias}.properties @> CAST(:properties AS jsonb)")
+        params["properties"] = json.dumps(properties)
+    if property_path:
+        conditions.append(f"AND {alias}.properties @@ CAST(:property_path AS jsonpath)")
+        params["property_path"] = property_path
+    return "\n".join(conditions), params
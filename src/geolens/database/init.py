@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 from .models import Base, Location, ArchitecturalFeature, HistoricalEvent, Relationship
 from ..services.embeddings import get_embedding_service
+from ..services.reembed import EMBEDDED_COLUMNS, content_hash, embedded_text
 
 async def init_database(engine: AsyncEngine) -> None:
     """Initialize database schema and extensions."""
@@ -19,6 +20,8 @@ async def init_database(engine: AsyncEngine) -> None:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS age"))
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_prewarm"))
         
         # Create schema if it doesn't exist
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS geolens"))
@@ -26,6 +29,13 @@ async def init_database(engine: AsyncEngine) -> None:
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
 
+def _embed(row, embedding_service) -> None:
+    """Set a row's embedding and content hash from the text `geolens reembed` embeds."""
+    table = row.__tablename__
+    content = embedded_text(table, {column: getattr(row, column) for column in EMBEDDED_COLUMNS[table]})
+    row.embedding = embedding_service.get_embedding(content)
+    row.content_hash = content_hash(content)
+
 async def load_sample_data(session: AsyncSession) -> None:
     """Load sample data into the database."""
     # Check if data already exists
@@ -48,26 +58,24 @@ async def load_sample_data(session: AsyncSession) -> None:
     await session.flush()
 
     # Notre-Dame architectural features
-    feature_text = "French Gothic architecture with pioneering use of the rib vault and flying buttress, characterized by pointed arches, ribbed vaults, and flying buttresses. Known for its innovative architectural solutions and religious symbolism."
     notre_dame_features = ArchitecturalFeature(
         location_id=notre_dame.id,
         style="French Gothic",
         year_built=1163,
         architect="Unknown",
-        description="Famous for its pioneering use of the rib vault and flying buttress.",
-        embedding=embedding_service.get_embedding(feature_text)
+        description="Famous for its pioneering use of the rib vault and flying buttress."
     )
+    _embed(notre_dame_features, embedding_service)
     session.add(notre_dame_features)
 
     # Historical events
-    event_text = "Construction of Notre-Dame Cathedral begins under Bishop Maurice de Sully, marking the start of one of the most ambitious architectural projects of medieval Paris."
     construction_event = HistoricalEvent(
         location_id=notre_dame.id,
         event_date=datetime(1163, 1, 1).date(),
         event_type="construction",
-        description="Construction begins under Bishop Maurice de Sully",
-        embedding=embedding_service.get_embedding(event_text)
+        description="Construction begins under Bishop Maurice de Sully"
     )
+    _embed(construction_event, embedding_service)
     session.add(construction_event)
 
     # St Paul's Cathedral
@@ -81,15 +89,14 @@ async def load_sample_data(session: AsyncSession) -> None:
     await session.flush()
 
     # St Paul's architectural features
-    st_pauls_text = "English Baroque architecture with classical elements, featuring a massive dome inspired by St. Peter's Basilica. Shows Gothic influence in its vertical emphasis and religious symbolism."
     st_pauls_features = ArchitecturalFeature(
         location_id=st_pauls.id,
         style="English Baroque",
         year_built=1675,
         architect="Christopher Wren",
-        description="Masterpiece of English Baroque architecture with its distinctive dome.",
-        embedding=embedding_service.get_embedding(st_pauls_text)
+        description="Masterpiece of English Baroque architecture with its distinctive dome."
     )
+    _embed(st_pauls_features, embedding_service)
     session.add(st_pauls_features)
 
     # Add relationship
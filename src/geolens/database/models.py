@@ -5,10 +5,21 @@ from datetime import datetime
 from typing import Optional, List
 
 from geoalchemy2 import Geography
-from sqlalchemy import String, Integer, Float, DateTime, Date, ForeignKey, Index
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import DDL, BigInteger, Computed, String, Integer, Float, DateTime, Date, ForeignKey, Index, event, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from .changes import RECORD_FUNCTION, change_triggers
+from .closure import CLOSURE_SETTINGS, REFRESH_FUNCTION, TRIGGER_FUNCTION, TRIGGERS
+from .cube import EVENTS_TRIGGER_FUNCTION, EVENTS_TRIGGERS, LOCATIONS_TRIGGER, LOCATIONS_TRIGGER_FUNCTION
+from .ddl import (
+    CREATE_RANGE_PARTITION_FUNCTION,
+    HISTORICAL_EVENTS_DEFAULT_PARTITION,
+    REGION_SUBDIVIDE_FUNCTION,
+    REGION_SUBDIVIDE_TRIGGER,
+    attach_updated_at_trigger,
+)
+from .search import NAME_KEY, SEARCH_DOCUMENTS
 from .types import Vector
 
 class Base(DeclarativeBase):
@@ -18,7 +29,20 @@ class Base(DeclarativeBase):
 class Location(Base):
     """Physical location with spatial coordinates."""
     __tablename__ = "locations"
-    __table_args__ = {"schema": "geolens"}
+    __table_args__ = (
+        Index('idx_locations_updated_at', 'updated_at', 'id'),
+        Index(
+            'idx_locations_properties',
+            'properties',
+            postgresql_using='gin',
+            postgresql_ops={'properties': 'jsonb_path_ops'}
+        ),
+        Index('idx_locations_search', 'search_vector', postgresql_using='gin'),
+        # Place-name resolution; see geolens.database.search
+        Index('idx_locations_name_trgm', text(f'{NAME_KEY} gin_trgm_ops'), postgresql_using='gin'),
+        Index('idx_locations_name', text(f'{NAME_KEY} text_pattern_ops')),
+        {"schema": "geolens"}
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -26,8 +50,10 @@ class Location(Base):
     location_type: Mapped[str] = mapped_column(String, nullable=False)
     geometry: Mapped[Geography] = mapped_column(Geography(geometry_type='POINT', srid=4326))
     properties: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Full-text document; see geolens.database.search
+    search_vector = mapped_column(TSVECTOR, Computed(SEARCH_DOCUMENTS["locations"], persisted=True), deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     architectural_features: Mapped[List["ArchitecturalFeature"]] = relationship(back_populates="location")
@@ -45,6 +71,7 @@ class ArchitecturalFeature(Base):
     """Architectural features with vector embeddings for similarity search."""
     __tablename__ = "architectural_features"
     __table_args__ = (
+        # Bootstrap parameters only; `geolens vector-index` rebuilds it sized to the data
         Index(
             'idx_architectural_features_embedding',
             'embedding',
@@ -52,6 +79,14 @@ class ArchitecturalFeature(Base):
             postgresql_with={'lists': '100'},
             postgresql_ops={'embedding': 'vector_cosine_ops'}
         ),
+        Index('idx_architectural_features_updated_at', 'updated_at', 'id'),
+        Index(
+            'idx_architectural_features_properties',
+            'properties',
+            postgresql_using='gin',
+            postgresql_ops={'properties': 'jsonb_path_ops'}
+        ),
+        Index('idx_architectural_features_search', 'search_vector', postgresql_using='gin'),
         {"schema": "geolens"}
     )
 
@@ -61,10 +96,15 @@ class ArchitecturalFeature(Base):
     year_built: Mapped[Optional[int]] = mapped_column(Integer)
     architect: Mapped[Optional[str]] = mapped_column(String)
     description: Mapped[Optional[str]] = mapped_column(String)
-    embedding = mapped_column(Vector(384))
-    properties: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Heavy columns are deferred; load them explicitly with undefer() when needed
+    embedding = mapped_column(Vector(384), deferred=True)
+    properties: Mapped[dict] = mapped_column(JSONB, default=dict, deferred=True)
+    # SHA-256 of the text the current embedding was computed from
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    # Full-text document; see geolens.database.search
+    search_vector = mapped_column(TSVECTOR, Computed(SEARCH_DOCUMENTS["architectural_features"], persisted=True), deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     location: Mapped["Location"] = relationship(back_populates="architectural_features")
@@ -73,6 +113,7 @@ class HistoricalEvent(Base):
     """Historical events with temporal data and vector embeddings."""
     __tablename__ = "historical_events"
     __table_args__ = (
+        # Bootstrap parameters only; `geolens vector-index` rebuilds it sized to the data
         Index(
             'idx_historical_events_embedding',
             'embedding',
@@ -80,18 +121,35 @@ class HistoricalEvent(Base):
             postgresql_with={'lists': '100'},
             postgresql_ops={'embedding': 'vector_cosine_ops'}
         ),
-        {"schema": "geolens"}
+        Index('idx_historical_events_updated_at', 'updated_at', 'id'),
+        Index('idx_historical_events_date', 'event_date'),
+        Index('idx_historical_events_location', 'location_id', 'event_date'),
+        Index(
+            'idx_historical_events_properties',
+            'properties',
+            postgresql_using='gin',
+            postgresql_ops={'properties': 'jsonb_path_ops'}
+        ),
+        Index('idx_historical_events_search', 'search_vector', postgresql_using='gin'),
+        # Range partitioned by era; see geolens.database.partitions
+        {"schema": "geolens", "postgresql_partition_by": "RANGE (event_date)"}
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    # The partition key must be part of the primary key, so event_date is NOT NULL
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     location_id: Mapped[int] = mapped_column(ForeignKey("geolens.locations.id"))
-    event_date: Mapped[datetime] = mapped_column(Date)
+    event_date: Mapped[datetime] = mapped_column(Date, primary_key=True)
     event_type: Mapped[str] = mapped_column(String)
     description: Mapped[str] = mapped_column(String)
-    embedding = mapped_column(Vector(384))
-    properties: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Heavy columns are deferred; load them explicitly with undefer() when needed
+    embedding = mapped_column(Vector(384), deferred=True)
+    properties: Mapped[dict] = mapped_column(JSONB, default=dict, deferred=True)
+    # SHA-256 of the text the current embedding was computed from
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    # Full-text document; see geolens.database.search
+    search_vector = mapped_column(TSVECTOR, Computed(SEARCH_DOCUMENTS["historical_events"], persisted=True), deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     location: Mapped["Location"] = relationship(back_populates="historical_events")
@@ -99,7 +157,23 @@ class HistoricalEvent(Base):
 class Relationship(Base):
     """Relationships between locations for graph analysis."""
     __tablename__ = "relationships"
-    __table_args__ = {"schema": "geolens"}
+    __table_args__ = (
+        # Strongest edges first, for fan-out limited traversals
+        Index(
+            'idx_relationships_from_type_strength',
+            'from_location_id',
+            'relationship_type',
+            text('strength DESC NULLS LAST')
+        ),
+        Index('idx_relationships_to_type', 'to_location_id', 'relationship_type'),
+        Index(
+            'idx_relationships_properties',
+            'properties',
+            postgresql_using='gin',
+            postgresql_ops={'properties': 'jsonb_path_ops'}
+        ),
+        {"schema": "geolens"}
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     from_location_id: Mapped[int] = mapped_column(ForeignKey("geolens.locations.id"))
@@ -109,7 +183,7 @@ class Relationship(Base):
     evidence: Mapped[Optional[str]] = mapped_column(String)
     properties: Mapped[dict] = mapped_column(JSONB, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     from_location: Mapped["Location"] = relationship(
@@ -119,4 +193,161 @@ class Relationship(Base):
     to_location: Mapped["Location"] = relationship(
         back_populates="incoming_relationships",
         foreign_keys=[to_location_id]
-    )
\ No newline at end of file
+    )
+
+class InfluenceClosure(Base):
+    """
+    Transitive closure of `influences` relationships, maintained by triggers.
+    One row per source, depth and target holding the strongest path.
+    """
+    __tablename__ = "influence_closure"
+    __table_args__ = (
+        Index('idx_influence_closure_target', 'target_location_id', 'depth'),
+        {"schema": "geolens"}
+    )
+
+    source_location_id: Mapped[int] = mapped_column(
+        ForeignKey("geolens.locations.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    target_location_id: Mapped[int] = mapped_column(
+        ForeignKey("geolens.locations.id", ondelete="CASCADE"), primary_key=True
+    )
+    strength: Mapped[Optional[float]] = mapped_column(Float)
+    # Location the strongest path arrives from, and that path from source to target
+    via_location_id: Mapped[int] = mapped_column(Integer)
+    path: Mapped[List[int]] = mapped_column(ARRAY(Integer))
+    path_count: Mapped[int] = mapped_column(Integer)
+
+class EventCube(Base):
+    """
+    Event counts per geohash cell, time bucket and event type, maintained by
+    triggers (see geolens.database.cube).
+    """
+    __tablename__ = "event_cube"
+    __table_args__ = {"schema": "geolens"}
+
+    # Geohash length of the cell
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    bucket: Mapped[str] = mapped_column(String, primary_key=True)
+    # First year of the bucket's period
+    period_start: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    event_type: Mapped[str] = mapped_column(String, primary_key=True)
+    cell: Mapped[str] = mapped_column(String, primary_key=True)
+    # Centre of the cell
+    lon: Mapped[float] = mapped_column(Float, nullable=False)
+    lat: Mapped[float] = mapped_column(Float, nullable=False)
+    event_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+class RelationshipCandidate(Base):
+    """
+    Proposed `influences` relationship between two locations, from the
+    similarity join over feature embeddings (see geolens.services.similarity_join).
+    """
+    __tablename__ = "relationship_candidates"
+    __table_args__ = (
+        Index('idx_relationship_candidates_to', 'to_location_id'),
+        {"schema": "geolens"}
+    )
+
+    from_location_id: Mapped[int] = mapped_column(
+        ForeignKey("geolens.locations.id", ondelete="CASCADE"), primary_key=True
+    )
+    to_location_id: Mapped[int] = mapped_column(
+        ForeignKey("geolens.locations.id", ondelete="CASCADE"), primary_key=True
+    )
+    # The most similar pair of features behind the proposal
+    from_feature_id: Mapped[int] = mapped_column(ForeignKey("geolens.architectural_features.id", ondelete="CASCADE"))
+    to_feature_id: Mapped[int] = mapped_column(ForeignKey("geolens.architectural_features.id", ondelete="CASCADE"))
+    similarity: Mapped[float] = mapped_column(Float, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+
+class Region(Base):
+    """
+    Area or corridor feature: a district polygon, a river or road linestring.
+    Queried through its subdivided `parts`, never its full geometry.
+    """
+    __tablename__ = "regions"
+    __table_args__ = {"schema": "geolens"}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    region_type: Mapped[str] = mapped_column(String, nullable=False)
+    geometry: Mapped[Geography] = mapped_column(
+        Geography(geometry_type='GEOMETRY', srid=4326, spatial_index=False), nullable=False
+    )
+    properties: Mapped[dict] = mapped_column(JSONB, default=dict, deferred=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    parts: Mapped[List["RegionPart"]] = relationship(back_populates="region", passive_deletes=True)
+
+class RegionPart(Base):
+    """Subdivided piece of a region (at most 256 vertices), maintained by trigger."""
+    __tablename__ = "region_parts"
+    __table_args__ = (
+        Index('idx_region_parts_region', 'region_id'),
+        {"schema": "geolens"}
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    region_id: Mapped[int] = mapped_column(ForeignKey("geolens.regions.id", ondelete="CASCADE"))
+    geometry: Mapped[Geography] = mapped_column(Geography(geometry_type='GEOMETRY', srid=4326))
+
+    region: Mapped["Region"] = relationship(back_populates="parts")
+
+class ChangeLog(Base):
+    """Row changes of the tracked tables, appended by triggers; see geolens.database.changes."""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index('idx_change_log_position', 'txid', 'id'),
+        {"schema": "geolens"}
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    txid: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=text("(pg_current_xact_id()::text::bigint)")
+    )
+    table_name: Mapped[str] = mapped_column(String, nullable=False)
+    operation: Mapped[str] = mapped_column(String, nullable=False)
+    row_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+
+class ChangeFeedConsumer(Base):
+    """Last change log position a named consumer has processed."""
+    __tablename__ = "change_feed_consumers"
+    __table_args__ = {"schema": "geolens"}
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    txid: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    change_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+
+for _model in (Location, ArchitecturalFeature, HistoricalEvent, Relationship, Region):
+    attach_updated_at_trigger(_model.__table__)
+
+# Catch-all partition so inserts never fail; `geolens partitions ensure` adds eras
+event.listen(HistoricalEvent.__table__, "after_create", DDL(CREATE_RANGE_PARTITION_FUNCTION))
+event.listen(HistoricalEvent.__table__, "after_create", DDL(HISTORICAL_EVENTS_DEFAULT_PARTITION))
+
+# Closure maintenance; see geolens.database.closure
+for _statement in CLOSURE_SETTINGS:
+    event.listen(InfluenceClosure.__table__, "after_create", DDL(_statement))
+for _statement in [REFRESH_FUNCTION, TRIGGER_FUNCTION] + TRIGGERS:
+    event.listen(Relationship.__table__, "after_create", DDL(_statement))
+
+# Event cube maintenance; see geolens.database.cube
+for _statement in [EVENTS_TRIGGER_FUNCTION] + EVENTS_TRIGGERS:
+    event.listen(HistoricalEvent.__table__, "after_create", DDL(_statement))
+for _statement in [LOCATIONS_TRIGGER_FUNCTION, LOCATIONS_TRIGGER]:
+    event.listen(Location.__table__, "after_create", DDL(_statement))
+
+# Subdivision trigger; region_parts is created after regions
+event.listen(RegionPart.__table__, "after_create", DDL(REGION_SUBDIVIDE_FUNCTION))
+event.listen(RegionPart.__table__, "after_create", DDL(REGION_SUBDIVIDE_TRIGGER))
+
+# Change feed triggers; see geolens.database.changes
+for _model in (Location, ArchitecturalFeature, HistoricalEvent, Relationship):
+    event.listen(_model.__table__, "before_create", DDL(RECORD_FUNCTION))
+    for _statement in change_triggers(_model.__tablename__):
+        event.listen(_model.__table__, "after_create", DDL(_statement))
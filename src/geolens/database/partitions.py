@@ -0,0 +1,266 @@
+"""
+Range partitioning of `historical_events` by `event_date`.
+
+Migration 005 creates a partitioned shadow table next to the original heap
+table and mirrors every write into it with a trigger. `event_date` is part
+of the partitioned primary key, so 005 also makes it NOT NULL on the
+original table and refuses to run while undated events exist. `migrate_to_partitioned`
+then copies existing rows across in short keyset batches and finally swaps
+the two tables in one brief transaction, so no long lock is ever held.
+`ensure_partitions` creates partitions for new eras ahead of time.
+"""
+import logging
+from datetime import date
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .changes import change_triggers, drop_change_triggers
+from .cube import DROP_EVENTS_TRIGGERS, EVENTS_TRIGGERS
+
+logger = logging.getLogger(__name__)
+
+TABLE = "historical_events"
+SHADOW_TABLE = "historical_events_partitioned"
+LEGACY_TABLE = "historical_events_unpartitioned"
+PARTITION_KEY = "event_date"
+
+# Indexes carried by the partitioned table, by final name
+PARTITIONED_INDEXES = {
+    "idx_historical_events_embedding": "USING ivfflat (embedding vector_cosine_ops)",
+    "idx_historical_events_date": "(event_date)",
+    "idx_historical_events_location": "(location_id, event_date)",
+    "idx_historical_events_updated_at": "(updated_at, id)",
+}
+
+# Indexes later migrations add to both tables; renamed by the swap as well
+ADDED_INDEXES = ["idx_historical_events_properties", "idx_historical_events_search"]
+
+# Mirrors writes on the original table into the partitioned shadow table.
+# Generated columns are left for the shadow table to compute.
+MIRROR_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION geolens.mirror_historical_events()
+RETURNS TRIGGER AS $$
+DECLARE
+    column_list text;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM geolens.{SHADOW_TABLE} WHERE id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO column_list
+        FROM pg_attribute
+        WHERE attrelid = 'geolens.{SHADOW_TABLE}'::regclass
+        AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+        EXECUTE format(
+            'INSERT INTO geolens.{SHADOW_TABLE} (%s) SELECT %s FROM (SELECT ($1).*) new_row',
+            column_list, column_list
+        ) USING NEW;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+MIRROR_TRIGGER = f"""
+CREATE OR REPLACE TRIGGER mirror_historical_events
+    AFTER INSERT OR UPDATE OR DELETE ON geolens.{TABLE}
+    FOR EACH ROW
+    EXECUTE FUNCTION geolens.mirror_historical_events()
+"""
+
+
+def shadow_index_name(name: str) -> str:
+    """Name of a partitioned index while it lives on the shadow table."""
+    return name.replace(TABLE, SHADOW_TABLE, 1)
+
+
+def partition_ranges(start_year: int, end_year: int, span_years: int = 100) -> List[Tuple[date, date]]:
+    """Aligned [start, end) date ranges of `span_years` covering the given years."""
+    if span_years < 1:
+        raise ValueError("span_years must be positive")
+    ranges = []
+    boundary = start_year - start_year % span_years
+    while boundary <= end_year and boundary < 9999:
+        next_boundary = boundary + span_years
+        ranges.append((date(max(boundary, 1), 1, 1), date(min(next_boundary, 9999), 1, 1)))
+        boundary = next_boundary
+    return ranges
+
+
+def partition_name(range_start: date, range_end: date, table: str = TABLE) -> str:
+    return f"{table}_{range_start.year:04d}_{range_end.year:04d}"
+
+
+async def is_partitioned(conn: AsyncConnection, table: str = TABLE) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": f"geolens.{table}"}
+    )
+    return bool(result.scalar_one_or_none())
+
+
+async def ensure_partitions(
+    engine: AsyncEngine,
+    start_year: int,
+    end_year: int,
+    span_years: int = 100,
+    table: Optional[str] = None
+) -> List[str]:
+    """
+    Create the partitions covering `start_year`..`end_year`, each in its own
+    transaction. Returns the names of partitions that were created.
+    """
+    if table is None:
+        async with engine.connect() as conn:
+            table = TABLE if await is_partitioned(conn, TABLE) else SHADOW_TABLE
+
+    created = []
+    for range_start, range_end in partition_ranges(start_year, end_year, span_years):
+        name = partition_name(range_start, range_end)
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT geolens.create_range_partition(
+                        CAST(:parent AS regclass), :name, :key, :range_start, :range_end
+                    )
+                """),
+                {
+                    "parent": f"geolens.{table}",
+                    "name": name,
+                    "key": PARTITION_KEY,
+                    "range_start": range_start,
+                    "range_end": range_end
+                }
+            )
+            if result.scalar_one():
+                created.append(name)
+                logger.info("Created partition %s", name)
+    return created
+
+
+async def _swap_tables(conn: AsyncConnection) -> None:
+    """Swap the shadow table in for the original one (run inside a transaction)."""
+    await conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+    await conn.execute(text(f"LOCK TABLE geolens.{TABLE} IN ACCESS EXCLUSIVE MODE"))
+    await conn.execute(text(f"DROP TRIGGER IF EXISTS mirror_historical_events ON geolens.{TABLE}"))
+    # The change feed triggers move to the partitioned table
+    change_log = (await conn.execute(text("SELECT to_regclass('geolens.change_log')"))).scalar_one()
+    for statement in drop_change_triggers(TABLE):
+        await conn.execute(text(statement))
+    # So do the event cube triggers
+    event_cube = (await conn.execute(text("SELECT to_regclass('geolens.event_cube')"))).scalar_one()
+    for statement in DROP_EVENTS_TRIGGERS:
+        await conn.execute(text(statement))
+
+    await conn.execute(text(f"ALTER TABLE geolens.{TABLE} RENAME TO {LEGACY_TABLE}"))
+    await conn.execute(text(
+        f"ALTER TABLE geolens.{LEGACY_TABLE} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY_TABLE}_pkey"
+    ))
+    for name in [*PARTITIONED_INDEXES, *ADDED_INDEXES]:
+        legacy_name = name.replace(TABLE, LEGACY_TABLE, 1)
+        await conn.execute(text(f"ALTER INDEX IF EXISTS geolens.{name} RENAME TO {legacy_name}"))
+
+    await conn.execute(text(f"ALTER TABLE geolens.{SHADOW_TABLE} RENAME TO {TABLE}"))
+    await conn.execute(text(
+        f"ALTER TABLE geolens.{TABLE} RENAME CONSTRAINT {SHADOW_TABLE}_pkey TO {TABLE}_pkey"
+    ))
+    await conn.execute(text(
+        f"ALTER TABLE geolens.{TABLE} RENAME CONSTRAINT {SHADOW_TABLE}_location_id_fkey "
+        f"TO {TABLE}_location_id_fkey"
+    ))
+    await conn.execute(text(f"ALTER TABLE geolens.{SHADOW_TABLE}_default RENAME TO {TABLE}_default"))
+    for name in PARTITIONED_INDEXES:
+        await conn.execute(text(f"ALTER INDEX geolens.{shadow_index_name(name)} RENAME TO {name}"))
+    for name in ADDED_INDEXES:
+        await conn.execute(text(f"ALTER INDEX IF EXISTS geolens.{shadow_index_name(name)} RENAME TO {name}"))
+
+    await conn.execute(text(f"ALTER SEQUENCE geolens.{TABLE}_id_seq OWNED BY geolens.{TABLE}.id"))
+    await conn.execute(text(f"""
+        CREATE OR REPLACE TRIGGER update_{TABLE}_updated_at
+            BEFORE UPDATE ON geolens.{TABLE}
+            FOR EACH ROW
+            EXECUTE FUNCTION geolens.update_updated_at()
+    """))
+    if change_log:
+        for statement in change_triggers(TABLE):
+            await conn.execute(text(statement))
+    if event_cube:
+        for statement in EVENTS_TRIGGERS:
+            await conn.execute(text(statement))
+
+
+async def migrate_to_partitioned(
+    engine: AsyncEngine,
+    batch_size: int = 5000,
+    span_years: int = 100,
+    progress: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Copy existing events into the partitioned shadow table and swap it in.
+    Each batch locks only its own rows (FOR SHARE) so concurrent writers
+    just wait for that batch; the mirror trigger carries all other writes.
+    Returns the number of rows copied.
+
+    `event_date` is part of the partitioned table's primary key, so events
+    without a date must be given one (or deleted) first.
+    """
+    async with engine.connect() as conn:
+        if await is_partitioned(conn, TABLE):
+            return 0
+        undated = (await conn.execute(text(
+            f"SELECT EXISTS (SELECT FROM geolens.{TABLE} WHERE {PARTITION_KEY} IS NULL)"
+        ))).scalar_one()
+        if undated:
+            raise ValueError(
+                f"geolens.{TABLE} has rows without {PARTITION_KEY}; "
+                "set or delete them before migrating"
+            )
+        bounds = (await conn.execute(text(f"""
+            SELECT extract(year FROM min(event_date))::int, extract(year FROM max(event_date))::int
+            FROM geolens.{TABLE}
+        """))).one()
+        columns = (await conn.execute(text("""
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+            FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass)
+            AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        """), {"table": f"geolens.{SHADOW_TABLE}"})).scalar_one()
+
+    if bounds[0] is not None:
+        await ensure_partitions(engine, bounds[0], bounds[1], span_years, table=SHADOW_TABLE)
+
+    copied, after_id = 0, 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text(f"""
+                    WITH batch AS (
+                        SELECT {columns}
+                        FROM geolens.{TABLE}
+                        WHERE id > :after_id
+                        ORDER BY id
+                        LIMIT :batch_size
+                        FOR SHARE
+                    ), copied AS (
+                        INSERT INTO geolens.{SHADOW_TABLE} ({columns})
+                        SELECT {columns} FROM batch
+                        ON CONFLICT (id, event_date) DO NOTHING
+                    )
+                    SELECT count(*), max(id) FROM batch
+                """),
+                {"after_id": after_id, "batch_size": batch_size}
+            )
+            count, last_id = result.one()
+        if not count:
+            break
+        copied += count
+        after_id = last_id
+        if progress is not None:
+            progress(copied)
+
+    async with engine.begin() as conn:
+        await _swap_tables(conn)
+    logger.info("Swapped in partitioned %s after copying %d rows", TABLE, copied)
+    return copied
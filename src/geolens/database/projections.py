@@ -0,0 +1,77 @@
+"""
+Lightweight result projections for GeoLens queries.
+
+Projections return only the requested columns as named tuples rather than
+fully hydrated ORM objects, so queries skip identity-map bookkeeping and
+never transfer heavy columns (embeddings, JSONB properties) unless asked.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import inspect
+
+from .models import Base
+from .types import to_float32_array
+
+# Columns that are expensive to transfer and are left out unless requested
+HEAVY_COLUMNS = frozenset({"embedding", "properties", "search_vector"})
+
+
+def column_names(model: Type[Base]) -> Tuple[str, ...]:
+    """All mapped column names of a model, in declaration order."""
+    return tuple(attr.key for attr in inspect(model).column_attrs)
+
+
+def default_columns(model: Type[Base]) -> Tuple[str, ...]:
+    """Mapped column names of a model, excluding the heavy columns."""
+    return tuple(name for name in column_names(model) if name not in HEAVY_COLUMNS)
+
+
+def resolve_columns(
+    model: Type[Base],
+    columns: Optional[Sequence[str]] = None,
+    include_embedding: bool = False
+) -> Tuple[str, ...]:
+    """
+    Validate a requested column list against a model.
+    Falls back to the model's light columns when no list is given.
+    """
+    names = tuple(columns) if columns else default_columns(model)
+    available = column_names(model)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(
+            f"Unknown columns for {model.__tablename__}: {', '.join(unknown)}"
+        )
+    if include_embedding:
+        if "embedding" not in available:
+            raise ValueError(f"{model.__tablename__} has no embedding column")
+        if "embedding" not in names:
+            names = names + ("embedding",)
+    return names
+
+
+@lru_cache(maxsize=None)
+def row_type(name: str, columns: Tuple[str, ...]) -> Type[tuple]:
+    """Get a (cached) named tuple type for a set of columns."""
+    return namedtuple(name, columns)
+
+
+def row_factory(name: str, columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], tuple]:
+    """
+    Build a function converting raw result rows into named tuples.
+    Embeddings, when selected, are returned as float32 numpy arrays.
+    """
+    RowType = row_type(name, columns)
+    if "embedding" not in columns:
+        return lambda row: RowType._make(row)
+
+    position = columns.index("embedding")
+
+    def make(row: Sequence[Any]) -> tuple:
+        values = list(row)
+        values[position] = to_float32_array(values[position])
+        return RowType._make(values)
+
+    return make
@@ -0,0 +1,39 @@
+"""
+Full-text search documents and place-name matching.
+
+Each searchable table has a stored generated `search_vector` column built
+from its descriptive text, with names and titles weighted above free text,
+and a GIN index on it. Queries must parse their text with the same
+configuration (`TEXT_SEARCH_CONFIG`) for the index to apply.
+"""
+TEXT_SEARCH_CONFIG = "english"
+
+SEARCH_DOCUMENTS = {
+    "locations": (
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+    ),
+    "architectural_features": (
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(style, '') || ' ' || coalesce(architect, '')), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+    ),
+    "historical_events": (
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(event_type, '')), 'B')"
+    ),
+}
+
+# Parses user input: quoted phrases, OR and -exclusions are supported
+SEARCH_QUERY = f"websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :query)"
+
+# Place names are matched case-insensitively on this expression, which has a
+# trigram GIN index (fuzzy matches) and a text_pattern_ops B-tree (exact and
+# prefix matches)
+def name_key(alias: str = "") -> str:
+    """The name matching expression, optionally qualified by a table alias."""
+    return f"lower({alias + '.' if alias else ''}name)"
+
+NAME_KEY = name_key()
+
+# Least pg_trgm similarity of a fuzzy name match
+NAME_SIMILARITY_THRESHOLD = 0.3
@@ -1,6 +1,9 @@
 """
 Custom SQLAlchemy types for GeoLens.
 """
+from typing import Optional, Union
+
+import numpy as np
 from sqlalchemy.types import TypeDecorator, UserDefinedType
 
 class Vector(UserDefinedType):
@@ -24,4 +27,21 @@ class Vector(UserDefinedType):
             if value is None:
                 return None
             return value
-        return process
\ No newline at end of file
+        return process
+
+def to_float32_array(value: Optional[Union[str, list, np.ndarray]]) -> Optional[np.ndarray]:
+    """
+    Convert a pgvector value to a float32 numpy array.
+    Accepts pgvector's string format ([x,y,z,...]) or any sequence of numbers.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), sep=",", dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+def to_pgvector(value: Union[str, list, np.ndarray]) -> str:
+    """Convert a vector to pgvector's string format: [x,y,z,...]"""
+    if isinstance(value, str):
+        return value
+    return f"[{','.join(str(float(x)) for x in value)}]"
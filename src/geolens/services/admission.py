@@ -0,0 +1,178 @@
+"""
+Admission control for database queries.
+
+`DatabaseService` methods belong to a query class (cheap spatial lookups,
+name search, event aggregates, vector similarity, graph traversal, bulk
+region scans), each with its own concurrency limit, wait queue and
+server-side `statement_timeout` from `Settings.QUERY_CLASSES`. A burst in one class therefore queues behind that
+class's limit instead of taking every pooled connection. Queries that find
+the queue full, or wait longer than the class allows, are shed with
+`QueryShedError`.
+
+Cancelling the calling task cancels the running statement on the server
+(asyncpg sends a cancel request), and the statement timeout stops it even
+when nobody is waiting any more. The timeout is set with `SET LOCAL`, so it
+also applies to later statements in the same transaction until another
+classified query changes it.
+"""
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import QueryClassLimits, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the queue wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+# Set while a classified query runs, so nested calls don't queue a second time
+_admitted: ContextVar[bool] = ContextVar("geolens_admitted", default=False)
+
+
+class QueryShedError(Exception):
+    """A query was rejected by admission control."""
+
+    def __init__(self, query_class: str, reason: str):
+        super().__init__(f"{query_class} query shed: {reason}")
+        self.query_class = query_class
+        self.reason = reason
+
+
+@dataclass
+class QueryClassMetrics:
+    """Counters for one query class since the controller was created."""
+    admitted: int = 0
+    shed_queue_full: int = 0
+    shed_timeout: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    # Admitted queries per WAIT_BUCKETS bucket
+    wait_histogram: List[int] = field(default_factory=lambda: [0] * len(WAIT_BUCKETS))
+
+    def observe_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for index, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_histogram[index] += 1
+                break
+
+
+class _Gate:
+    """Slots and waiters of one query class on one event loop."""
+
+    def __init__(self, limits: QueryClassLimits):
+        self.slots = asyncio.Semaphore(limits.concurrency)
+        self.waiting = 0
+        self.running = 0
+
+
+class AdmissionController:
+    """Per-class concurrency limits with bounded, deadline-limited queues."""
+
+    def __init__(self, limits: Dict[str, QueryClassLimits]):
+        self.limits = dict(limits)
+        self._metrics = {name: QueryClassMetrics() for name in self.limits}
+        # Semaphores belong to one event loop
+        self._gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Gate]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _gate(self, query_class: str) -> _Gate:
+        gates = self._gates.setdefault(asyncio.get_running_loop(), {})
+        if query_class not in gates:
+            gates[query_class] = _Gate(self.limits[query_class])
+        return gates[query_class]
+
+    @asynccontextmanager
+    async def admit(self, query_class: str) -> AsyncIterator[Optional[QueryClassLimits]]:
+        """
+        Hold a slot of `query_class` for the duration of the block, yielding
+        its limits. Classes without limits are admitted at once (yielding None).
+        """
+        limits = self.limits.get(query_class)
+        if limits is None or _admitted.get():
+            yield None
+            return
+
+        gate = self._gate(query_class)
+        metrics = self._metrics[query_class]
+        started = time.perf_counter()
+        if gate.slots.locked():
+            if gate.waiting >= limits.queue_size:
+                metrics.shed_queue_full += 1
+                raise QueryShedError(query_class, f"queue full ({limits.queue_size} waiting)")
+            gate.waiting += 1
+            try:
+                await asyncio.wait_for(gate.slots.acquire(), limits.queue_timeout)
+            except asyncio.TimeoutError:
+                metrics.shed_timeout += 1
+                raise QueryShedError(query_class, f"no slot within {limits.queue_timeout}s") from None
+            finally:
+                gate.waiting -= 1
+        else:
+            await gate.slots.acquire()
+        metrics.observe_wait(time.perf_counter() - started)
+
+        gate.running += 1
+        token = _admitted.set(True)
+        try:
+            yield limits
+        finally:
+            _admitted.reset(token)
+            gate.running -= 1
+            gate.slots.release()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Counters plus current queue depth and running queries per class."""
+        snapshot = {}
+        for name, metrics in self._metrics.items():
+            gates = [gates[name] for gates in list(self._gates.values()) if name in gates]
+            snapshot[name] = {
+                **asdict(metrics),
+                "waiting": sum(gate.waiting for gate in gates),
+                "running": sum(gate.running for gate in gates),
+            }
+        return snapshot
+
+
+async def set_statement_timeout(session: AsyncSession, timeout_ms: int) -> None:
+    """`SET LOCAL statement_timeout`, skipped when the transaction already has it."""
+    transaction = session.get_transaction()
+    if transaction is not None and session.info.get("statement_timeout") == (transaction, timeout_ms):
+        return
+    await session.execute(
+        text("SELECT set_config('statement_timeout', :timeout, true)"),
+        {"timeout": str(timeout_ms)}
+    )
+    session.info["statement_timeout"] = (session.get_transaction(), timeout_ms)
+
+
+def query_class(name: str):
+    """Run a `DatabaseService` method under admission control for class `name`."""
+    def decorate(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            async with self.admission.admit(name) as limits:
+                if limits is not None:
+                    await set_statement_timeout(self.session, limits.statement_timeout_ms)
+                return await method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@functools.lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller built from `Settings.QUERY_CLASSES`."""
+    return AdmissionController(get_settings().QUERY_CLASSES)
@@ -0,0 +1,244 @@
+"""
+In-process place-name autocomplete.
+
+`PlaceNameIndex` keeps every word-suffix of every location name (so "paul"
+completes "St. Paul's Cathedral") in one sorted list and answers a prefix
+with two binary searches. Matches are ranked by popularity: the number of
+relationships a location takes part in plus how often it was picked as a
+suggestion. Short prefixes matching many names are served from a per-prefix
+cache of the most popular locations, kept up to date as entries change.
+
+`PlaceNameAutocomplete` loads the index from the database and refreshes it
+incrementally from the (updated_at, id) watermark, the way vector snapshots
+are refreshed. Deleted locations and relationship counts are picked up by
+the periodic full reload.
+"""
+import asyncio
+import heapq
+import logging
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Re-read this far behind the watermark to catch transactions that committed late
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def normalise_name(name: str) -> str:
+    """Case-folded, accent-free name with punctuation turned into spaces."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    characters = (
+        character if character.isalnum() else " "
+        for character in decomposed if not unicodedata.combining(character)
+    )
+    return " ".join("".join(characters).split())
+
+
+def name_keys(name: str) -> List[str]:
+    """Index keys of a name: the normalised name from each word onwards."""
+    words = normalise_name(name).split()
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+class PlaceNameIndex:
+    """Sorted word-suffix index of place names with popularity ranking."""
+
+    def __init__(self, scan_limit: int = 1000, cache_size: int = 50):
+        # Prefixes matching more keys than this are answered from the cache
+        self.scan_limit = scan_limit
+        self.cache_size = cache_size
+        self._keys: List[Tuple[str, int]] = []
+        self.names: Dict[int, str] = {}
+        self.popularity: Dict[int, float] = {}
+        # Most popular ids per broad prefix, best first
+        self._top: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def build(self, entries: Iterable[Tuple[int, str, float]]) -> None:
+        """Replace the index with (id, name, popularity) entries."""
+        self.names, self.popularity, self._top = {}, {}, {}
+        keys = []
+        for id, name, popularity in entries:
+            self.names[id] = name
+            self.popularity[id] = popularity
+            keys.extend((key, id) for key in name_keys(name))
+        keys.sort()
+        self._keys = keys
+
+    def upsert(self, id: int, name: str, popularity: Optional[float] = None) -> None:
+        """Add or rename a location, keeping its popularity unless one is given."""
+        if popularity is None:
+            popularity = self.popularity.get(id, 0.0)
+        if id in self.names:
+            self.remove(id)
+        self.names[id] = name
+        self.popularity[id] = popularity
+        for key in name_keys(name):
+            insort(self._keys, (key, id))
+            self._promote(key, id)
+
+    def remove(self, id: int) -> None:
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        self.popularity.pop(id, None)
+        for key in name_keys(name):
+            position = bisect_left(self._keys, (key, id))
+            if position < len(self._keys) and self._keys[position] == (key, id):
+                del self._keys[position]
+            self._demote(key, id)
+
+    def record_selection(self, id: int, weight: float = 1.0) -> None:
+        """Count a suggestion being picked towards the location's popularity."""
+        if id not in self.names:
+            return
+        self.popularity[id] += weight
+        for key in name_keys(self.names[id]):
+            self._promote(key, id)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Up to `limit` (id, name) pairs whose name has a word starting with `prefix`."""
+        prefix = normalise_name(prefix)
+        if not prefix or limit < 1:
+            return []
+        start = bisect_left(self._keys, (prefix,))
+        stop = bisect_left(self._keys, (prefix + "\U0010ffff",))
+        if stop - start > self.scan_limit and limit <= self.cache_size:
+            ranked = self._top.get(prefix)
+            if ranked is None:
+                ranked = self._top[prefix] = self._rank(start, stop, self.cache_size)
+            ranked = ranked[:limit]
+        else:
+            ranked = self._rank(start, stop, limit)
+        return [(id, self.names[id]) for id in ranked]
+
+    def _rank(self, start: int, stop: int, limit: int) -> List[int]:
+        ids = {id for _, id in self._keys[start:stop]}
+        return heapq.nsmallest(limit, ids, key=self._order)
+
+    def _order(self, id: int) -> Tuple[float, str, int]:
+        return (-self.popularity[id], self.names[id], id)
+
+    def _cached_prefixes(self, key: str) -> List[str]:
+        return [key[:length] for length in range(1, len(key) + 1) if key[:length] in self._top]
+
+    def _promote(self, key: str, id: int) -> None:
+        """Place `id` in the cached rankings of the key's prefixes if it belongs there."""
+        for prefix in self._cached_prefixes(key):
+            ranked = self._top[prefix]
+            if id in ranked:
+                ranked.remove(id)
+            if len(ranked) < self.cache_size or self._order(id) < self._order(ranked[-1]):
+                insort(ranked, id, key=self._order)
+                del ranked[self.cache_size:]
+
+    def _demote(self, key: str, id: int) -> None:
+        """Drop rankings `id` was part of; they are rebuilt on their next use."""
+        for prefix in self._cached_prefixes(key):
+            if id in self._top[prefix]:
+                del self._top[prefix]
+
+
+class PlaceNameAutocomplete:
+    """`PlaceNameIndex` of all locations, kept current from the database."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        refresh_interval: float = 5.0,
+        reload_interval: float = 3600.0,
+        batch_size: int = 10000
+    ):
+        self.engine = engine
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.batch_size = batch_size
+        self.index = PlaceNameIndex()
+        # Picks recorded here survive reloads
+        self._selections: Dict[int, float] = {}
+        self._watermark: Tuple[Optional[datetime], int] = (None, 0)
+        self._refreshed_at: Optional[float] = None
+        self._loaded_at: Optional[float] = None
+        # One refresh at a time; requests arriving meanwhile wait for it
+        self._refresh_lock = asyncio.Lock()
+
+    async def _fetch(self, since: Optional[datetime]) -> List[tuple]:
+        """Locations changed since `since` (all if None) with their relationship counts."""
+        rows = []
+        after_updated_at, after_id = since, 0
+        async with self.engine.connect() as conn:
+            while True:
+                batch = (await conn.execute(
+                    text("""
+                        SELECT
+                            l.id,
+                            l.name,
+                            l.updated_at,
+                            (SELECT count(*) FROM geolens.relationships r WHERE r.from_location_id = l.id)
+                            + (SELECT count(*) FROM geolens.relationships r WHERE r.to_location_id = l.id)
+                            AS relationships
+                        FROM geolens.locations l
+                        WHERE CAST(:after_updated_at AS timestamptz) IS NULL
+                        OR (l.updated_at, l.id) > (CAST(:after_updated_at AS timestamptz), :after_id)
+                        ORDER BY l.updated_at, l.id
+                        LIMIT :batch_size
+                    """),
+                    {"after_updated_at": after_updated_at, "after_id": after_id, "batch_size": self.batch_size}
+                )).all()
+                rows.extend(batch)
+                if len(batch) < self.batch_size:
+                    break
+                after_updated_at, after_id = batch[-1].updated_at, batch[-1].id
+        return rows
+
+    def _advance(self, rows: List[tuple]) -> None:
+        if rows:
+            self._watermark = (rows[-1].updated_at, rows[-1].id)
+        self._refreshed_at = time.monotonic()
+
+    async def load(self) -> None:
+        """Rebuild the index from every location."""
+        rows = await self._fetch(None)
+        self.index.build(
+            (row.id, row.name, row.relationships + self._selections.get(row.id, 0.0)) for row in rows
+        )
+        self._advance(rows)
+        self._loaded_at = self._refreshed_at
+        logger.info("Loaded %d place names for autocomplete", len(self.index))
+
+    async def refresh(self) -> None:
+        """Apply locations changed since the last refresh, or reload when one is due."""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_interval:
+            await self.load()
+            return
+        since = self._watermark[0] - WATERMARK_OVERLAP if self._watermark[0] else None
+        rows = await self._fetch(since)
+        for row in rows:
+            self.index.upsert(row.id, row.name, row.relationships + self._selections.get(row.id, 0.0))
+        self._advance(rows)
+
+    def _refresh_due(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+    async def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Suggestions for `prefix`, refreshing the index first when it is due."""
+        if self._refresh_due():
+            async with self._refresh_lock:
+                # Another request may have refreshed while this one waited
+                if self._refresh_due():
+                    await self.refresh()
+        return self.index.complete(prefix, limit)
+
+    def record_selection(self, id: int, weight: float = 1.0) -> None:
+        """Rank a location higher after a user picked it."""
+        self._selections[id] = self._selections.get(id, 0.0) + weight
+        self.index.record_selection(id, weight)
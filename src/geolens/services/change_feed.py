@@ -0,0 +1,192 @@
+"""
+Change feed over `locations`, `architectural_features`, `historical_events`
+and `relationships`.
+
+`ChangeFeed` is an async iterator of coalesced batches of `ChangeEvent`s for
+one named consumer, read from the trigger-maintained `geolens.change_log`
+(see `geolens.database.changes`). It wakes on NOTIFY and falls back to
+polling, so a missed notification only delays a batch. The consumer's
+position is stored in the database and advanced once the consumer asks for
+the next batch (or calls `commit`), so processing is at-least-once and
+resumes after a restart.
+
+A transaction that stays open holds back every change committed after it
+started; keep writers' transactions short.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from ..database.changes import CHANGE_TABLES, CHANNEL
+
+logger = logging.getLogger(__name__)
+
+Position = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A row of a tracked table was inserted, updated or deleted."""
+    table: str
+    operation: str
+    row_id: int
+    txid: int
+    change_id: int
+
+
+def coalesce(events: Iterable[ChangeEvent]) -> List[ChangeEvent]:
+    """
+    Collapse events for the same row into one, ordered by each row's last
+    change. Rows inserted and deleted within the batch disappear; a row
+    deleted and re-inserted counts as updated.
+    """
+    first: Dict[Tuple[str, int], str] = {}
+    last: Dict[Tuple[str, int], ChangeEvent] = {}
+    for event in events:
+        key = (event.table, event.row_id)
+        first.setdefault(key, event.operation)
+        last.pop(key, None)
+        last[key] = event
+
+    coalesced = []
+    for key, event in last.items():
+        if event.operation == "DELETE":
+            if first[key] == "INSERT":
+                continue
+            operation = "DELETE"
+        else:
+            operation = "INSERT" if first[key] == "INSERT" else "UPDATE"
+        coalesced.append(ChangeEvent(event.table, operation, event.row_id, event.txid, event.change_id))
+    return coalesced
+
+
+class ChangeFeed:
+    """Resumable stream of row changes for one consumer."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        consumer: str,
+        tables: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+        poll_interval: float = 5.0,
+        gather_delay: float = 0.05
+    ):
+        unknown = set(tables or ()) - set(CHANGE_TABLES)
+        if unknown:
+            raise ValueError(f"Untracked tables: {sorted(unknown)}")
+        self.engine = engine
+        self.consumer = consumer
+        self.tables = set(tables or CHANGE_TABLES)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        # Pause after a wake-up so a burst of commits lands in one batch
+        self.gather_delay = gather_delay
+        # End of the last batch handed out but not yet acknowledged
+        self.pending: Optional[Position] = None
+
+    async def position(self, from_start: bool = False) -> Position:
+        """
+        Stored position of the consumer. A new consumer is registered at the
+        current end of the log, or before its first entry with `from_start`.
+        """
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("""
+                    INSERT INTO geolens.change_feed_consumers (name, txid, change_id)
+                    SELECT :name,
+                        CASE WHEN :from_start THEN 0
+                        ELSE pg_snapshot_xmin(pg_current_snapshot())::text::bigint END,
+                        0
+                    ON CONFLICT (name) DO NOTHING
+                """),
+                {"name": self.consumer, "from_start": from_start}
+            )
+            result = await conn.execute(
+                text("SELECT txid, change_id FROM geolens.change_feed_consumers WHERE name = :name"),
+                {"name": self.consumer}
+            )
+            return tuple(result.one())
+
+    async def acknowledge(self, position: Position) -> None:
+        """Record that every change up to `position` has been processed."""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("""
+                    UPDATE geolens.change_feed_consumers
+                    SET txid = :txid, change_id = :change_id, updated_at = now()
+                    WHERE name = :name
+                """),
+                {"name": self.consumer, "txid": position[0], "change_id": position[1]}
+            )
+
+    async def commit(self) -> None:
+        """Acknowledge the last batch, e.g. before leaving an `async for` loop early."""
+        if self.pending is not None:
+            await self.acknowledge(self.pending)
+            self.pending = None
+
+    async def fetch(self, position: Position) -> List[ChangeEvent]:
+        """Up to `batch_size` raw changes after `position` from finished transactions."""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT table_name, operation, row_id, txid, id
+                    FROM geolens.change_log
+                    WHERE (txid, id) > (:txid, :change_id)
+                    AND txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+                    ORDER BY txid, id
+                    LIMIT :batch_size
+                """),
+                {"txid": position[0], "change_id": position[1], "batch_size": self.batch_size}
+            )
+            return [ChangeEvent(*row) for row in result]
+
+    async def _listen(self, conn: AsyncConnection, wake_up: asyncio.Event) -> Optional[Callable[..., None]]:
+        """
+        Subscribe `wake_up` to change notifications. Returns the listener to
+        remove again, None if the driver cannot listen.
+        """
+        driver_connection = (await conn.get_raw_connection()).driver_connection
+        if not hasattr(driver_connection, "add_listener"):
+            return None
+
+        def listener(*args):
+            wake_up.set()
+
+        await driver_connection.add_listener(CHANNEL, listener)
+        return listener
+
+    async def __aiter__(self) -> AsyncIterator[List[ChangeEvent]]:
+        position = await self.position()
+        wake_up = asyncio.Event()
+        async with self.engine.connect() as conn:
+            listener = await self._listen(conn, wake_up)
+            if listener is None:
+                logger.warning("Driver does not support LISTEN; polling the change log")
+            try:
+                while True:
+                    wake_up.clear()
+                    events = await self.fetch(position)
+                    if events:
+                        batch = coalesce(event for event in events if event.table in self.tables)
+                        position = self.pending = (events[-1].txid, events[-1].change_id)
+                        if batch:
+                            yield batch
+                        await self.commit()
+                        if len(events) == self.batch_size:
+                            continue
+                    try:
+                        await asyncio.wait_for(wake_up.wait(), self.poll_interval)
+                        await asyncio.sleep(self.gather_delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                # The connection goes back to the pool; it must not keep listening
+                if listener is not None:
+                    driver_connection = (await conn.get_raw_connection()).driver_connection
+                    await driver_connection.remove_listener(CHANNEL, listener)
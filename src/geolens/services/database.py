@@ -1,31 +1,133 @@
 """
 Database service for GeoLens.
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Union
 from datetime import datetime
-from sqlalchemy import text, select
+from sqlalchemy import func, text, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database.models import Location, ArchitecturalFeature, HistoricalEvent
+from ..database.cube import BUCKETS as CUBE_BUCKETS, cube_resolution, window_periods
+from ..database.models import Location, ArchitecturalFeature, HistoricalEvent, RegionPart
+from ..database.filters import property_conditions, property_criteria
+from ..database.projections import resolve_columns, row_factory
+from ..database.search import NAME_SIMILARITY_THRESHOLD, SEARCH_QUERY, name_key
+from ..database.types import to_pgvector
+from .admission import AdmissionController, get_admission_controller, query_class
+from .vector_index import apply_search_settings
 
 class DatabaseService:
-    def __init__(self, session: AsyncSession):
+    # Tables searchable by `hybrid_search`, with their result row names
+    HYBRID_SEARCH_TABLES = {
+        "architectural_features": (ArchitecturalFeature, "ArchitecturalFeatureRow"),
+        "historical_events": (HistoricalEvent, "HistoricalEventRow"),
+    }
+
+    # Influences of :location_id up to :max_depth (`influences`), answered from
+    # the materialized closure or, beyond its depth, a recursive traversal
+    INFLUENCE_CTES = """
+        closure AS (
+            SELECT coalesce((SELECT max_depth FROM geolens.influence_closure_settings), 0) AS max_depth
+        ),
+        influence_chain AS (
+            -- Base case: direct influences
+            SELECT 
+                from_location_id,
+                to_location_id,
+                ARRAY[from_location_id] as path,
+                1 as depth,
+                strength
+            FROM geolens.relationships
+            WHERE from_location_id = :location_id
+            AND relationship_type = 'influences'
+            AND :max_depth > (SELECT max_depth FROM closure)
+            
+            UNION ALL
+            
+            -- Recursive case: follow the chain of influence
+            SELECT 
+                r.from_location_id,
+                r.to_location_id,
+                ic.path || r.from_location_id,
+                ic.depth + 1,
+                ic.strength * r.strength
+            FROM geolens.relationships r
+            JOIN influence_chain ic ON r.from_location_id = ic.to_location_id
+            WHERE r.relationship_type = 'influences'
+            AND ic.depth < :max_depth
+            AND NOT r.from_location_id = ANY(ic.path)  -- Prevent cycles
+        ),
+        influences AS (
+            SELECT via_location_id, target_location_id, depth, strength, path
+            FROM geolens.influence_closure
+            WHERE source_location_id = :location_id
+            AND depth <= :max_depth
+            AND :max_depth <= (SELECT max_depth FROM closure)
+
+            UNION ALL
+
+            (
+                SELECT DISTINCT ON (depth, to_location_id)
+                    from_location_id, to_location_id, depth, strength, path || to_location_id
+                FROM influence_chain
+                ORDER BY depth, to_location_id, strength DESC NULLS LAST, from_location_id
+            )
+        )
+    """
+    # The influences with location names along each path
+    INFLUENCE_ROWS = """
+        SELECT 
+            l1.name as from_location,
+            l2.name as to_location,
+            i.depth,
+            i.strength as influence_strength,
+            ARRAY(
+                SELECT l.name
+                FROM unnest(i.path) WITH ORDINALITY AS p(location_id, position)
+                JOIN geolens.locations l ON l.id = p.location_id
+                ORDER BY p.position
+            ) as path
+        FROM influences i
+        JOIN geolens.locations l1 ON i.via_location_id = l1.id
+        JOIN geolens.locations l2 ON i.target_location_id = l2.id
+        ORDER BY i.depth, i.strength DESC
+    """
+
+    def __init__(self, session: AsyncSession, admission: Optional[AdmissionController] = None):
         self.session = session
+        # Query methods are admitted per query class; see geolens.services.admission
+        self.admission = admission or get_admission_controller()
 
+    @query_class("spatial")
     async def find_locations_near(
         self, 
         lat: float, 
         lon: float, 
         distance_meters: float = 5000,
-        limit: int = 10
-    ) -> List[Location]:
-        """Find locations within a specified distance."""
-        query = select(Location).where(
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> Union[List[Location], List[tuple]]:
+        """
+        Find locations within a specified distance.
+        Pass `columns` to get lightweight named tuples instead of ORM objects,
+        and `properties`/`property_path` to filter on attributes
+        (see `geolens.database.filters`).
+        """
+        if columns is None:
+            query = select(Location)
+        else:
+            names = resolve_columns(Location, columns)
+            query = select(*(getattr(Location, name) for name in names))
+
+        query = query.where(
             text(
                 "ST_DWithin(geometry::geography, "
                 "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, "
                 ":distance)"
             )
+        ).where(
+            *property_criteria(Location.properties, properties, property_path)
         ).params(
             lat=lat,
             lon=lon,
@@ -33,26 +135,253 @@ class DatabaseService:
         ).limit(limit)
         
         result = await self.session.execute(query)
-        return list(result.scalars().all())
+        if columns is None:
+            return list(result.scalars().all())
+
+        make_row = row_factory("LocationRow", names)
+        return [make_row(row) for row in result]
+
+    @query_class("spatial")
+    async def find_nearest_locations(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        max_distance_meters: Optional[float] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Find the k nearest locations as (row, distance in meters) pairs,
+        nearest first, using the spatial index for KNN ordering. Optionally
+        only within `max_distance_meters` and filtered on attributes.
+        """
+        names = resolve_columns(Location, columns)
+        select_list = ", ".join(f"l.{name}" for name in names)
+        distance_filter = ""
+        if max_distance_meters is not None:
+            distance_filter = (
+                "AND ST_DWithin(l.geometry, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :max_distance)"
+            )
+        property_filters, filter_params = property_conditions("l", properties, property_path)
+        query = text(f"""
+            SELECT
+                {select_list},
+                ST_Distance(l.geometry, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography) as distance
+            FROM geolens.locations l
+            WHERE true
+            {distance_filter}
+            {property_filters}
+            ORDER BY l.geometry <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography
+            LIMIT :k
+        """)
+
+        params = {"lat": lat, "lon": lon, "k": k, **filter_params}
+        if max_distance_meters is not None:
+            params["max_distance"] = max_distance_meters
+        result = await self.session.execute(query, params)
+
+        make_row = row_factory("LocationRow", names)
+        return [(make_row(row[:-1]), float(row.distance)) for row in result]
+
+    @query_class("spatial")
+    async def find_locations_in_bbox(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        location_type: Optional[str] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None,
+        limit: int = 500,
+        columns: Optional[Sequence[str]] = None
+    ) -> Union[List[Location], List[tuple]]:
+        """
+        Find locations inside a map viewport, filtered by type and attributes
+        in the same query. Box edges are geodesics, as for any geography.
+        """
+        if columns is None:
+            query = select(Location)
+        else:
+            names = resolve_columns(Location, columns)
+            query = select(*(getattr(Location, name) for name in names))
+
+        query = query.where(
+            text(
+                "ST_Intersects(geometry, "
+                "ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)::geography)"
+            ),
+            *property_criteria(Location.properties, properties, property_path)
+        ).params(
+            min_lon=min_lon,
+            min_lat=min_lat,
+            max_lon=max_lon,
+            max_lat=max_lat
+        ).order_by(Location.id).limit(limit)
+        if location_type:
+            query = query.where(Location.location_type == location_type)
+
+        result = await self.session.execute(query)
+        if columns is None:
+            return list(result.scalars().all())
+
+        make_row = row_factory("LocationRow", names)
+        return [make_row(row) for row in result]
+
+    @staticmethod
+    def _region_location_ids(region_id: int, distance_meters: float):
+        """
+        Ids of locations inside a region, or within `distance_meters` of it.
+        Matching runs against the region's small subdivided parts, so every
+        spatial test is an index probe on a bounded geometry.
+        """
+        if distance_meters > 0:
+            condition = func.ST_DWithin(RegionPart.geometry, Location.geometry, distance_meters)
+        else:
+            condition = func.ST_Intersects(RegionPart.geometry, Location.geometry)
+        return select(Location.id).join(RegionPart, condition).where(
+            RegionPart.region_id == region_id
+        )
+
+    @query_class("bulk")
+    async def find_locations_in_region(
+        self,
+        region_id: int,
+        distance_meters: float = 0.0,
+        location_type: Optional[str] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None,
+        limit: int = 500,
+        columns: Optional[Sequence[str]] = None
+    ) -> Union[List[Location], List[tuple]]:
+        """
+        Find locations inside a region (e.g. a district), or within
+        `distance_meters` of it (e.g. along a river or road corridor).
+        """
+        if columns is None:
+            query = select(Location)
+        else:
+            names = resolve_columns(Location, columns)
+            query = select(*(getattr(Location, name) for name in names))
+
+        query = query.where(
+            Location.id.in_(self._region_location_ids(region_id, distance_meters)),
+            *property_criteria(Location.properties, properties, property_path)
+        )
+        if location_type:
+            query = query.where(Location.location_type == location_type)
+        query = query.order_by(Location.id).limit(limit)
+
+        result = await self.session.execute(query)
+        if columns is None:
+            return list(result.scalars().all())
+
+        make_row = row_factory("LocationRow", names)
+        return [make_row(row) for row in result]
+
+    @query_class("bulk")
+    async def find_events_in_region(
+        self,
+        region_id: int,
+        distance_meters: float = 0.0,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None,
+        limit: int = 500,
+        columns: Optional[Sequence[str]] = None
+    ) -> Union[List[HistoricalEvent], List[tuple]]:
+        """Find historical events at locations inside or near a region, in date order."""
+        if columns is None:
+            query = select(HistoricalEvent)
+        else:
+            names = resolve_columns(HistoricalEvent, columns)
+            query = select(*(getattr(HistoricalEvent, name) for name in names))
 
+        query = query.where(
+            HistoricalEvent.location_id.in_(self._region_location_ids(region_id, distance_meters)),
+            *property_criteria(HistoricalEvent.properties, properties, property_path)
+        )
+        if start_date:
+            query = query.where(HistoricalEvent.event_date >= start_date)
+        if end_date:
+            query = query.where(HistoricalEvent.event_date <= end_date)
+        query = query.order_by(HistoricalEvent.event_date).limit(limit)
+
+        result = await self.session.execute(query)
+        if columns is None:
+            return list(result.scalars().all())
+
+        make_row = row_factory("HistoricalEventRow", names)
+        return [make_row(row) for row in result]
+
+    @query_class("bulk")
+    async def find_architecture_in_region(
+        self,
+        region_id: int,
+        distance_meters: float = 0.0,
+        style: Optional[str] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None,
+        limit: int = 500,
+        columns: Optional[Sequence[str]] = None
+    ) -> Union[List[ArchitecturalFeature], List[tuple]]:
+        """Find architectural features at locations inside or near a region."""
+        if columns is None:
+            query = select(ArchitecturalFeature)
+        else:
+            names = resolve_columns(ArchitecturalFeature, columns)
+            query = select(*(getattr(ArchitecturalFeature, name) for name in names))
+
+        query = query.where(
+            ArchitecturalFeature.location_id.in_(self._region_location_ids(region_id, distance_meters)),
+            *property_criteria(ArchitecturalFeature.properties, properties, property_path)
+        )
+        if style:
+            query = query.where(ArchitecturalFeature.style == style)
+        query = query.order_by(ArchitecturalFeature.id).limit(limit)
+
+        result = await self.session.execute(query)
+        if columns is None:
+            return list(result.scalars().all())
+
+        make_row = row_factory("ArchitecturalFeatureRow", names)
+        return [make_row(row) for row in result]
+
+    @query_class("vector")
     async def find_similar_architecture(
         self,
         feature_id: int,
         similarity_threshold: float = 0.7,
-        limit: int = 10
-    ) -> List[tuple[ArchitecturalFeature, float]]:
-        """Find architecturally similar features."""
-        query = text("""
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Find architecturally similar features.
+        Results are named tuples of the requested columns (all light columns by
+        default); embeddings are only returned, as float32 arrays, on request.
+        """
+        names = resolve_columns(ArchitecturalFeature, columns, include_embedding)
+        select_list = ", ".join(f"af.{name}" for name in names)
+        property_filters, filter_params = property_conditions("af", properties, property_path)
+        await apply_search_settings(self.session, "architectural_features")
+        query = text(f"""
             WITH feature AS (
                 SELECT embedding
                 FROM geolens.architectural_features
                 WHERE id = :feature_id
             )
             SELECT 
-                af.*,
+                {select_list},
                 1 - (af.embedding <=> (SELECT embedding FROM feature)) as similarity
             FROM geolens.architectural_features af
             WHERE af.id != :feature_id
+            {property_filters}
             AND 1 - (af.embedding <=> (SELECT embedding FROM feature)) > :threshold
             ORDER BY similarity DESC
             LIMIT :limit
@@ -63,21 +392,86 @@ class DatabaseService:
             {
                 "feature_id": feature_id,
                 "threshold": similarity_threshold,
-                "limit": limit
+                "limit": limit,
+                **filter_params
             }
         )
         
-        return [(row, float(row.similarity)) for row in result]
+        make_row = row_factory("ArchitecturalFeatureRow", names)
+        return [(make_row(row[:-1]), float(row.similarity)) for row in result]
+
+    @query_class("vector")
+    async def find_similar_architecture_by_embedding(
+        self,
+        embedding: Union[str, Sequence[float]],
+        similarity_threshold: float = 0.7,
+        limit: int = 10,
+        exclude_ids: Sequence[int] = (),
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Find features similar to a query embedding (e.g. an embedded search text).
+        Ordered by cosine distance so the vector index can serve the query.
+        """
+        names = resolve_columns(ArchitecturalFeature, columns, include_embedding)
+        select_list = ", ".join(f"af.{name}" for name in names)
+        property_filters, filter_params = property_conditions("af", properties, property_path)
+        await apply_search_settings(self.session, "architectural_features")
+        query = text(f"""
+            SELECT
+                {select_list},
+                1 - (af.embedding <=> CAST(:embedding AS vector)) as similarity
+            FROM geolens.architectural_features af
+            WHERE NOT af.id = ANY(CAST(:exclude_ids AS integer[]))
+            {property_filters}
+            AND 1 - (af.embedding <=> CAST(:embedding AS vector)) > :threshold
+            ORDER BY af.embedding <=> CAST(:embedding AS vector)
+            LIMIT :limit
+        """)
 
+        result = await self.session.execute(
+            query,
+            {
+                "embedding": to_pgvector(embedding),
+                "exclude_ids": list(exclude_ids),
+                "threshold": similarity_threshold,
+                "limit": limit,
+                **filter_params
+            }
+        )
+
+        make_row = row_factory("ArchitecturalFeatureRow", names)
+        return [(make_row(row[:-1]), float(row.similarity)) for row in result]
+
+    @query_class("spatial")
     async def find_historical_timeline(
         self,
         location_id: int,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
-    ) -> List[HistoricalEvent]:
-        """Get historical events for a location within a time range."""
-        query = select(HistoricalEvent).where(
-            HistoricalEvent.location_id == location_id
+        end_date: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> Union[List[HistoricalEvent], List[tuple]]:
+        """
+        Get historical events for a location within a time range.
+        Pass `columns` or `include_embedding` to get lightweight named tuples
+        instead of ORM objects.
+        """
+        projected = columns is not None or include_embedding
+        if projected:
+            names = resolve_columns(HistoricalEvent, columns, include_embedding)
+            query = select(*(getattr(HistoricalEvent, name) for name in names))
+        else:
+            query = select(HistoricalEvent)
+
+        query = query.where(
+            HistoricalEvent.location_id == location_id,
+            *property_criteria(HistoricalEvent.properties, properties, property_path)
         )
 
         if start_date:
@@ -88,67 +482,674 @@ class DatabaseService:
         query = query.order_by(HistoricalEvent.event_date)
         
         result = await self.session.execute(query)
-        return list(result.scalars().all())
+        if not projected:
+            return list(result.scalars().all())
+
+        make_row = row_factory("HistoricalEventRow", names)
+        return [make_row(row) for row in result]
 
+    @query_class("vector")
+    async def find_similar_events(
+        self,
+        event_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        similarity_threshold: float = 0.7,
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Find historical events similar to an event, optionally within a date
+        range. The range is applied as plain bounds on `event_date` so only
+        the partitions covering it are searched.
+        """
+        names = resolve_columns(HistoricalEvent, columns, include_embedding)
+        select_list = ", ".join(f"he.{name}" for name in names)
+        await apply_search_settings(self.session, "historical_events")
+        date_filters = ""
+        if start_date:
+            date_filters += "AND he.event_date >= :start_date\n"
+        if end_date:
+            date_filters += "AND he.event_date <= :end_date\n"
+        property_filters, filter_params = property_conditions("he", properties, property_path)
+        query = text(f"""
+            WITH event AS (
+                SELECT embedding
+                FROM geolens.historical_events
+                WHERE id = :event_id
+            )
+            SELECT
+                {select_list},
+                1 - (he.embedding <=> (SELECT embedding FROM event)) as similarity
+            FROM geolens.historical_events he
+            WHERE he.id != :event_id
+            {date_filters}
+            {property_filters}
+            AND 1 - (he.embedding <=> (SELECT embedding FROM event)) > :threshold
+            ORDER BY similarity DESC
+            LIMIT :limit
+        """)
+
+        params = {
+            "event_id": event_id,
+            "threshold": similarity_threshold,
+            "limit": limit,
+            **filter_params
+        }
+        if start_date:
+            params["start_date"] = start_date
+        if end_date:
+            params["end_date"] = end_date
+        result = await self.session.execute(query, params)
+
+        make_row = row_factory("HistoricalEventRow", names)
+        return [(make_row(row[:-1]), float(row.similarity)) for row in result]
+
+    @query_class("aggregate")
+    async def event_heatmap(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        start_year: int,
+        end_year: int,
+        event_types: Optional[Sequence[str]] = None,
+        resolution: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Event counts per geohash cell in a bounding box and the years
+        `start_year` to `end_year`, busiest first, read from the event cube
+        (see `geolens.database.cube`) instead of the events. Cells count whole
+        when their centre is in the box. `resolution` (geohash length)
+        defaults to the finest keeping the box within `cube.MAX_CELLS` cells.
+        """
+        if resolution is None:
+            resolution = cube_resolution(min_lon, min_lat, max_lon, max_lat)
+        # The window as runs of whole centuries, decades and years
+        periods = window_periods(start_year, end_year)
+        query = text("""
+            SELECT c.cell, c.lon, c.lat, sum(c.event_count) AS events
+            FROM unnest(
+                CAST(:buckets AS varchar[]), CAST(:firsts AS integer[]), CAST(:lasts AS integer[])
+            ) AS w(bucket, first_start, last_start)
+            JOIN geolens.event_cube c
+                ON c.resolution = :resolution
+                AND c.bucket = w.bucket
+                AND c.period_start BETWEEN w.first_start AND w.last_start
+            WHERE c.lon BETWEEN :min_lon AND :max_lon
+            AND c.lat BETWEEN :min_lat AND :max_lat
+            AND (CAST(:event_types AS varchar[]) IS NULL OR c.event_type = ANY(CAST(:event_types AS varchar[])))
+            GROUP BY c.cell, c.lon, c.lat
+            HAVING sum(c.event_count) > 0
+            ORDER BY events DESC, c.cell
+        """)
+
+        result = await self.session.execute(
+            query,
+            {
+                "buckets": [bucket for bucket, _, _ in periods],
+                "firsts": [first for _, first, _ in periods],
+                "lasts": [last for _, _, last in periods],
+                "resolution": resolution,
+                "min_lon": min_lon,
+                "min_lat": min_lat,
+                "max_lon": max_lon,
+                "max_lat": max_lat,
+                "event_types": list(event_types) if event_types is not None else None
+            }
+        )
+        return [
+            {"cell": row.cell, "lon": row.lon, "lat": row.lat, "events": int(row.events)}
+            for row in result
+        ]
+
+    @query_class("aggregate")
+    async def event_trend(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        start_year: int,
+        end_year: int,
+        bucket: str = "decade",
+        event_types: Optional[Sequence[str]] = None,
+        resolution: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Event counts per `bucket` period and event type in a bounding box,
+        for the periods starting in the years `start_year` to `end_year`,
+        read from the event cube like `event_heatmap`.
+        """
+        if bucket not in CUBE_BUCKETS:
+            raise ValueError(f"Unknown bucket {bucket!r}; expected one of {', '.join(CUBE_BUCKETS)}")
+        if resolution is None:
+            resolution = cube_resolution(min_lon, min_lat, max_lon, max_lat)
+        query = text("""
+            SELECT period_start, event_type, sum(event_count) AS events
+            FROM geolens.event_cube
+            WHERE resolution = :resolution
+            AND bucket = :bucket
+            AND period_start BETWEEN :start_year AND :end_year
+            AND lon BETWEEN :min_lon AND :max_lon
+            AND lat BETWEEN :min_lat AND :max_lat
+            AND (CAST(:event_types AS varchar[]) IS NULL OR event_type = ANY(CAST(:event_types AS varchar[])))
+            GROUP BY period_start, event_type
+            HAVING sum(event_count) > 0
+            ORDER BY period_start, event_type
+        """)
+
+        result = await self.session.execute(
+            query,
+            {
+                "resolution": resolution,
+                "bucket": bucket,
+                "start_year": start_year,
+                "end_year": end_year,
+                "min_lon": min_lon,
+                "min_lat": min_lat,
+                "max_lon": max_lon,
+                "max_lat": max_lat,
+                "event_types": list(event_types) if event_types is not None else None
+            }
+        )
+        return [
+            {"period_start": row.period_start, "event_type": row.event_type, "events": int(row.events)}
+            for row in result
+        ]
+
+    @query_class("search")
+    async def search_locations(
+        self,
+        query: str,
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Full-text search over location names and descriptions, as
+        (row, rank) pairs, best first. `query` accepts web search syntax.
+        """
+        names = resolve_columns(Location, columns)
+        select_list = ", ".join(f"l.{name}" for name in names)
+        property_filters, filter_params = property_conditions("l", properties, property_path)
+        result = await self.session.execute(
+            text(f"""
+                SELECT
+                    {select_list},
+                    ts_rank_cd(l.search_vector, {SEARCH_QUERY}, 32) as score
+                FROM geolens.locations l
+                WHERE l.search_vector @@ {SEARCH_QUERY}
+                {property_filters}
+                ORDER BY score DESC, l.id
+                LIMIT :limit
+            """),
+            {"query": query, "limit": limit, **filter_params}
+        )
+
+        make_row = row_factory("LocationRow", names)
+        return [(make_row(row[:-1]), float(row.score)) for row in result]
+
+    @query_class("search")
+    async def resolve_location_names(
+        self,
+        names: Sequence[str],
+        limit: int = 1,
+        min_similarity: float = NAME_SIMILARITY_THRESHOLD,
+        columns: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[tuple[tuple, float]]]:
+        """
+        Resolve many place names in one query. Each name maps to its best
+        `limit` matches as (row, similarity) pairs: case-insensitive exact
+        matches (similarity 1.0), then trigram matches of at least
+        `min_similarity`. Unmatched names map to an empty list.
+        """
+        names = list(dict.fromkeys(names))
+        resolved: Dict[str, List[tuple[tuple, float]]] = {name: [] for name in names}
+        if not names:
+            return resolved
+
+        columns = resolve_columns(Location, columns)
+        select_list = ", ".join(f"l.{name}" for name in columns)
+        # The trigram operator (and so the index) uses this threshold; it is
+        # restored after the query so the rest of the transaction keeps its own
+        previous_threshold = (await self.session.execute(
+            text("""
+                WITH previous AS MATERIALIZED (
+                    SELECT current_setting('pg_trgm.similarity_threshold', true) AS threshold
+                )
+                SELECT threshold, set_config('pg_trgm.similarity_threshold', :threshold, true)
+                FROM previous
+            """),
+            {"threshold": str(min_similarity)}
+        )).scalar()
+        result = await self.session.execute(
+            text(f"""
+                SELECT q.position, m.*
+                FROM unnest(CAST(:names AS text[])) WITH ORDINALITY AS q(name, position)
+                CROSS JOIN LATERAL (
+                    SELECT
+                        {select_list},
+                        l.id AS match_id,
+                        CASE WHEN {name_key('l')} = lower(q.name) THEN 1.0
+                        ELSE similarity({name_key('l')}, lower(q.name)) END AS name_similarity
+                    FROM geolens.locations l
+                    WHERE {name_key('l')} = lower(q.name)
+                    OR {name_key('l')} % lower(q.name)
+                    ORDER BY name_similarity DESC, l.id
+                    LIMIT :limit
+                ) m
+                ORDER BY q.position, m.name_similarity DESC, m.match_id
+            """),
+            {"names": names, "limit": limit}
+        )
+        matches = result.all()
+        # NULL (never set in this session) resets it to the default
+        await self.session.execute(
+            text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+            {"threshold": previous_threshold}
+        )
+
+        make_row = row_factory("LocationRow", columns)
+        for row in matches:
+            resolved[names[row.position - 1]].append((make_row(row[1:-2]), float(row.name_similarity)))
+        return resolved
+
+    async def find_locations_by_name(
+        self,
+        name: str,
+        limit: int = 10,
+        min_similarity: float = NAME_SIMILARITY_THRESHOLD,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[tuple[tuple, float]]:
+        """Locations whose name matches `name` exactly or fuzzily, as (row, similarity) pairs."""
+        return (await self.resolve_location_names([name], limit, min_similarity, columns))[name]
+
+    @query_class("vector")
+    async def hybrid_search(
+        self,
+        query: str,
+        embedding: Union[str, Sequence[float]],
+        table: str = "architectural_features",
+        limit: int = 10,
+        lexical_limit: int = 50,
+        vector_limit: int = 50,
+        fusion: str = "rrf",
+        lexical_weight: float = 1.0,
+        vector_weight: float = 1.0,
+        rrf_k: int = 60,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[tuple[tuple, float]]:
+        """
+        Search by keywords and meaning in one query. `query` is matched
+        against the full-text document (see `geolens.database.search`) and
+        `embedding`, the embedded query text, by cosine distance. Each stage
+        keeps its best `lexical_limit` / `vector_limit` candidates, which are
+        then fused:
+        - "rrf": reciprocal rank fusion, the sum of weight / (rrf_k + rank)
+          over the stages that found a row
+        - "weighted": weighted sum of the normalised text rank and the
+          cosine similarity
+        Returns (row, fused score) pairs, best first.
+        """
+        if table not in self.HYBRID_SEARCH_TABLES:
+            raise ValueError(f"Hybrid search is not available for {table}")
+        if fusion == "rrf":
+            fused_score = (
+                "coalesce(CAST(:lexical_weight AS float8) / (CAST(:rrf_k AS integer) + l.rank), 0) + "
+                "coalesce(CAST(:vector_weight AS float8) / (CAST(:rrf_k AS integer) + s.rank), 0)"
+            )
+        elif fusion == "weighted":
+            fused_score = (
+                "CAST(:lexical_weight AS float8) * coalesce(l.score, 0) + "
+                "CAST(:vector_weight AS float8) * coalesce(s.score, 0)"
+            )
+        else:
+            raise ValueError(f"Unknown fusion method: {fusion}")
+
+        model, row_name = self.HYBRID_SEARCH_TABLES[table]
+        names = resolve_columns(model, columns, include_embedding)
+        select_list = ", ".join(f"t.{name}" for name in names)
+        property_filters, filter_params = property_conditions("t", properties, property_path)
+        await apply_search_settings(self.session, table)
+        result = await self.session.execute(
+            text(f"""
+                WITH lexical AS (
+                    SELECT id, score, row_number() OVER (ORDER BY score DESC, id) AS rank
+                    FROM (
+                        SELECT t.id, ts_rank_cd(t.search_vector, {SEARCH_QUERY}, 32) AS score
+                        FROM geolens.{table} t
+                        WHERE t.search_vector @@ {SEARCH_QUERY}
+                        {property_filters}
+                        ORDER BY score DESC, t.id
+                        LIMIT :lexical_limit
+                    ) matches
+                ),
+                semantic AS (
+                    SELECT id, 1 - distance AS score, row_number() OVER (ORDER BY distance, id) AS rank
+                    FROM (
+                        SELECT t.id, t.embedding <=> CAST(:embedding AS vector) AS distance
+                        FROM geolens.{table} t
+                        WHERE t.embedding IS NOT NULL
+                        {property_filters}
+                        ORDER BY t.embedding <=> CAST(:embedding AS vector)
+                        LIMIT :vector_limit
+                    ) neighbours
+                ),
+                fused AS (
+                    SELECT coalesce(l.id, s.id) AS id, {fused_score} AS score
+                    FROM lexical l
+                    FULL JOIN semantic s ON s.id = l.id
+                )
+                SELECT
+                    {select_list},
+                    f.score
+                FROM fused f
+                JOIN geolens.{table} t ON t.id = f.id
+                ORDER BY f.score DESC, t.id
+                LIMIT :limit
+            """),
+            {
+                "query": query,
+                "embedding": to_pgvector(embedding),
+                "limit": limit,
+                "lexical_limit": lexical_limit,
+                "vector_limit": vector_limit,
+                "lexical_weight": lexical_weight,
+                "vector_weight": vector_weight,
+                "rrf_k": rrf_k,
+                **filter_params
+            }
+        )
+
+        make_row = row_factory(row_name, names)
+        return [(make_row(row[:-1]), float(row.score)) for row in result]
+
+    @query_class("graph")
     async def find_architectural_influences(
         self,
         location_id: int,
-        max_depth: int = 2
+        max_depth: int = 2,
+        min_strength: Optional[float] = None,
+        beam_width: Optional[int] = None,
+        max_fanout: Optional[int] = None,
+        limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Find architectural influences using graph traversal."""
+        """
+        Find architectural influences using graph traversal.
+        Without pruning options this is answered from the materialized
+        influence closure, with one row per reached location and depth for its
+        strongest path; depths beyond the closure's maximum fall back to a
+        recursive traversal. Any pruning option switches to a pruned traversal
+        (see `_traverse_influences`). Each result includes the full path of
+        location names from `location_id` to the influenced location.
+        """
+        if any(option is not None for option in (min_strength, beam_width, max_fanout, limit)):
+            result = await self._traverse_influences(
+                location_id, max_depth, min_strength, beam_width, max_fanout, limit
+            )
+            return self._influence_rows(result)
+
+        query = text(f"""
+        WITH RECURSIVE {self.INFLUENCE_CTES}
+        {self.INFLUENCE_ROWS}
+        """)
+
+        result = await self.session.execute(
+            query, 
+            {
+                "location_id": location_id,
+                "max_depth": max_depth
+            }
+        )
+        
+        return self._influence_rows(result)
+
+    async def _traverse_influences(
+        self,
+        location_id: int,
+        max_depth: int,
+        min_strength: Optional[float],
+        beam_width: Optional[int],
+        max_fanout: Optional[int],
+        limit: Optional[int]
+    ):
+        """
+        Influence traversal pruned while it runs, level by level:
+        - `max_fanout` follows only each location's strongest outgoing edges
+        - `min_strength` drops paths whose compound strength falls below it
+          (strengths are at most 1, so a path never recovers)
+        - `beam_width` keeps only the strongest paths at each depth
+        - `limit` stops the traversal once that many paths were produced,
+          shallowest and strongest first
+        Unlike the closure, every surviving path is returned.
+        """
         query = text("""
         WITH RECURSIVE influence_chain AS (
-            -- Base case: direct influences
-            SELECT 
-                from_location_id,
-                to_location_id,
-                ARRAY[from_location_id] as path,
-                1 as depth,
-                strength
-            FROM geolens.relationships
-            WHERE from_location_id = :location_id
-            AND relationship_type = 'influences'
-            
+            -- Base case: the strongest direct influences
+            SELECT from_location_id, to_location_id, path, depth, strength
+            FROM (
+                SELECT 
+                    from_location_id,
+                    to_location_id,
+                    ARRAY[from_location_id] as path,
+                    1 as depth,
+                    strength
+                FROM geolens.relationships
+                WHERE from_location_id = :location_id
+                AND relationship_type = 'influences'
+                AND (CAST(:min_strength AS float8) IS NULL OR strength >= :min_strength)
+                ORDER BY strength DESC NULLS LAST
+                LIMIT least(CAST(:max_fanout AS integer), CAST(:beam_width AS integer))
+            ) direct
+
             UNION ALL
-            
-            -- Recursive case: follow the chain of influence
-            SELECT 
-                r.from_location_id,
-                r.to_location_id,
-                ic.path || r.from_location_id,
-                ic.depth + 1,
-                ic.strength * r.strength
-            FROM geolens.relationships r
-            JOIN influence_chain ic ON r.from_location_id = ic.to_location_id
-            WHERE r.relationship_type = 'influences'
-            AND ic.depth < :max_depth
-            AND NOT r.from_location_id = ANY(ic.path)  -- Prevent cycles
+
+            -- Recursive case: expand the frontier, keeping the best `beam_width` paths
+            SELECT from_location_id, to_location_id, path, depth, strength
+            FROM (
+                SELECT 
+                    r.from_location_id,
+                    r.to_location_id,
+                    ic.path || r.from_location_id as path,
+                    ic.depth + 1 as depth,
+                    ic.strength * r.strength as strength,
+                    row_number() OVER (ORDER BY ic.strength * r.strength DESC NULLS LAST) as rank
+                FROM influence_chain ic
+                CROSS JOIN LATERAL (
+                    SELECT from_location_id, to_location_id, strength
+                    FROM geolens.relationships
+                    WHERE from_location_id = ic.to_location_id
+                    AND relationship_type = 'influences'
+                    AND (CAST(:min_strength AS float8) IS NULL OR ic.strength * strength >= :min_strength)
+                    ORDER BY strength DESC NULLS LAST
+                    LIMIT CAST(:max_fanout AS integer)
+                ) r
+                WHERE ic.depth < :max_depth
+                AND NOT ic.to_location_id = ANY(ic.path)  -- Prevent cycles
+            ) expanded
+            WHERE CAST(:beam_width AS integer) IS NULL OR rank <= :beam_width
+        ),
+        influences AS (
+            SELECT * FROM influence_chain LIMIT CAST(:limit AS integer)
         )
         SELECT 
             l1.name as from_location,
             l2.name as to_location,
-            ic.depth,
-            ic.strength as influence_strength
-        FROM influence_chain ic
-        JOIN geolens.locations l1 ON ic.from_location_id = l1.id
-        JOIN geolens.locations l2 ON ic.to_location_id = l2.id
-        ORDER BY ic.depth, ic.strength DESC
+            i.depth,
+            i.strength as influence_strength,
+            ARRAY(
+                SELECT l.name
+                FROM unnest(i.path || i.to_location_id) WITH ORDINALITY AS p(location_id, position)
+                JOIN geolens.locations l ON l.id = p.location_id
+                ORDER BY p.position
+            ) as path
+        FROM influences i
+        JOIN geolens.locations l1 ON i.from_location_id = l1.id
+        JOIN geolens.locations l2 ON i.to_location_id = l2.id
+        ORDER BY i.depth, i.strength DESC
         """)
 
-        result = await self.session.execute(
-            query, 
+        return await self.session.execute(
+            query,
             {
                 "location_id": location_id,
-                "max_depth": max_depth
+                "max_depth": max_depth,
+                "min_strength": min_strength,
+                "beam_width": beam_width,
+                "max_fanout": max_fanout,
+                "limit": limit
             }
         )
-        
+
+    @query_class("graph")
+    async def find_influence_paths(
+        self,
+        source_location_id: int,
+        target_location_id: int,
+        max_depth: int = 4,
+        limit: int = 5,
+        min_strength: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the `limit` strongest influence paths from one location to another.
+
+        Bidirectional search: partial paths grow forwards from the source over
+        outgoing edges and backwards from the target over incoming edges, one
+        level at a time on whichever side has the smaller frontier, and are
+        joined where they meet. Strengths are at most 1, so once `limit` paths
+        are known, partial paths weaker than the weakest of them are dropped;
+        the search stops when no partial path is left or the two sides
+        together span `max_depth`. Each side keeps the `limit` strongest
+        partial paths into a location. Edges without a strength count as 0.
+        Rows are shaped like those of `find_architectural_influences`,
+        strongest first.
+        """
+        if source_location_id == target_location_id or max_depth < 1 or limit < 1:
+            return []
+
+        # Partial paths by the location at their open end:
+        # forwards source..location, backwards location..target
+        sides = {
+            True: {source_location_id: [((source_location_id,), 1.0)]},
+            False: {target_location_id: [((target_location_id,), 1.0)]},
+        }
+        frontiers = {forwards: dict(partials) for forwards, partials in sides.items()}
+        found: Dict[tuple, float] = {}
+
+        def weakest() -> float:
+            """Strength a partial path needs to still matter."""
+            bound = min_strength or 0.0
+            if len(found) >= limit:
+                bound = max(bound, sorted(found.values(), reverse=True)[limit - 1])
+            return bound
+
+        for _ in range(max_depth):
+            if not frontiers[True] and not frontiers[False]:
+                break
+            forwards = bool(frontiers[True]) and (
+                not frontiers[False] or len(frontiers[True]) <= len(frontiers[False])
+            )
+            frontier, partials, opposite = frontiers[forwards], sides[forwards], sides[not forwards]
+            # A forward path ends at the target and a backward one starts at the source
+            end = target_location_id if forwards else source_location_id
+
+            bound = weakest()
+            grown: Dict[int, List[tuple]] = {}
+            for near, far, strength in await self._influence_edges(list(frontier), forwards, min_strength):
+                for path, path_strength in frontier[near]:
+                    if far in path or path_strength * strength < bound:
+                        continue
+                    extended = path + (far,) if forwards else (far,) + path
+                    grown.setdefault(far, []).append((extended, path_strength * strength))
+
+            frontier = {}
+            for location_id, paths in grown.items():
+                kept = sorted(partials.get(location_id, []) + paths, key=lambda partial: -partial[1])[:limit]
+                partials[location_id] = kept
+                new = [partial for partial in kept if partial in paths]
+                for path, strength in new:
+                    # Join with the other side's partial paths meeting this one
+                    for other_path, other_strength in opposite.get(location_id, []):
+                        if len(set(path) & set(other_path)) > 1:
+                            continue
+                        joined = path + other_path[1:] if forwards else other_path + path[1:]
+                        found[joined] = strength * other_strength
+                if location_id != end:
+                    frontier[location_id] = new
+
+            frontiers[forwards] = frontier
+            bound = weakest()
+            for side in frontiers.values():
+                for location_id in list(side):
+                    side[location_id] = [partial for partial in side[location_id] if partial[1] >= bound]
+                    if not side[location_id]:
+                        del side[location_id]
+
+        paths = sorted(
+            ((path, strength) for path, strength in found.items() if strength >= (min_strength or 0.0)),
+            key=lambda item: (-item[1], len(item[0]))
+        )[:limit]
+        if not paths:
+            return []
+        result = await self.session.execute(
+            text("SELECT id, name FROM geolens.locations WHERE id = ANY(CAST(:ids AS integer[]))"),
+            {"ids": list({location_id for path, _ in paths for location_id in path})}
+        )
+        names = dict(result.all())
+        return [
+            {
+                "from_location": names[path[-2]],
+                "to_location": names[path[-1]],
+                "depth": len(path) - 1,
+                "influence_strength": strength,
+                "path": [names[location_id] for location_id in path]
+            }
+            for path, strength in paths
+        ]
+
+    async def _influence_edges(
+        self,
+        location_ids: List[int],
+        outgoing: bool,
+        min_strength: Optional[float]
+    ) -> List[tuple]:
+        """
+        (frontier location, neighbour, strength) for the `influences` edges
+        leaving (or with `outgoing` False, entering) the locations, strongest
+        per pair. Served by the from- and to-location indexes respectively.
+        """
+        near, far = ("from_location_id", "to_location_id") if outgoing else ("to_location_id", "from_location_id")
+        result = await self.session.execute(
+            text(f"""
+                SELECT {near} AS near, {far} AS far, max(coalesce(strength, 0)) AS strength
+                FROM geolens.relationships
+                WHERE {near} = ANY(CAST(:location_ids AS integer[]))
+                AND relationship_type = 'influences'
+                AND (CAST(:min_strength AS float8) IS NULL OR coalesce(strength, 0) >= :min_strength)
+                GROUP BY {near}, {far}
+            """),
+            {"location_ids": location_ids, "min_strength": min_strength}
+        )
+        return [(row.near, row.far, float(row.strength)) for row in result]
+
+    @staticmethod
+    def _influence_rows(result) -> List[Dict[str, Any]]:
         return [
             {
                 "from_location": row.from_location,
                 "to_location": row.to_location,
                 "depth": row.depth,
-                "influence_strength": float(row.influence_strength)
+                "influence_strength": float(row.influence_strength),
+                "path": list(row.path)
             }
             for row in result
         ]
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""
+Location dossier: everything a location page shows, fetched at once.
+
+A dossier holds the location, locations nearby, its historical timeline,
+architecture similar to its features and the locations it influenced.
+
+`location_dossier` first reads what the sections share (the location row and
+the embedding of its first embedded feature) in one query, then runs each
+section on its own pooled session concurrently, so the page waits for the
+slowest query rather than the sum of all of them. Sections still running at
+the deadline are cancelled (which cancels their statements on the server)
+and reported in `missing`, as are sections that failed; the rest are
+returned.
+
+`single_query_dossier` builds the same dossier in one statement and one
+round trip, as JSON. It avoids the extra connections, but a slow section
+delays the whole dossier.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .admission import AdmissionController, get_admission_controller, set_statement_timeout
+from .database import DatabaseService
+from .vector_index import apply_search_settings
+
+logger = logging.getLogger(__name__)
+
+NEARBY_COLUMNS = ("id", "name", "location_type")
+TIMELINE_COLUMNS = ("id", "event_date", "event_type", "description")
+SIMILAR_COLUMNS = ("id", "location_id", "style", "architect", "year_built")
+
+SHARED_LOOKUP = text("""
+    SELECT
+        l.id,
+        l.name,
+        l.description,
+        l.location_type,
+        ST_Y(l.geometry::geometry) AS lat,
+        ST_X(l.geometry::geometry) AS lon,
+        f.id AS feature_id,
+        f.embedding::text AS embedding
+    FROM geolens.locations l
+    LEFT JOIN LATERAL (
+        SELECT id, embedding
+        FROM geolens.architectural_features
+        WHERE location_id = l.id
+        AND embedding IS NOT NULL
+        ORDER BY id
+        LIMIT 1
+    ) f ON true
+    WHERE l.id = :location_id
+""")
+
+SINGLE_QUERY = text(f"""
+    WITH RECURSIVE {DatabaseService.INFLUENCE_CTES},
+    location AS (
+        SELECT
+            id, name, description, location_type, geometry,
+            ST_Y(geometry::geometry) AS lat,
+            ST_X(geometry::geometry) AS lon
+        FROM geolens.locations
+        WHERE id = :location_id
+    ),
+    feature AS (
+        SELECT id, embedding
+        FROM geolens.architectural_features
+        WHERE location_id = :location_id
+        AND embedding IS NOT NULL
+        ORDER BY id
+        LIMIT 1
+    )
+    SELECT
+        (
+            SELECT row_to_json(l)
+            FROM (SELECT id, name, description, location_type, lat, lon FROM location) l
+        ) AS location,
+        (
+            SELECT coalesce(json_agg(n), '[]')
+            FROM location l
+            CROSS JOIN LATERAL (
+                SELECT {', '.join(f'n.{name}' for name in NEARBY_COLUMNS)}
+                FROM geolens.locations n
+                WHERE ST_DWithin(n.geometry::geography, l.geometry::geography, :distance)
+                AND n.id <> l.id
+                LIMIT :nearby_limit
+            ) n
+        ) AS nearby,
+        (
+            SELECT coalesce(json_agg(e ORDER BY e.event_date), '[]')
+            FROM (
+                SELECT {', '.join(TIMELINE_COLUMNS)}
+                FROM geolens.historical_events
+                WHERE location_id = :location_id
+            ) e
+        ) AS timeline,
+        (
+            SELECT coalesce(json_agg(a), '[]')
+            FROM feature f
+            CROSS JOIN LATERAL (
+                SELECT
+                    {', '.join(f'af.{name}' for name in SIMILAR_COLUMNS)},
+                    1 - (af.embedding <=> f.embedding) AS similarity
+                FROM geolens.architectural_features af
+                WHERE af.id <> f.id
+                AND 1 - (af.embedding <=> f.embedding) > :threshold
+                ORDER BY af.embedding <=> f.embedding
+                LIMIT :similar_limit
+            ) a
+        ) AS similar_architecture,
+        (
+            SELECT coalesce(json_agg(i), '[]')
+            FROM ({DatabaseService.INFLUENCE_ROWS}) i
+        ) AS influences
+""")
+
+
+@dataclass
+class LocationDossier:
+    """A location with the sections of its page; a section is None when missing."""
+    location: Dict[str, Any]
+    nearby: Optional[List[Dict[str, Any]]] = None
+    timeline: Optional[List[Dict[str, Any]]] = None
+    similar_architecture: Optional[List[Dict[str, Any]]] = None
+    influences: Optional[List[Dict[str, Any]]] = None
+    # Why each missing section is missing
+    missing: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+async def location_dossier(
+    location_id: int,
+    deadline: float = 1.0,
+    nearby_distance: float = 5000,
+    nearby_limit: int = 10,
+    similar_limit: int = 10,
+    similarity_threshold: float = 0.7,
+    influence_depth: int = 2,
+    session_factory: Optional[async_sessionmaker] = None,
+    admission: Optional[AdmissionController] = None
+) -> Optional[LocationDossier]:
+    """
+    Dossier of a location, with its sections fetched concurrently on
+    separate sessions from `session_factory` (default: the application's)
+    within `deadline` seconds. Returns None for an unknown location.
+    """
+    if session_factory is None:
+        from ..database.engine import async_session_factory as session_factory
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+
+    async with session_factory() as session:
+        shared = (await asyncio.wait_for(
+            session.execute(SHARED_LOOKUP, {"location_id": location_id}), deadline
+        )).one_or_none()
+    if shared is None:
+        return None
+
+    async def nearby(db: DatabaseService) -> List[Dict[str, Any]]:
+        if shared.lat is None:
+            return []
+        rows = await db.find_locations_near(
+            shared.lat, shared.lon, nearby_distance, nearby_limit + 1, columns=NEARBY_COLUMNS
+        )
+        return [row._asdict() for row in rows if row.id != location_id][:nearby_limit]
+
+    async def timeline(db: DatabaseService) -> List[Dict[str, Any]]:
+        rows = await db.find_historical_timeline(location_id, columns=TIMELINE_COLUMNS)
+        return [row._asdict() for row in rows]
+
+    async def similar_architecture(db: DatabaseService) -> List[Dict[str, Any]]:
+        if shared.embedding is None:
+            return []
+        # The shared embedding saves find_similar_architecture looking it up again
+        rows = await db.find_similar_architecture_by_embedding(
+            shared.embedding,
+            similarity_threshold,
+            similar_limit,
+            exclude_ids=[shared.feature_id],
+            columns=SIMILAR_COLUMNS
+        )
+        return [{**row._asdict(), "similarity": similarity} for row, similarity in rows]
+
+    async def influences(db: DatabaseService) -> List[Dict[str, Any]]:
+        return await db.find_architectural_influences(location_id, influence_depth)
+
+    sections: Dict[str, Callable[[DatabaseService], Awaitable[List[Dict[str, Any]]]]] = {
+        "nearby": nearby,
+        "timeline": timeline,
+        "similar_architecture": similar_architecture,
+        "influences": influences,
+    }
+
+    async def run(section: Callable[[DatabaseService], Awaitable[List[Dict[str, Any]]]]):
+        async with session_factory() as session:
+            return await section(DatabaseService(session, admission))
+
+    tasks = {name: asyncio.create_task(run(section)) for name, section in sections.items()}
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(0.0, expires - loop.time()))
+    for task in pending:
+        task.cancel()
+    # Let cancelled sections release their connections before returning
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    dossier = LocationDossier(location={
+        name: getattr(shared, name) for name in ("id", "name", "description", "location_type", "lat", "lon")
+    })
+    for name, task in tasks.items():
+        if task in pending:
+            dossier.missing[name] = f"no result within {deadline}s"
+        elif task.exception() is not None:
+            logger.warning("Dossier section %s of location %d failed: %s", name, location_id, task.exception())
+            dossier.missing[name] = str(task.exception())
+        else:
+            setattr(dossier, name, task.result())
+    return dossier
+
+
+async def single_query_dossier(
+    session: AsyncSession,
+    location_id: int,
+    nearby_distance: float = 5000,
+    nearby_limit: int = 10,
+    similar_limit: int = 10,
+    similarity_threshold: float = 0.7,
+    influence_depth: int = 2,
+    admission: Optional[AdmissionController] = None
+) -> Optional[LocationDossier]:
+    """
+    Dossier of a location from one statement, admitted as a graph query.
+    Values come back as decoded JSON (dates as ISO strings). Returns None for an
+    unknown location.
+    """
+    async with (admission or get_admission_controller()).admit("graph") as limits:
+        if limits is not None:
+            await set_statement_timeout(session, limits.statement_timeout_ms)
+        await apply_search_settings(session, "architectural_features")
+        row = (await session.execute(
+            SINGLE_QUERY,
+            {
+                "location_id": location_id,
+                "distance": nearby_distance,
+                "nearby_limit": nearby_limit,
+                "similar_limit": similar_limit,
+                "threshold": similarity_threshold,
+                "max_depth": influence_depth,
+            }
+        )).one()
+    if row.location is None:
+        return None
+    return LocationDossier(
+        location=row.location,
+        nearby=row.nearby,
+        timeline=row.timeline,
+        similar_architecture=row.similar_architecture,
+        influences=row.influences,
+    )
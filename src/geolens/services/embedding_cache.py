@@ -0,0 +1,317 @@
+"""
+Persistent, content-addressed cache of text embeddings.
+
+Entries are keyed by the SHA-256 of the model name and the normalised text
+(NFC, whitespace collapsed). Lookups go through two tiers:
+
+* an in-process LRU of the most recently used vectors, and
+* an optional on-disk tier shared by every process on the host: a
+  memory-mapped float32 file of fixed capacity holding the vectors, and a
+  SQLite index mapping keys to slots with a checksum and last use time.
+
+When the vector file is full, the least recently used slots are evicted in
+batches. Writers serialise on the SQLite write lock; each vector is written
+before its index entry is committed, and readers verify the checksum, so a
+slot being reused under a reader shows up as a miss, never a wrong vector.
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from ..database.types import to_pgvector
+from .embedding_pool import EmbeddingPool
+
+if TYPE_CHECKING:
+    from .embeddings import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Keys per SQLite `IN (...)` lookup
+LOOKUP_BATCH_SIZE = 500
+
+# Seconds before a disk hit refreshes the entry's last use time again
+TOUCH_INTERVAL = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    checksum INTEGER NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def normalise_text(text: str) -> str:
+    """Unicode NFC with runs of whitespace collapsed to one space."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Key of `text` (normalised) embedded by `model_name`."""
+    return hashlib.sha256(f"{model_name}\0{normalise_text(text)}".encode("utf-8")).digest()
+
+
+def _checksum(vector: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """Lookup counters of one cache instance since it was created."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    # Entries evicted from the disk tier by this process
+    evictions: int = 0
+
+
+class EmbeddingCache:
+    """Two-tier cache of embeddings of one model."""
+
+    def __init__(
+        self,
+        model_name: str,
+        dimension: int,
+        directory: Optional[Union[str, Path]] = None,
+        memory_entries: int = 10000,
+        disk_entries: int = 1000000,
+        eviction_batch: Optional[int] = None
+    ):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = EmbeddingCacheStats()
+        self._index: Optional[sqlite3.Connection] = None
+        self._vectors: Optional[np.memmap] = None
+        if directory is not None:
+            self._open_disk_tier(Path(directory), disk_entries)
+        self.eviction_batch = eviction_batch or max(1, self.capacity // 100)
+
+    def _open_disk_tier(self, directory: Path, disk_entries: int) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{re.sub(r'[^A-Za-z0-9._-]+', '_', self.model_name)}-{self.dimension}"
+        self._index = sqlite3.connect(
+            directory / f"{name}.sqlite", timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute("PRAGMA synchronous=NORMAL")
+        self._index.executescript(SCHEMA)
+
+        # The file only ever grows, so processes configured differently agree on slots
+        path = directory / f"{name}.f32"
+        row_bytes = self.dimension * 4
+        with open(path, "ab") as file:
+            if file.tell() < disk_entries * row_bytes:
+                file.truncate(disk_entries * row_bytes)
+        rows = path.stat().st_size // row_bytes
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, self.dimension))
+
+    @property
+    def capacity(self) -> int:
+        """Vectors the disk tier can hold (0 without one)."""
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Cached vectors of `keys`, None for misses."""
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[position] = vector
+                    self._stats.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(position)
+
+            if missing and self._index is not None:
+                for key, vector in self._read_disk(list(missing)).items():
+                    self._remember(key, vector)
+                    for position in missing.pop(key):
+                        found[position] = vector
+                        self._stats.disk_hits += 1
+            self._stats.misses += sum(len(positions) for positions in missing.values())
+        return found
+
+    def put_many(self, keys: Sequence[bytes], vectors: Union[np.ndarray, Sequence[np.ndarray]]) -> None:
+        """Store vectors in both tiers; keys already on disk are left as they are."""
+        entries = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(keys, vectors)}
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+            if self._index is not None and self.capacity:
+                self._write_disk(entries)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        return self.get_many([key])[0]
+
+    def put(self, key: bytes, vector: np.ndarray) -> None:
+        self.put_many([key], [vector])
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current entry counts of both tiers."""
+        with self._lock:
+            disk_entries = 0
+            if self._index is not None:
+                disk_entries = self._index.execute("SELECT count(*) FROM entries").fetchone()[0]
+            return {
+                **asdict(self._stats),
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_capacity": self.capacity,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        now = time.time()
+        stale = []
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            rows = self._index.execute(
+                f"SELECT key, slot, checksum, last_used FROM entries "
+                f"WHERE key IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            for key, slot, checksum, last_used in rows:
+                vector = np.array(self._vectors[slot])
+                # A mismatch means the slot was reused after the index was read
+                if _checksum(vector) != checksum:
+                    continue
+                found[key] = vector
+                if now - last_used > TOUCH_INTERVAL:
+                    stale.append(key)
+        if stale:
+            self._index.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in stale])
+        return found
+
+    def _write_disk(self, entries: Dict[bytes, np.ndarray]) -> None:
+        index = self._index
+        index.execute("BEGIN IMMEDIATE")
+        try:
+            keys = list(entries)
+            existing = set()
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                existing.update(row[0] for row in index.execute(
+                    f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+                ))
+            # A batch larger than the disk tier only keeps its first `capacity`
+            # new vectors on disk; the overflow stays in the memory tier
+            new_keys = [key for key in keys if key not in existing][:self.capacity]
+            now = time.time()
+            rows = []
+            for key in new_keys:
+                slot = self._allocate_slot()
+                self._vectors[slot] = entries[key]
+                rows.append((key, slot, _checksum(entries[key]), now))
+            if rows:
+                # Vectors must be in place before their entries become visible
+                self._vectors.flush()
+                index.executemany(
+                    "INSERT INTO entries (key, slot, checksum, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+            index.execute("COMMIT")
+        except BaseException:
+            index.execute("ROLLBACK")
+            raise
+
+    def _allocate_slot(self) -> int:
+        """A free slot, evicting the least recently used entries if there is none."""
+        index = self._index
+        row = index.execute(
+            "DELETE FROM free_slots WHERE slot = (SELECT min(slot) FROM free_slots) RETURNING slot"
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        row = index.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()
+        next_slot = 0 if row is None else row[0]
+        if next_slot < self.capacity:
+            index.execute(
+                "INSERT INTO meta (name, value) VALUES ('next_slot', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                (next_slot + 1,)
+            )
+            return next_slot
+        evicted = index.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?) RETURNING slot",
+            (self.eviction_batch,)
+        ).fetchall()
+        self._stats.evictions += len(evicted)
+        logger.debug("Evicted %d embeddings from the disk cache", len(evicted))
+        index.executemany("INSERT INTO free_slots (slot) VALUES (?)", evicted[1:])
+        return evicted[0][0]
+
+
+class CachedEmbeddingService:
+    """
+    `EmbeddingService` (or `EmbeddingPool`) behind an `EmbeddingCache`,
+    embedding only misses.
+    """
+
+    def __init__(self, service: Union["EmbeddingService", EmbeddingPool], cache: EmbeddingCache):
+        self.service = service
+        self.cache = cache
+        self.dimension = service.dimension
+        if isinstance(service, EmbeddingPool):
+            # Misses are spread over the pool's worker processes
+            self.model = None
+            self._encode_misses = service.encode
+        else:
+            self.model = service.model
+            self._encode_misses = service.model.encode
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings of `texts` as a float32 array, computing each distinct miss once."""
+        keys = [cache_key(self.cache.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, normalise_text(text))
+        if missing:
+            computed = np.asarray(self._encode_misses(list(missing.values())), dtype=np.float32)
+            self.cache.put_many(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.vstack(vectors) if vectors else np.empty((0, self.dimension), dtype=np.float32)
+
+    def get_embedding(self, text: str) -> str:
+        """Embedding of `text` in pgvector's string format."""
+        return to_pgvector(self.encode([text])[0])
+
+    def get_batch_embeddings(self, texts: List[str]) -> List[str]:
+        """Embeddings of `texts` in pgvector's string format."""
+        return [to_pgvector(vector) for vector in self.encode(texts)]
@@ -0,0 +1,140 @@
+"""
+Multi-process embedding for large backfills.
+
+`EmbeddingService` runs one model in the calling process. `EmbeddingPool`
+spreads a batch of texts over worker processes instead, each loading its own
+copy of the model with a fixed number of intra-op threads so the workers
+don't oversubscribe the cores. Workers write their vectors straight into a
+shared float32 array at their chunk's offset, so the result comes back in
+input order without pickling vectors through the pool.
+
+The pool is a drop-in replacement for `EmbeddingService` wherever only
+`get_batch_embeddings` is used, e.g. `reembed`. On its own it bypasses the
+embedding cache; wrap it in `CachedEmbeddingService` so only cache misses
+reach the workers, as `geolens reembed --workers` does.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+
+from ..database.types import to_pgvector
+
+logger = logging.getLogger(__name__)
+
+# Model of the current worker process
+_service = None
+
+
+def _init_worker(model_name: str, threads: int, service_factory: Optional[Callable[[str], Any]]) -> None:
+    """Pin the worker's thread pools, then load its model copy."""
+    global _service
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    # Tokenizer threads would compete with the other workers
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if service_factory is None:
+        from .embeddings import EmbeddingService
+        service_factory = EmbeddingService
+    _service = service_factory(model_name)
+
+
+def _dimension() -> int:
+    return _service.dimension
+
+
+def _encode_chunk(shm_name: str, shape: tuple, start: int, texts: List[str]) -> int:
+    """Encode `texts` into rows `start:` of the shared array. Returns the row count."""
+    shm = SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        output[start:start + len(texts)] = _service.model.encode(texts, convert_to_numpy=True)
+        del output
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EmbeddingPool:
+    """Embedding model replicated across worker processes."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        model_name: str = "all-MiniLM-L6-v2",
+        chunk_size: int = 64,
+        service_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        `service_factory` builds each worker's service (with `model` and
+        `dimension`) from the model name; it defaults to `EmbeddingService`
+        and must be picklable.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.model_name = model_name
+        self.threads_per_worker = threads_per_worker
+        self.chunk_size = chunk_size
+        # Spawned workers don't inherit the parent's thread pools or model
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_worker, service_factory),
+        )
+        self.dimension = self.executor.submit(_dimension).result()
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """
+        Embed `texts` as a (len(texts), dimension) float32 array in input
+        order. `progress` is called with (texts done, total) as chunks finish.
+        """
+        shape = (len(texts), self.dimension)
+        if not texts:
+            return np.empty(shape, dtype=np.float32)
+        shm = SharedMemory(create=True, size=len(texts) * self.dimension * 4)
+        try:
+            futures = [
+                self.executor.submit(_encode_chunk, shm.name, shape, start, list(texts[start:start + self.chunk_size]))
+                for start in range(0, len(texts), self.chunk_size)
+            ]
+            done = 0
+            try:
+                for future in as_completed(futures):
+                    done += future.result()
+                    if progress is not None:
+                        progress(done, len(texts))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_batch_embeddings(self, texts: List[str]) -> List[str]:
+        """Embed `texts`, returning vectors in pgvector's string format."""
+        return [to_pgvector(vector) for vector in self.encode(texts)]
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -2,13 +2,17 @@
 Embedding service for text-to-vector conversion.
 """
 from functools import lru_cache
-import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from ..config import get_settings
+from ..database.types import to_pgvector
+from .embedding_cache import CachedEmbeddingService, EmbeddingCache
+
 class EmbeddingService:
     """Service for generating embeddings from text."""
     
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
     
@@ -18,7 +22,7 @@ class EmbeddingService:
         Returns the vector in pgvector's string format: [x,y,z,...]
         """
         embedding = self.model.encode(text)
-        return self._format_for_pgvector(embedding)
+        return to_pgvector(embedding)
     
     def get_batch_embeddings(self, texts: list[str]) -> list[str]:
         """
@@ -26,13 +30,21 @@ class EmbeddingService:
         Returns vectors in pgvector's string format.
         """
         embeddings = self.model.encode(texts)
-        return [self._format_for_pgvector(emb) for emb in embeddings]
-    
-    def _format_for_pgvector(self, embedding: np.ndarray) -> str:
-        """Convert numpy array to pgvector string format."""
-        return f"[{','.join(str(x) for x in embedding)}]"
+        return [to_pgvector(emb) for emb in embeddings]
+
+def configured_cache(model_name: str, dimension: int) -> EmbeddingCache:
+    """Embedding cache for a model, configured from settings."""
+    settings = get_settings()
+    return EmbeddingCache(
+        model_name,
+        dimension,
+        directory=settings.EMBEDDING_CACHE_DIR,
+        memory_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+        disk_entries=settings.EMBEDDING_CACHE_DISK_ENTRIES,
+    )
 
 @lru_cache(maxsize=1)
-def get_embedding_service() -> EmbeddingService:
-    """Get or create a cached embedding service instance."""
-    return EmbeddingService()
\ No newline at end of file
+def get_embedding_service() -> CachedEmbeddingService:
+    """Get or create a cached embedding service instance, behind the embedding cache."""
+    service = EmbeddingService()
+    return CachedEmbeddingService(service, configured_cache(service.model_name, service.dimension))
@@ -0,0 +1,343 @@
+"""
+Streaming export of GeoLens tables to GeoParquet or GeoJSON-seq.
+
+Each table is split into contiguous id ranges, one per worker. A worker
+streams its range through a server-side cursor on its own connection and
+writes it as one part file, so memory stays bounded by a row group no matter
+how large the table is. Workers run in REPEATABLE READ transactions sharing
+one exported snapshot, so the parts together are a consistent copy of the
+table even while it is being written to:
+
+    <output>/<table>/part-00000.parquet   (or .geojsonl)
+
+GeoParquet files store geometry as WKB with GeoParquet 1.0 metadata and
+embeddings as fixed-size float32 lists. Features and events carry the
+geometry of their location; relationships have none. GeoJSON-seq files hold
+one Feature per line. Parquet output needs the optional `pyarrow`
+dependency (`pip install geolens[export]`).
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("geoparquet", "geojsonseq")
+
+EMBEDDING_DIMENSION = 384
+
+# (column, SQL expression, kind) per table. "geometry" columns are encoded
+# per format; "json" columns hold JSONB documents.
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str, str]]] = {
+    "locations": [
+        ("id", "t.id", "int32"),
+        ("name", "t.name", "string"),
+        ("description", "t.description", "string"),
+        ("location_type", "t.location_type", "string"),
+        ("properties", "t.properties", "json"),
+        ("created_at", "t.created_at", "timestamp"),
+        ("updated_at", "t.updated_at", "timestamp"),
+        ("geometry", "t.geometry", "geometry"),
+    ],
+    "architectural_features": [
+        ("id", "t.id", "int32"),
+        ("location_id", "t.location_id", "int32"),
+        ("style", "t.style", "string"),
+        ("year_built", "t.year_built", "int32"),
+        ("architect", "t.architect", "string"),
+        ("description", "t.description", "string"),
+        ("properties", "t.properties", "json"),
+        ("created_at", "t.created_at", "timestamp"),
+        ("updated_at", "t.updated_at", "timestamp"),
+        ("embedding", "t.embedding", "embedding"),
+        ("geometry", "l.geometry", "geometry"),
+    ],
+    "historical_events": [
+        ("id", "t.id", "int32"),
+        ("location_id", "t.location_id", "int32"),
+        ("event_date", "t.event_date", "date"),
+        ("event_type", "t.event_type", "string"),
+        ("description", "t.description", "string"),
+        ("properties", "t.properties", "json"),
+        ("created_at", "t.created_at", "timestamp"),
+        ("updated_at", "t.updated_at", "timestamp"),
+        ("embedding", "t.embedding", "embedding"),
+        ("geometry", "l.geometry", "geometry"),
+    ],
+    "relationships": [
+        ("id", "t.id", "int32"),
+        ("from_location_id", "t.from_location_id", "int32"),
+        ("to_location_id", "t.to_location_id", "int32"),
+        ("relationship_type", "t.relationship_type", "string"),
+        ("strength", "t.strength", "float64"),
+        ("evidence", "t.evidence", "string"),
+        ("properties", "t.properties", "json"),
+        ("created_at", "t.created_at", "timestamp"),
+        ("updated_at", "t.updated_at", "timestamp"),
+    ],
+}
+
+EXPORT_TABLES = tuple(EXPORT_COLUMNS)
+
+
+@dataclass
+class ExportResult:
+    """Outcome of exporting one table."""
+    table: str
+    rows: int = 0
+    files: List[str] = field(default_factory=list)
+
+
+def id_ranges(min_id: int, max_id: int, parts: int) -> List[Tuple[int, int]]:
+    """Split [min_id, max_id] into at most `parts` contiguous [start, stop) ranges."""
+    span = max_id - min_id + 1
+    parts = max(1, min(parts, span))
+    step = -(-span // parts)
+    return [(start, min(start + step, max_id + 1)) for start in range(min_id, max_id + 1, step)]
+
+
+def export_query(table: str, output_format: str) -> str:
+    """Query reading one id range of `table`, with columns encoded for the format."""
+    expressions = []
+    for name, expression, kind in EXPORT_COLUMNS[table]:
+        if kind == "geometry":
+            expression = (
+                f"ST_AsBinary({expression})" if output_format == "geoparquet"
+                else f"ST_AsGeoJSON({expression})"
+            )
+        elif kind == "json":
+            expression = f"{expression}::text"
+        elif kind == "embedding":
+            expression = f"{expression}::real[]"
+        expressions.append(f"{expression} AS {name}")
+    join = (
+        "LEFT JOIN geolens.locations l ON l.id = t.location_id"
+        if any(expression.startswith("l.") for _, expression, _ in EXPORT_COLUMNS[table]) else ""
+    )
+    return f"""
+        SELECT {', '.join(expressions)}
+        FROM geolens.{table} t
+        {join}
+        WHERE t.id >= :start AND t.id < :stop
+        ORDER BY t.id
+    """
+
+
+# PROJJSON of OGC:CRS84 (WGS 84 with longitude first)
+_WGS84_CRS = {
+    "$schema": "https://proj.org/schemas/v0.7/projjson.schema.json",
+    "type": "GeographicCRS",
+    "name": "WGS 84 (CRS84)",
+    "datum": {
+        "type": "GeodeticReferenceFrame",
+        "name": "World Geodetic System 1984",
+        "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563},
+    },
+    "coordinate_system": {
+        "subtype": "ellipsoidal",
+        "axis": [
+            {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"},
+            {"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"},
+        ],
+    },
+    "id": {"authority": "OGC", "code": "CRS84"},
+}
+
+
+def arrow_schema(table: str) -> "pa.Schema":
+    """Arrow schema of a table's export, with GeoParquet metadata if it has geometry."""
+    types = {
+        "int32": pa.int32(),
+        "string": pa.string(),
+        "json": pa.string(),
+        "float64": pa.float64(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "embedding": pa.list_(pa.float32(), EMBEDDING_DIMENSION),
+        "geometry": pa.binary(),
+    }
+    columns = EXPORT_COLUMNS[table]
+    metadata = None
+    if any(kind == "geometry" for _, _, kind in columns):
+        metadata = {b"geo": json.dumps({
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": ["Point"],
+                    # Geography columns: lon/lat on the WGS 84 ellipsoid
+                    "crs": _WGS84_CRS,
+                    "edges": "spherical",
+                }
+            },
+        }).encode()}
+    return pa.schema([pa.field(name, types[kind]) for name, _, kind in columns], metadata=metadata)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def geojson_feature(table: str, row: Sequence[Any]) -> str:
+    """One GeoJSON Feature line for an exported row."""
+    properties: Dict[str, Any] = {}
+    geometry = None
+    for (name, _, kind), value in zip(EXPORT_COLUMNS[table], row):
+        if kind == "geometry":
+            geometry = json.loads(value) if value is not None else None
+        elif kind == "json":
+            properties[name] = json.loads(value) if value is not None else None
+        else:
+            properties[name] = value
+    return json.dumps(
+        {"type": "Feature", "id": properties["id"], "geometry": geometry, "properties": properties},
+        default=_json_default,
+        separators=(",", ":"),
+    )
+
+
+class _ParquetPart:
+    """Buffers rows column-wise and writes them out one row group at a time."""
+
+    def __init__(self, path: Path, table: str, row_group_size: int):
+        self.schema = arrow_schema(table)
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.row_group_size = row_group_size
+        self.columns: List[List[Any]] = [[] for _ in self.schema]
+
+    def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        for row in rows:
+            for column, value in zip(self.columns, row):
+                column.append(value)
+            if len(self.columns[0]) == self.row_group_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if self.columns[0]:
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=column.type) for values, column in zip(self.columns, self.schema)],
+                schema=self.schema
+            ))
+            self.columns = [[] for _ in self.schema]
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+class _GeoJSONSeqPart:
+    """Writes one Feature per line."""
+
+    def __init__(self, path: Path, table: str):
+        self.table = table
+        self.file = path.open("w", encoding="utf-8")
+
+    def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        self.file.writelines(geojson_feature(self.table, row) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def export_range(
+    engine: AsyncEngine,
+    table: str,
+    output_format: str,
+    path: Path,
+    start: int,
+    stop: int,
+    batch_size: int = 5000,
+    row_group_size: int = 50000,
+    snapshot: Optional[str] = None
+) -> int:
+    """
+    Stream ids [start, stop) of `table` into one part file, reading from an
+    exported `snapshot` if given. Returns the row count.
+    """
+    part: Union[_ParquetPart, _GeoJSONSeqPart] = (
+        _ParquetPart(path, table, row_group_size) if output_format == "geoparquet"
+        else _GeoJSONSeqPart(path, table)
+    )
+    rows = 0
+    try:
+        async with engine.connect() as conn:
+            if snapshot is not None:
+                await conn.execution_options(isolation_level="REPEATABLE READ")
+                await conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+            result = await conn.stream(
+                text(export_query(table, output_format)),
+                {"start": start, "stop": stop},
+                execution_options={"yield_per": batch_size}
+            )
+            async for batch in result.partitions(batch_size):
+                part.write(batch)
+                rows += len(batch)
+    finally:
+        part.close()
+    return rows
+
+
+async def export_table(
+    engine: AsyncEngine,
+    table: str,
+    output_dir: Union[str, Path],
+    output_format: str = "geoparquet",
+    workers: int = 4,
+    batch_size: int = 5000,
+    row_group_size: int = 50000,
+    progress: Optional[Callable[[str, int], None]] = None
+) -> ExportResult:
+    """
+    Export one table as part files written concurrently by id range, all
+    read from one snapshot taken when the export starts.
+    """
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Table {table} cannot be exported")
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {output_format}")
+    if output_format == "geoparquet" and pa is None:
+        raise RuntimeError("GeoParquet export requires pyarrow (pip install geolens[export])")
+
+    directory = Path(output_dir) / table
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = "parquet" if output_format == "geoparquet" else "geojsonl"
+    for stale in directory.glob(f"part-*.{suffix}"):
+        stale.unlink()
+
+    result = ExportResult(table=table)
+    # The exported snapshot stays importable while this transaction is open
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="REPEATABLE READ")
+        snapshot = (await conn.execute(text("SELECT pg_export_snapshot()"))).scalar_one()
+        bounds = (await conn.execute(text(f"SELECT min(id), max(id) FROM geolens.{table}"))).one()
+        if bounds[0] is None:
+            return result
+
+        ranges = id_ranges(bounds[0], bounds[1], workers)
+        paths = [directory / f"part-{index:05d}.{suffix}" for index in range(len(ranges))]
+        counts = await asyncio.gather(*(
+            export_range(engine, table, output_format, path, start, stop, batch_size, row_group_size, snapshot)
+            for path, (start, stop) in zip(paths, ranges)
+        ))
+    result.rows = sum(counts)
+    result.files = [str(path) for path in paths]
+    logger.info("Exported %d rows of %s to %d files", result.rows, table, len(paths))
+    if progress is not None:
+        progress(table, result.rows)
+    return result
@@ -0,0 +1,184 @@
+"""
+Incremental re-embedding of stale vectors.
+
+Each embedded row stores a SHA-256 hash of the text its embedding was
+computed from. A row is stale when that hash no longer matches its current
+text, or when it has no embedding at all. Stale rows are found with a keyset
+scan, embedded in large batches and written back with one bulk UPDATE per
+batch, checkpointing the last processed id so an interrupted run resumes.
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .embedding_cache import CachedEmbeddingService
+from .embedding_pool import EmbeddingPool
+from .embeddings import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Columns whose non-null values, joined by spaces, are embedded for each table
+EMBEDDED_COLUMNS = {
+    "architectural_features": ("style", "description"),
+    "historical_events": ("description",),
+}
+
+# SQL expression producing the text that is embedded for each table
+EMBEDDED_TEXT = {
+    table: f"concat_ws(' ', {', '.join(columns)})" for table, columns in EMBEDDED_COLUMNS.items()
+}
+
+def content_hash_sql(expression: str) -> str:
+    """SQL computing the content hash of a text expression."""
+    return f"encode(sha256(convert_to({expression}, 'UTF8')), 'hex')"
+
+def embedded_text(table: str, values: Dict[str, Any]) -> str:
+    """The text embedded for a row of `table` with these column values, as `EMBEDDED_TEXT` builds it."""
+    return " ".join(values[column] for column in EMBEDDED_COLUMNS[table] if values.get(column) is not None)
+
+def content_hash(content: str) -> str:
+    """Content hash of a text, as `content_hash_sql` computes it."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    """Last processed id per table, persisted as JSON so runs can resume."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.positions: Dict[str, int] = {}
+        if path is not None and path.exists():
+            self.positions = json.loads(path.read_text())
+
+    def get(self, table: str) -> int:
+        return self.positions.get(table, 0)
+
+    def save(self, table: str, last_id: int) -> None:
+        self.positions[table] = last_id
+        self._write()
+
+    def clear(self, tables: Optional[Iterable[str]] = None) -> None:
+        """Forget the positions of `tables` (default: all), removing the file once none are left."""
+        for table in (list(self.positions) if tables is None else tables):
+            self.positions.pop(table, None)
+        self._write()
+
+    def _write(self) -> None:
+        if self.path is None:
+            return
+        if not self.positions:
+            self.path.unlink(missing_ok=True)
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.positions))
+        tmp.replace(self.path)
+
+
+@dataclass
+class ReembedResult:
+    """Outcome of re-embedding one table."""
+    table: str
+    embedded: int = 0
+    batches: int = 0
+
+
+async def reembed_table(
+    engine: AsyncEngine,
+    table: str,
+    embedding_service: Union[EmbeddingService, CachedEmbeddingService, EmbeddingPool],
+    batch_size: int = 1024,
+    checkpoint: Optional[Checkpoint] = None,
+    progress: Optional[Callable[[ReembedResult], None]] = None
+) -> ReembedResult:
+    """Re-embed every stale row of `table`, one committed batch at a time."""
+    if table not in EMBEDDED_TEXT:
+        raise ValueError(f"Table {table} has no embeddings")
+
+    checkpoint = checkpoint or Checkpoint()
+    expression = EMBEDDED_TEXT[table]
+    select_stale = text(f"""
+        SELECT id, content, current_hash
+        FROM (
+            SELECT
+                id,
+                embedding IS NULL AS missing,
+                content_hash AS stored_hash,
+                {expression} AS content,
+                {content_hash_sql(expression)} AS current_hash
+            FROM geolens.{table}
+            WHERE id > :after_id
+        ) candidates
+        WHERE missing OR stored_hash IS DISTINCT FROM current_hash
+        ORDER BY id
+        LIMIT :batch_size
+    """)
+    # Only overwrite rows whose text is unchanged since it was read
+    write_back = text(f"""
+        UPDATE geolens.{table} AS t
+        SET embedding = v.embedding::vector, content_hash = v.content_hash
+        FROM unnest(
+            CAST(:ids AS integer[]),
+            CAST(:embeddings AS text[]),
+            CAST(:hashes AS text[])
+        ) AS v(id, embedding, content_hash)
+        WHERE t.id = v.id
+        AND {content_hash_sql(expression)} = v.content_hash
+    """)
+
+    result = ReembedResult(table=table)
+    after_id = checkpoint.get(table)
+    while True:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(
+                select_stale,
+                {"after_id": after_id, "batch_size": batch_size}
+            )).all()
+        if not rows:
+            break
+
+        embeddings = embedding_service.get_batch_embeddings([row.content for row in rows])
+        async with engine.begin() as conn:
+            await conn.execute(
+                write_back,
+                {
+                    "ids": [row.id for row in rows],
+                    "embeddings": embeddings,
+                    "hashes": [row.current_hash for row in rows],
+                }
+            )
+
+        after_id = rows[-1].id
+        checkpoint.save(table, after_id)
+        result.embedded += len(rows)
+        result.batches += 1
+        logger.info("Re-embedded %d rows of %s (up to id %d)", result.embedded, table, after_id)
+        if progress is not None:
+            progress(result)
+
+    return result
+
+
+async def reembed(
+    engine: AsyncEngine,
+    embedding_service: Union[EmbeddingService, CachedEmbeddingService, EmbeddingPool],
+    tables: Optional[Iterable[str]] = None,
+    batch_size: int = 1024,
+    checkpoint: Optional[Checkpoint] = None,
+    progress: Optional[Callable[[ReembedResult], None]] = None
+) -> List[ReembedResult]:
+    """
+    Re-embed stale rows across tables, clearing each table's checkpoint once
+    it is done; positions of tables not run are kept.
+    """
+    checkpoint = checkpoint or Checkpoint()
+    results = []
+    for table in (tables or EMBEDDED_TEXT):
+        results.append(await reembed_table(engine, table, embedding_service, batch_size, checkpoint, progress))
+        checkpoint.clear([table])
+    return results
@@ -0,0 +1,391 @@
+"""
+Geographic sharding with scatter-gather queries.
+
+Each shard owns the locations whose geohash starts with one of its prefixes
+(the longest matching prefix wins; "" matches everywhere). A location's
+architectural features, historical events and relationships live on the
+same shard as the location.
+
+`ShardMap` resolves which shards a point, radius or bounding box touches.
+`ShardRouter` holds one engine per shard and runs `DatabaseService` calls on
+them concurrently. `ShardedDatabaseService` exposes the query methods and
+merges per-shard results, keeping the global top-k for similarity and
+nearest-neighbour queries. Queries that fall inside one shard's area touch
+only that shard.
+
+New locations go to the shard that owns their point: insert them through
+`ShardRouter.session_for_point`. Lookups by id (timelines, similar
+architecture) ask every shard, so ids must be unique across shards:
+`ShardRouter.provision_id_ranges` (`geolens shard-id-ranges`) gives each
+shard's sequences a disjoint range, by the shard's position in SHARDS.
+Relationships between locations on different shards are not supported.
+"""
+import asyncio
+import heapq
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from ..config import Settings, ShardSpec
+from ..database.types import to_pgvector
+from .database import DatabaseService
+from .spatial_index import radius_boxes
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+Box = Tuple[float, float, float, float]
+
+# Ids per shard: the shard at position i in SHARDS hands out
+# i * ID_RANGE + 1 .. (i + 1) * ID_RANGE
+ID_RANGE = 100_000_000
+
+# Tables whose rows live on their location's shard
+SHARDED_TABLES = ("locations", "architectural_features", "historical_events", "relationships")
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 12) -> str:
+    """Geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bit, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, interval = (lon, lon_range) if even else (lat, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value, bit = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Box:
+    """Cell covered by a geohash as (min_lon, min_lat, max_lon, max_lat)."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lon_range[0], lat_range[0], lon_range[1], lat_range[1]
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class ShardMap:
+    """Maps geohash prefixes to shard names."""
+
+    def __init__(self, shards: Sequence[ShardSpec]):
+        self.names = [shard.name for shard in shards]
+        self.prefixes: Dict[str, str] = {}
+        for shard in shards:
+            for prefix in shard.prefixes:
+                if prefix in self.prefixes:
+                    raise ValueError(f"Geohash prefix {prefix!r} is assigned to two shards")
+                if any(char not in GEOHASH_ALPHABET for char in prefix):
+                    raise ValueError(f"Invalid geohash prefix {prefix!r}")
+                self.prefixes[prefix] = shard.name
+        if not self._covers(""):
+            raise ValueError("Shard prefixes must cover the whole globe (add a \"\" catch-all)")
+        # Cells with longer prefixes below them
+        self._split = {prefix[:length] for prefix in self.prefixes for length in range(len(prefix))}
+        self._precision = max(len(prefix) for prefix in self.prefixes)
+
+    def _covers(self, cell: str) -> bool:
+        if cell in self.prefixes:
+            return True
+        if not any(prefix.startswith(cell) for prefix in self.prefixes):
+            return False
+        return all(self._covers(cell + char) for char in GEOHASH_ALPHABET)
+
+    def shard_for_point(self, lat: float, lon: float) -> str:
+        """Shard owning a location at this point."""
+        geohash = geohash_encode(lat, lon, self._precision)
+        for length in range(len(geohash), -1, -1):
+            shard = self.prefixes.get(geohash[:length])
+            if shard is not None:
+                return shard
+        raise AssertionError("unreachable: the prefixes cover the globe")
+
+    def shards_for_boxes(self, boxes: Iterable[Box]) -> List[str]:
+        """
+        Shards owning any part of the given boxes. Cells are only split where
+        a longer prefix exists, so queries within one shard's area touch only
+        that shard.
+        """
+        shards: Set[str] = set()
+
+        def visit(cell: str, owner: Optional[str], box: Box) -> None:
+            owner = self.prefixes.get(cell, owner)
+            if cell not in self._split:
+                shards.add(owner)
+                return
+            for char in GEOHASH_ALPHABET:
+                child = cell + char
+                if _intersects(geohash_bounds(child), box):
+                    visit(child, owner, box)
+
+        for box in boxes:
+            visit("", None, box)
+        return [name for name in self.names if name in shards]
+
+    def shards_for_radius(self, lat: float, lon: float, distance_meters: float) -> List[str]:
+        return self.shards_for_boxes(radius_boxes(lat, lon, distance_meters))
+
+    def shards_for_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[str]:
+        """Shards for a viewport; `min_lon > max_lon` means it crosses the antimeridian."""
+        if min_lon > max_lon:
+            return self.shards_for_boxes([(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)])
+        return self.shards_for_boxes([(min_lon, min_lat, max_lon, max_lat)])
+
+
+class ShardRouter:
+    """One engine per shard, with concurrent per-shard execution."""
+
+    def __init__(self, shard_map: ShardMap, engines: Dict[str, AsyncEngine]):
+        missing = set(shard_map.names) - set(engines)
+        if missing:
+            raise ValueError(f"No engine for shards {sorted(missing)}")
+        self.map = shard_map
+        self.engines = engines
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ShardRouter":
+        if not settings.SHARDS:
+            raise ValueError("SHARDS is not configured")
+        engines = {
+            shard.name: create_async_engine(shard.url, pool_size=settings.DATABASE_POOL_SIZE)
+            for shard in settings.SHARDS
+        }
+        return cls(ShardMap(settings.SHARDS), engines)
+
+    @asynccontextmanager
+    async def session(self, shard: str):
+        async with AsyncSession(self.engines[shard], expire_on_commit=False) as session:
+            yield session
+
+    def session_for_point(self, lat: float, lon: float):
+        """
+        Session on the shard owning a location at this point. Insert a
+        location, and its features, events and relationships, through it.
+        """
+        return self.session(self.map.shard_for_point(lat, lon))
+
+    async def provision_id_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Restrict each shard's id sequences to its own range, continuing after
+        existing rows. Returns the (first, last) id of each shard's range.
+        """
+        if len(self.map.names) * ID_RANGE > 2**31 - 1:
+            raise ValueError(f"At most {(2**31 - 1) // ID_RANGE} shards fit in integer ids")
+        ranges = {}
+        for position, shard in enumerate(self.map.names):
+            first, last = position * ID_RANGE + 1, (position + 1) * ID_RANGE
+            async with self.engines[shard].begin() as conn:
+                for table in SHARDED_TABLES:
+                    low, high = (await conn.execute(
+                        text(f"SELECT min(id), max(id) FROM geolens.{table}")
+                    )).one()
+                    if low is not None and (low < first or high > last):
+                        raise ValueError(
+                            f"Shard {shard} has {table} ids {low}..{high} outside its range {first}..{last}"
+                        )
+                    await conn.execute(text(
+                        f"ALTER SEQUENCE geolens.{table}_id_seq MINVALUE {first} MAXVALUE {last} "
+                        f"START WITH {first} RESTART WITH {first if high is None else high + 1}"
+                    ))
+            ranges[shard] = (first, last)
+        return ranges
+
+    async def run(self, shard: str, call: Callable[[DatabaseService], Awaitable[Any]]) -> Any:
+        """Run `call` with a `DatabaseService` bound to one shard."""
+        async with self.session(shard) as session:
+            return await call(DatabaseService(session))
+
+    async def gather(
+        self,
+        shards: Sequence[str],
+        call: Callable[[DatabaseService], Awaitable[Any]]
+    ) -> List[Any]:
+        """Run `call` on several shards concurrently, each in its own session."""
+        return list(await asyncio.gather(*(self.run(shard, call) for shard in shards)))
+
+    async def dispose(self) -> None:
+        for engine in self.engines.values():
+            await engine.dispose()
+
+
+class ShardedDatabaseService:
+    """`DatabaseService` queries routed across geographic shards."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    async def find_locations_near(
+        self,
+        lat: float,
+        lon: float,
+        distance_meters: float = 5000,
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[Any]:
+        """
+        Radius search across shards, returning the `limit` nearest rows.
+        `find_nearest_locations` with `max_distance_meters` gives their distances too.
+        """
+        nearest = await self.find_nearest_locations(
+            lat, lon, limit, columns, distance_meters, properties, property_path
+        )
+        return [row for row, _ in nearest]
+
+    async def find_locations_in_bbox(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        location_type: Optional[str] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None,
+        limit: int = 500,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[Any]:
+        """
+        Viewport search on the shards the box touches, merged in (id, shard)
+        order so rows from different shards sharing an id are all kept
+        (`columns` must include id).
+        """
+        shards = self.router.map.shards_for_bbox(min_lon, min_lat, max_lon, max_lat)
+        results = await self.router.gather(shards, lambda service: service.find_locations_in_bbox(
+            min_lon, min_lat, max_lon, max_lat, location_type, properties, property_path, limit, columns
+        ))
+        merged = heapq.merge(*(
+            [(row.id, position, row) for row in rows] for position, rows in enumerate(results)
+        ))
+        return [row for _, _, row in merged][:limit]
+
+    async def find_nearest_locations(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        max_distance_meters: Optional[float] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[Tuple[tuple, float]]:
+        """
+        k nearest locations across shards, as (row, distance in meters) pairs.
+        The home shard answers first; its k-th distance (or else
+        `max_distance_meters`) bounds the radius the other shards must cover,
+        so queries well inside one shard's area never leave it.
+        """
+        def nearest_on(service: DatabaseService):
+            return service.find_nearest_locations(
+                lat, lon, k, columns, max_distance_meters, properties, property_path
+            )
+
+        shard_map = self.router.map
+        home = shard_map.shard_for_point(lat, lon)
+        nearest = await self.router.run(home, nearest_on)
+        if len(nearest) >= k:
+            others = shard_map.shards_for_radius(lat, lon, nearest[-1][1])
+        elif max_distance_meters is not None:
+            others = shard_map.shards_for_radius(lat, lon, max_distance_meters)
+        else:
+            others = shard_map.names
+        others = [shard for shard in others if shard != home]
+
+        results = await self.router.gather(others, nearest_on)
+        return heapq.nsmallest(k, (pair for rows in [nearest, *results] for pair in rows), key=lambda pair: pair[1])
+
+    async def find_similar_architecture_by_embedding(
+        self,
+        embedding: Union[str, Sequence[float]],
+        similarity_threshold: float = 0.7,
+        limit: int = 10,
+        exclude_ids: Sequence[int] = (),
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[Tuple[tuple, float]]:
+        """Top `limit` similar features over all shards."""
+        embedding = to_pgvector(embedding)
+        results = await self.router.gather(
+            self.router.map.names,
+            lambda service: service.find_similar_architecture_by_embedding(
+                embedding, similarity_threshold, limit, exclude_ids, columns,
+                include_embedding, properties, property_path
+            )
+        )
+        return heapq.nlargest(limit, (pair for rows in results for pair in rows), key=lambda pair: pair[1])
+
+    async def find_similar_architecture(
+        self,
+        feature_id: int,
+        similarity_threshold: float = 0.7,
+        limit: int = 10,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[Tuple[tuple, float]]:
+        """
+        Features similar to a feature on any shard, searched on every shard.
+        Relies on disjoint id ranges (see `ShardRouter.provision_id_ranges`).
+        """
+        async def feature_embedding(service: DatabaseService) -> Optional[Any]:
+            result = await service.session.execute(
+                text("SELECT embedding::text AS embedding FROM geolens.architectural_features WHERE id = :feature_id"),
+                {"feature_id": feature_id}
+            )
+            return result.one_or_none()
+
+        matches = [row for row in await self.router.gather(self.router.map.names, feature_embedding) if row is not None]
+        if len(matches) > 1:
+            raise ValueError(
+                f"Feature {feature_id} exists on {len(matches)} shards; give each shard a disjoint id range first"
+            )
+        if not matches or matches[0].embedding is None:
+            return []
+        return await self.find_similar_architecture_by_embedding(
+            matches[0].embedding, similarity_threshold, limit, [feature_id], columns,
+            include_embedding, properties, property_path
+        )
+
+    async def find_historical_timeline(
+        self,
+        location_id: int,
+        start_date=None,
+        end_date=None,
+        columns: Optional[Sequence[str]] = None,
+        include_embedding: bool = False,
+        properties: Optional[Dict[str, Any]] = None,
+        property_path: Optional[str] = None
+    ) -> List[Any]:
+        """Timeline of a location on whichever shard holds it."""
+        results = await self.router.gather(
+            self.router.map.names,
+            lambda service: service.find_historical_timeline(
+                location_id, start_date, end_date, columns, include_embedding, properties, property_path
+            )
+        )
+        return [event for events in results for event in events]
@@ -0,0 +1,276 @@
+"""
+Offline similarity join proposing new `influences` relationships.
+
+Every architectural feature is compared with every other one using blocked
+float32 matrix products, keeping for each feature the `k` most similar
+features of other locations (optionally only those built earlier). Beyond
+the embedding matrix itself, memory is bounded by `block_size`² scores.
+Row blocks can be spread over worker processes, which map the matrix from a
+temporary file instead of receiving a copy.
+
+Feature pairs are reduced to location pairs (the most similar feature pair
+wins), pairs already linked by an `influences` relationship are skipped, and
+the result replaces `geolens.relationship_candidates` in one transaction.
+"""
+import asyncio
+import logging
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..database.types import to_float32_array
+
+logger = logging.getLogger(__name__)
+
+# Candidate rows written per INSERT statement
+WRITE_BATCH_SIZE = 10000
+
+
+@dataclass
+class FeatureVectors:
+    """Normalised embeddings of all features with their location and year."""
+    feature_ids: np.ndarray
+    location_ids: np.ndarray
+    # NaN where the year is unknown
+    years: np.ndarray
+    vectors: np.ndarray
+
+
+@dataclass
+class SimilarityJoinResult:
+    """Outcome of a similarity join run."""
+    features: int = 0
+    feature_pairs: int = 0
+    candidates: int = 0
+
+
+async def load_feature_vectors(engine: AsyncEngine, batch_size: int = 10000) -> FeatureVectors:
+    """Read every embedded feature, keyset-paginated by id."""
+    feature_ids, location_ids, years, vectors = [], [], [], []
+    after_id = 0
+    async with engine.connect() as conn:
+        while True:
+            rows = (await conn.execute(
+                text("""
+                    SELECT id, location_id, year_built, embedding::text AS embedding
+                    FROM geolens.architectural_features
+                    WHERE embedding IS NOT NULL
+                    AND id > :after_id
+                    ORDER BY id
+                    LIMIT :batch_size
+                """),
+                {"after_id": after_id, "batch_size": batch_size}
+            )).all()
+            for row in rows:
+                feature_ids.append(row.id)
+                location_ids.append(row.location_id)
+                years.append(np.nan if row.year_built is None else row.year_built)
+                vectors.append(to_float32_array(row.embedding))
+            if len(rows) < batch_size:
+                break
+            after_id = rows[-1].id
+
+    matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return FeatureVectors(
+        feature_ids=np.asarray(feature_ids, dtype=np.int64),
+        location_ids=np.asarray(location_ids, dtype=np.int64),
+        years=np.asarray(years, dtype=np.float64),
+        vectors=(matrix / norms).astype(np.float32, copy=False),
+    )
+
+
+def top_k_pairs(
+    vectors: Union[np.ndarray, str],
+    location_ids: np.ndarray,
+    years: np.ndarray,
+    start: int,
+    stop: int,
+    k: int,
+    block_size: int = 4096,
+    min_similarity: float = -1.0,
+    temporal: bool = True
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Top-k neighbours of rows `start:stop` of the normalised `vectors` (or
+    the path of a saved .npy file), skipping features of the same location
+    and, when `temporal`, features not built strictly earlier.
+    Returns (target positions, source positions, similarities).
+    """
+    if isinstance(vectors, str):
+        vectors = np.load(vectors, mmap_mode="r")
+    targets_out, sources_out, scores_out = [], [], []
+    for row_start in range(start, stop, block_size):
+        row_stop = min(row_start + block_size, stop)
+        rows = np.asarray(vectors[row_start:row_stop])
+        best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        best_sources = np.full((len(rows), k), -1, dtype=np.int64)
+
+        for column_start in range(0, len(vectors), block_size):
+            column_stop = min(column_start + block_size, len(vectors))
+            scores = rows @ np.asarray(vectors[column_start:column_stop]).T
+            excluded = (
+                location_ids[row_start:row_stop, None] == location_ids[None, column_start:column_stop]
+            )
+            if temporal:
+                # Comparisons with NaN (unknown year) are False, so those pairs are excluded too
+                excluded |= ~(years[None, column_start:column_stop] < years[row_start:row_stop, None])
+            scores[excluded] = -np.inf
+
+            merged_scores = np.hstack([best_scores, scores])
+            merged_sources = np.hstack([
+                best_sources,
+                np.broadcast_to(np.arange(column_start, column_stop), scores.shape)
+            ])
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_sources = np.take_along_axis(merged_sources, keep, axis=1)
+
+        found = np.isfinite(best_scores) & (best_scores >= min_similarity)
+        targets_out.append(np.nonzero(found)[0] + row_start)
+        sources_out.append(best_sources[found])
+        scores_out.append(best_scores[found])
+
+    if not targets_out:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(targets_out), np.concatenate(sources_out), np.concatenate(scores_out)
+
+
+def strongest_location_pairs(
+    features: FeatureVectors,
+    targets: np.ndarray,
+    sources: np.ndarray,
+    scores: np.ndarray
+) -> Tuple[np.ndarray, ...]:
+    """
+    Reduce feature pairs to (from location, to location) pairs, keeping the
+    most similar feature pair of each. The source feature is the influencer.
+    """
+    order = np.argsort(-scores, kind="stable")
+    from_locations = features.location_ids[sources[order]]
+    to_locations = features.location_ids[targets[order]]
+    _, first = np.unique(np.stack([from_locations, to_locations], axis=1), axis=0, return_index=True)
+    chosen = order[first]
+    return (
+        features.location_ids[sources[chosen]],
+        features.location_ids[targets[chosen]],
+        features.feature_ids[sources[chosen]],
+        features.feature_ids[targets[chosen]],
+        scores[chosen],
+    )
+
+
+async def write_candidates(engine: AsyncEngine, pairs: Tuple[np.ndarray, ...]) -> int:
+    """Replace all relationship candidates, skipping pairs already related."""
+    insert = text("""
+        INSERT INTO geolens.relationship_candidates (
+            from_location_id, to_location_id, from_feature_id, to_feature_id, similarity
+        )
+        SELECT v.from_location_id, v.to_location_id, v.from_feature_id, v.to_feature_id, v.similarity
+        FROM unnest(
+            CAST(:from_location_ids AS integer[]),
+            CAST(:to_location_ids AS integer[]),
+            CAST(:from_feature_ids AS integer[]),
+            CAST(:to_feature_ids AS integer[]),
+            CAST(:similarities AS float8[])
+        ) AS v(from_location_id, to_location_id, from_feature_id, to_feature_id, similarity)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM geolens.relationships r
+            WHERE r.from_location_id = v.from_location_id
+            AND r.to_location_id = v.to_location_id
+            AND r.relationship_type = 'influences'
+        )
+    """)
+    written = 0
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM geolens.relationship_candidates"))
+        for start in range(0, len(pairs[0]), WRITE_BATCH_SIZE):
+            batch = [column[start:start + WRITE_BATCH_SIZE].tolist() for column in pairs]
+            result = await conn.execute(insert, dict(zip(
+                ["from_location_ids", "to_location_ids", "from_feature_ids", "to_feature_ids", "similarities"],
+                batch
+            )))
+            written += result.rowcount
+    return written
+
+
+async def similarity_join(
+    engine: AsyncEngine,
+    k: int = 10,
+    min_similarity: float = 0.8,
+    temporal: bool = True,
+    block_size: int = 4096,
+    workers: int = 1,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> SimilarityJoinResult:
+    """
+    Propose influences between locations from feature similarity and
+    replace `relationship_candidates` with them. `progress` is called with
+    (features done, total features).
+    """
+    if k < 1:
+        raise ValueError("k must be positive")
+    features = await load_feature_vectors(engine)
+    result = SimilarityJoinResult(features=len(features.feature_ids))
+    targets = sources = np.empty(0, dtype=np.int64)
+    scores = np.empty(0, dtype=np.float32)
+    if result.features > 1:
+        targets, sources, scores = await _join(features, min(k, result.features - 1),
+                                               min_similarity, temporal, block_size, workers, progress)
+
+    result.feature_pairs = len(targets)
+    pairs = strongest_location_pairs(features, targets, sources, scores)
+    result.candidates = await write_candidates(engine, pairs)
+    logger.info(
+        "Similarity join over %d features: %d feature pairs, %d candidates",
+        result.features, result.feature_pairs, result.candidates
+    )
+    return result
+
+
+async def _join(
+    features: FeatureVectors,
+    k: int,
+    min_similarity: float,
+    temporal: bool,
+    block_size: int,
+    workers: int,
+    progress: Optional[Callable[[int, int], None]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Run `top_k_pairs` over all row blocks, at most `workers` at a time."""
+    loop = asyncio.get_running_loop()
+    total = len(features.feature_ids)
+    with tempfile.TemporaryDirectory() as directory:
+        vectors: Union[np.ndarray, str] = features.vectors
+        executor: Executor
+        if workers > 1:
+            # Workers map the matrix from disk rather than unpickling a copy each
+            vectors = str(Path(directory) / "vectors.npy")
+            np.save(vectors, features.vectors)
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=1)
+        with executor:
+            join_rows = partial(
+                top_k_pairs, vectors, features.location_ids, features.years,
+                k=k, block_size=block_size, min_similarity=min_similarity, temporal=temporal
+            )
+            blocks = [(start, min(start + block_size, total)) for start in range(0, total, block_size)]
+            futures = [loop.run_in_executor(executor, join_rows, start, stop) for start, stop in blocks]
+            parts = []
+            for (_, stop), future in zip(blocks, futures):
+                parts.append(await future)
+                if progress is not None:
+                    progress(stop, total)
+
+    targets, sources, scores = (np.concatenate(column) for column in zip(*parts))
+    return targets, sources, scores
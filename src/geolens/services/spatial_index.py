@@ -0,0 +1,256 @@
+"""
+In-memory spatial index over location points.
+
+Holds a compact array snapshot of `locations` (ids, longitudes, latitudes and
+the light attribute columns) with a shapely STRtree for candidate lookup.
+Radius, bounding box and k-nearest queries run without a database round trip.
+Exact distances use vectorised haversine in NumPy on a spherical earth, so
+they can differ from PostGIS's spheroidal geography distances by up to ~0.5%.
+
+Results have the same shape as `DatabaseService.find_locations_near` with
+`columns`, i.e. `LocationRow` named tuples. The index refreshes incrementally
+from an `updated_at` watermark; deleted rows are only dropped by a rebuild.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..database.models import Location
+from ..database.projections import default_columns, resolve_columns, row_factory
+
+EARTH_RADIUS_METERS = 6371008.8
+
+# Re-read this far behind the watermark to catch transactions that committed late
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def haversine_meters(
+    lon: np.ndarray,
+    lat: np.ndarray,
+    origin_lon: float,
+    origin_lat: float
+) -> np.ndarray:
+    """Great-circle distances in meters from one origin to many points."""
+    lon, lat = np.radians(lon), np.radians(lat)
+    origin_lon, origin_lat = math.radians(origin_lon), math.radians(origin_lat)
+    a = (
+        np.sin((lat - origin_lat) / 2) ** 2
+        + np.cos(lat) * math.cos(origin_lat) * np.sin((lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def radius_boxes(lat: float, lon: float, distance_meters: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Longitude/latitude boxes covering a circle, split at the antimeridian.
+    Each box is (min_lon, min_lat, max_lon, max_lat).
+    """
+    angular = distance_meters / EARTH_RADIUS_METERS
+    min_lat = lat - math.degrees(angular)
+    max_lat = lat + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        # The circle reaches a pole: every longitude is in range
+        return [(-180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0))]
+
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180:
+        return [(-180.0, min_lat, max_lon, max_lat), (min_lon + 360, min_lat, 180.0, max_lat)]
+    if max_lon > 180:
+        return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon - 360, max_lat)]
+    return [(min_lon, min_lat, max_lon, max_lat)]
+
+
+class _IndexState(NamedTuple):
+    """Immutable index contents, swapped as a whole on refresh."""
+    ids: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+    rows: List[tuple]
+    positions: Dict[int, int]
+    tree: STRtree
+
+
+class LocationIndex:
+    """In-process spatial index mirroring `geolens.locations`."""
+
+    def __init__(self, columns: Optional[Sequence[str]] = None, batch_size: int = 10000):
+        # Geometry is held as coordinate arrays, not row columns
+        if columns is None:
+            names = tuple(name for name in default_columns(Location) if name != "geometry")
+        else:
+            names = resolve_columns(Location, columns)
+            if "geometry" in names:
+                raise ValueError("Geometry is held as coordinate arrays, not row columns")
+        if "id" not in names:
+            names = ("id",) + names
+        self.columns = names
+        self.batch_size = batch_size
+        self.watermark: Optional[datetime] = None
+        self._make_row = row_factory("LocationRow", names)
+        self._state = self._build_state(
+            np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), []
+        )
+
+    def __len__(self) -> int:
+        return len(self._state.ids)
+
+    @staticmethod
+    def _build_state(ids: np.ndarray, lon: np.ndarray, lat: np.ndarray, rows: List[tuple]) -> _IndexState:
+        return _IndexState(
+            ids=ids,
+            lon=lon,
+            lat=lat,
+            rows=rows,
+            positions={int(id): position for position, id in enumerate(ids)},
+            tree=STRtree(shapely.points(lon, lat)),
+        )
+
+    def apply(self, changes: Sequence[Tuple[tuple, float, float]]) -> None:
+        """Merge changed (row, lon, lat) entries; rows are replaced by id."""
+        state = self._state
+        # Copy before patching: concurrent readers may hold the current arrays
+        lon, lat = state.lon.copy(), state.lat.copy()
+        rows = list(state.rows)
+        appended_ids, appended_lon, appended_lat = [], [], []
+        positions = dict(state.positions)
+        for row, row_lon, row_lat in changes:
+            position = positions.get(row.id)
+            if position is None:
+                positions[row.id] = len(rows)
+                rows.append(row)
+                appended_ids.append(row.id)
+                appended_lon.append(row_lon)
+                appended_lat.append(row_lat)
+            else:
+                rows[position] = row
+                lon[position], lat[position] = row_lon, row_lat
+
+        self._state = self._build_state(
+            np.concatenate([state.ids, np.asarray(appended_ids, dtype=np.int64)]),
+            np.concatenate([lon, np.asarray(appended_lon, dtype=np.float64)]),
+            np.concatenate([lat, np.asarray(appended_lat, dtype=np.float64)]),
+            rows,
+        )
+
+    async def refresh(self, engine: AsyncEngine) -> int:
+        """Load locations changed since the last refresh (all on first call)."""
+        since = self.watermark - WATERMARK_OVERLAP if self.watermark else None
+        select_list = ", ".join(self.columns)
+        changes = []
+        after_updated_at, after_id = since, 0
+        async with engine.connect() as conn:
+            while True:
+                rows = (await conn.execute(
+                    text(f"""
+                        SELECT
+                            {select_list},
+                            updated_at,
+                            ST_X(geometry::geometry),
+                            ST_Y(geometry::geometry)
+                        FROM geolens.locations
+                        WHERE geometry IS NOT NULL
+                        AND (
+                            CAST(:after_updated_at AS timestamptz) IS NULL
+                            OR (updated_at, id) > (CAST(:after_updated_at AS timestamptz), :after_id)
+                        )
+                        ORDER BY updated_at, id
+                        LIMIT :batch_size
+                    """),
+                    {
+                        "after_updated_at": after_updated_at,
+                        "after_id": after_id,
+                        "batch_size": self.batch_size
+                    }
+                )).all()
+                if not rows:
+                    break
+                width = len(self.columns)
+                changes.extend((self._make_row(row[:width]), row[width + 1], row[width + 2]) for row in rows)
+                after_updated_at, after_id = rows[-1][width], rows[-1].id
+                if len(rows) < self.batch_size:
+                    break
+
+        if changes:
+            self.apply(changes)
+        if after_updated_at is not None and (self.watermark is None or after_updated_at > self.watermark):
+            self.watermark = after_updated_at
+        return len(changes)
+
+    def _within(self, state: _IndexState, lat: float, lon: float, distance_meters: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and distances of points within a radius, nearest first."""
+        candidates = np.unique(np.concatenate([
+            state.tree.query(shapely.box(*box)) for box in radius_boxes(lat, lon, distance_meters)
+        ]).astype(np.int64))
+        distances = haversine_meters(state.lon[candidates], state.lat[candidates], lon, lat)
+        inside = distances <= distance_meters
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def find_locations_near(
+        self,
+        lat: float,
+        lon: float,
+        distance_meters: float = 5000,
+        limit: int = 10
+    ) -> List[tuple]:
+        """Find locations within a distance, nearest first."""
+        state = self._state
+        positions, _ = self._within(state, lat, lon, distance_meters)
+        return [state.rows[position] for position in positions[:limit]]
+
+    def find_locations_in_bbox(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        limit: Optional[int] = None
+    ) -> List[tuple]:
+        """
+        Find locations inside a longitude/latitude bounding box. A box with
+        `min_lon` greater than `max_lon` crosses the antimeridian.
+        """
+        state = self._state
+        if min_lon > max_lon:
+            boxes = [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+        else:
+            boxes = [(min_lon, min_lat, max_lon, max_lat)]
+        positions = np.unique(np.concatenate([
+            state.tree.query(shapely.box(*box)) for box in boxes
+        ]).astype(np.int64))
+        return [state.rows[position] for position in positions[:limit]]
+
+    def find_nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 10,
+        max_distance_meters: Optional[float] = None
+    ) -> List[Tuple[tuple, float]]:
+        """
+        Find the k nearest locations as (row, distance in meters) pairs.
+        Grows a radius search until it holds k points, which is exact because
+        every point inside the radius is found.
+        """
+        state = self._state
+        if not len(state.ids) or k <= 0:
+            return []
+        limit = max_distance_meters if max_distance_meters is not None else math.pi * EARTH_RADIUS_METERS
+        radius = min(limit, 1000.0)
+        while True:
+            positions, distances = self._within(state, lat, lon, radius)
+            if len(positions) >= k or radius >= limit:
+                break
+            radius = min(limit, radius * 4)
+        return [
+            (state.rows[position], float(distance))
+            for position, distance in zip(positions[:k], distances[:k])
+        ]
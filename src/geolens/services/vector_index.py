@@ -0,0 +1,312 @@
+"""
+Vector index lifecycle management.
+
+Chooses pgvector index parameters from the current row count, rebuilds the
+index concurrently under a temporary name and swaps it in, then measures
+recall@k against exact search on a sample of stored vectors. Build time,
+size and recall are recorded as a JSON comment on the index itself.
+
+Queries get the recall that was measured only when they search with the same
+settings: `apply_search_settings` sets the recorded probes / ef_search for
+the transaction, and `DatabaseService` calls it before each vector search.
+"""
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+# Embedding index maintained for each table
+VECTOR_INDEXES = {
+    "architectural_features": "idx_architectural_features_embedding",
+    "historical_events": "idx_historical_events_embedding",
+}
+
+METHODS = ("ivfflat", "hnsw")
+
+# Seconds the recorded search settings of an index are reused before re-reading them
+SEARCH_SETTINGS_TTL = 60.0
+
+# (read at, settings) per table
+_search_settings: Dict[str, Tuple[float, Dict[str, int]]] = {}
+
+
+@dataclass
+class IndexPlan:
+    """Index build parameters chosen for a table."""
+    table: str
+    index_name: str
+    method: str
+    row_count: int
+    build_params: Dict[str, int]
+    search_params: Dict[str, int]
+
+    def with_clause(self) -> str:
+        return ", ".join(f"{key} = {value}" for key, value in self.build_params.items())
+
+    def search_settings(self) -> Dict[str, int]:
+        """Session settings (GUCs) used when querying this index."""
+        return {f"{self.method}.{key}": value for key, value in self.search_params.items()}
+
+
+@dataclass
+class IndexReport:
+    """Outcome of an index rebuild."""
+    plan: IndexPlan
+    build_seconds: Optional[float] = None
+    size_bytes: Optional[int] = None
+    recall: Optional[float] = None
+    k: Optional[int] = None
+    sample_size: int = 0
+    ann_ms: Optional[float] = None
+    exact_ms: Optional[float] = None
+    built_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def as_dict(self) -> Dict[str, Any]:
+        report = asdict(self)
+        plan = report.pop("plan")
+        return {**plan, **report}
+
+
+def plan_index(table: str, row_count: int, method: str = "ivfflat") -> IndexPlan:
+    """
+    Pick index parameters following pgvector's guidance: ivfflat uses
+    rows/1000 lists up to 1M rows and sqrt(rows) beyond, probed sqrt(lists)
+    at a time; HNSW grows m and ef_construction for larger tables.
+    """
+    if table not in VECTOR_INDEXES:
+        raise ValueError(f"Table {table} has no vector index")
+    if method not in METHODS:
+        raise ValueError(f"Unknown index method {method}, expected one of {METHODS}")
+
+    if method == "ivfflat":
+        if row_count <= 1_000_000:
+            lists = max(1, row_count // 1000)
+        else:
+            lists = int(math.sqrt(row_count))
+        build_params = {"lists": lists}
+        search_params = {"probes": max(1, int(math.sqrt(lists)))}
+    else:
+        if row_count <= 1_000_000:
+            build_params = {"m": 16, "ef_construction": 64}
+            search_params = {"ef_search": 40}
+        else:
+            build_params = {"m": 24, "ef_construction": 128}
+            search_params = {"ef_search": 100}
+
+    return IndexPlan(
+        table=table,
+        index_name=VECTOR_INDEXES[table],
+        method=method,
+        row_count=row_count,
+        build_params=build_params,
+        search_params=search_params,
+    )
+
+
+async def count_embedded_rows(conn: AsyncConnection, table: str) -> int:
+    """Count rows with an embedding."""
+    result = await conn.execute(
+        text(f"SELECT count(*) FROM geolens.{table} WHERE embedding IS NOT NULL")
+    )
+    return result.scalar_one()
+
+
+async def _partitions(conn: AsyncConnection, table: str) -> List[str]:
+    """Names of the leaf partitions of a partitioned table (empty otherwise)."""
+    result = await conn.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_partition_tree(CAST(:table AS regclass)) t
+            JOIN pg_class c ON c.oid = t.relid
+            WHERE t.isleaf AND t.level > 0
+            ORDER BY c.relname
+        """),
+        {"table": f"geolens.{table}"}
+    )
+    return list(result.scalars())
+
+
+async def _build_partitioned(
+    conn: AsyncConnection,
+    plan: IndexPlan,
+    index_name: str,
+    partitions: List[str]
+) -> None:
+    """
+    Partitioned tables do not support CREATE INDEX CONCURRENTLY, so create the
+    parent index ON ONLY the parent, build each partition's index concurrently
+    and attach it. The parent index becomes valid once all are attached.
+    """
+    definition = f"USING {plan.method} (embedding vector_cosine_ops) WITH ({plan.with_clause()})"
+    await conn.execute(text(f"CREATE INDEX {index_name} ON ONLY geolens.{plan.table} {definition}"))
+    for partition in partitions:
+        # Sized like the parent; a single lists value is shared by all partitions
+        partition_index = f"{partition}_embedding_idx_new"
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS geolens.{partition_index}"))
+        await conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY {partition_index} ON geolens.{partition} {definition}"
+        ))
+        await conn.execute(text(
+            f"ALTER INDEX geolens.{index_name} ATTACH PARTITION geolens.{partition_index}"
+        ))
+
+
+async def rebuild_index(engine: AsyncEngine, plan: IndexPlan) -> IndexReport:
+    """
+    Build the planned index with CREATE INDEX CONCURRENTLY under a temporary
+    name, then swap it for the existing index without blocking writes.
+    Partitioned tables are indexed one partition at a time.
+    """
+    new_name = f"{plan.index_name}_new"
+    old_name = f"{plan.index_name}_old"
+    report = IndexReport(plan=plan)
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        partitions = await _partitions(conn, plan.table)
+        # An interrupted concurrent build leaves an invalid index behind
+        await conn.execute(text(f"DROP INDEX {'' if partitions else 'CONCURRENTLY '}IF EXISTS geolens.{new_name}"))
+
+        started = time.perf_counter()
+        if partitions:
+            await _build_partitioned(conn, plan, new_name, partitions)
+        else:
+            await conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY {new_name}
+                ON geolens.{plan.table} USING {plan.method} (embedding vector_cosine_ops)
+                WITH ({plan.with_clause()})
+            """))
+        report.build_seconds = time.perf_counter() - started
+
+        # Swap names atomically, then drop the old index without blocking writes
+        async with engine.begin() as swap:
+            await swap.execute(text(f"ALTER INDEX IF EXISTS geolens.{plan.index_name} RENAME TO {old_name}"))
+            await swap.execute(text(f"ALTER INDEX geolens.{new_name} RENAME TO {plan.index_name}"))
+        # Partitioned indexes cannot be dropped concurrently; this takes a brief lock
+        await conn.execute(text(f"DROP INDEX {'' if partitions else 'CONCURRENTLY '}IF EXISTS geolens.{old_name}"))
+        for partition in partitions:
+            await conn.execute(text(
+                f"ALTER INDEX geolens.{partition}_embedding_idx_new RENAME TO {partition}_embedding_idx"
+            ))
+
+        report.size_bytes = (await conn.execute(
+            text("""
+                SELECT coalesce(sum(pg_relation_size(relid)), 0)::bigint
+                FROM pg_partition_tree(CAST(:index AS regclass))
+            """),
+            {"index": f"geolens.{plan.index_name}"}
+        )).scalar_one()
+
+    return report
+
+
+async def measure_recall(
+    engine: AsyncEngine,
+    report: IndexReport,
+    sample_size: int = 50,
+    k: int = 10
+) -> IndexReport:
+    """
+    Compare indexed (approximate) top-k results with exact search for a
+    random sample of stored vectors used as queries.
+    """
+    plan = report.plan
+    nearest = text(f"""
+        SELECT id FROM geolens.{plan.table}
+        ORDER BY embedding <=> CAST(:query AS vector)
+        LIMIT :k
+    """)
+
+    async with engine.connect() as conn:
+        queries = (await conn.execute(
+            text(f"""
+                SELECT embedding::text AS embedding
+                FROM geolens.{plan.table}
+                WHERE embedding IS NOT NULL
+                ORDER BY random()
+                LIMIT :sample_size
+            """),
+            {"sample_size": sample_size}
+        )).scalars().all()
+        await conn.commit()
+
+        hits = expected = 0
+        ann_seconds = exact_seconds = 0.0
+        for query in queries:
+            async with conn.begin():
+                for name, value in plan.search_settings().items():
+                    await conn.execute(text(f"SET LOCAL {name} = {int(value)}"))
+                started = time.perf_counter()
+                approximate = set((await conn.execute(nearest, {"query": query, "k": k})).scalars())
+                ann_seconds += time.perf_counter() - started
+
+            async with conn.begin():
+                await conn.execute(text("SET LOCAL enable_indexscan = off"))
+                started = time.perf_counter()
+                exact = set((await conn.execute(nearest, {"query": query, "k": k})).scalars())
+                exact_seconds += time.perf_counter() - started
+
+            hits += len(approximate & exact)
+            expected += len(exact)
+
+    report.k = k
+    report.sample_size = len(queries)
+    if queries:
+        report.recall = hits / expected if expected else 1.0
+        report.ann_ms = ann_seconds * 1000 / len(queries)
+        report.exact_ms = exact_seconds * 1000 / len(queries)
+    return report
+
+
+async def record_report(engine: AsyncEngine, report: IndexReport) -> None:
+    """Store the build report as a JSON comment on the index."""
+    comment = json.dumps(report.as_dict()).replace("'", "''")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(f"COMMENT ON INDEX geolens.{report.plan.index_name} IS '{comment}'")
+        )
+    _search_settings.pop(report.plan.table, None)
+
+
+async def read_report(conn: Union[AsyncConnection, AsyncSession], table: str) -> Optional[Dict[str, Any]]:
+    """Read the last recorded build report for a table's vector index."""
+    comment = (await conn.execute(
+        text("SELECT obj_description(to_regclass(:index), 'pg_class')"),
+        {"index": f"geolens.{VECTOR_INDEXES[table]}"}
+    )).scalar_one_or_none()
+    return json.loads(comment) if comment else None
+
+
+async def search_settings(conn: Union[AsyncConnection, AsyncSession], table: str) -> Dict[str, int]:
+    """Search settings (GUCs) recorded for a table's index; empty if it has no report."""
+    cached = _search_settings.get(table)
+    if cached is not None and time.monotonic() - cached[0] < SEARCH_SETTINGS_TTL:
+        return cached[1]
+    report = await read_report(conn, table)
+    settings = {} if report is None else {
+        f"{report['method']}.{key}": value for key, value in report["search_params"].items()
+    }
+    _search_settings[table] = (time.monotonic(), settings)
+    return settings
+
+
+async def apply_search_settings(session: AsyncSession, table: str) -> None:
+    """`SET LOCAL` the recorded search settings of a table's index, once per transaction."""
+    settings = await search_settings(session, table)
+    key = f"vector_search_settings:{table}"
+    transaction = session.get_transaction()
+    if not settings or (transaction is not None and session.info.get(key) == (transaction, settings)):
+        return
+    await session.execute(
+        text("""
+            SELECT set_config(name, value, true)
+            FROM unnest(CAST(:names AS text[]), CAST(:values AS text[])) AS s(name, value)
+        """),
+        {"names": list(settings), "values": [str(int(value)) for value in settings.values()]}
+    )
+    session.info[key] = (session.get_transaction(), settings)
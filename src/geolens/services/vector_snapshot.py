@@ -0,0 +1,387 @@
+"""
+In-process vector snapshots for low-latency similarity lookups.
+
+A snapshot copies a table's embeddings into a directory as an L2-normalised,
+memory-mapped float32 matrix plus a sorted id array. Every worker on the host
+maps the same files, so the vectors live once in the page cache. Searches are
+exact cosine top-k using blocked matrix products in NumPy.
+
+Refreshes are incremental: rows changed since the (updated_at, id) watermark
+are merged into a new generation of files, and the manifest is swapped
+atomically so readers pick it up on their next query. Deleted rows are only
+dropped by a full rebuild. Readers fall back to the database when the
+snapshot is older than the allowed staleness.
+"""
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..database.types import to_float32_array
+from .database import DatabaseService
+
+SNAPSHOT_TABLES = ("architectural_features", "historical_events")
+
+# Re-read this far behind the watermark to catch transactions that committed late
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+@dataclass
+class SnapshotManifest:
+    """Describes the current generation of a table snapshot."""
+    table: str
+    dimension: int
+    count: int
+    generation: int
+    refreshed_at: float
+    watermark_updated_at: Optional[str] = None
+    watermark_id: int = 0
+
+    def vectors_file(self) -> str:
+        return f"vectors.{self.generation}.f32"
+
+    def ids_file(self) -> str:
+        return f"ids.{self.generation}.npy"
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class VectorSnapshot:
+    """Read side of a table snapshot, shared between processes via mmap."""
+
+    def __init__(self, directory: Union[str, Path], table: str):
+        if table not in SNAPSHOT_TABLES:
+            raise ValueError(f"Table {table} has no embeddings")
+        self.path = Path(directory) / table
+        self.table = table
+        self.manifest: Optional[SnapshotManifest] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self._manifest_mtime: Optional[int] = None
+
+    def reload(self) -> bool:
+        """Map the latest generation if the manifest changed. Returns availability."""
+        manifest_path = self.path / "manifest.json"
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return self.manifest is not None
+
+        manifest = SnapshotManifest(**json.loads(manifest_path.read_text()))
+        if manifest.count:
+            try:
+                vectors = np.memmap(
+                    self.path / manifest.vectors_file(),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(manifest.count, manifest.dimension),
+                )
+                ids = np.load(self.path / manifest.ids_file(), mmap_mode="r")
+            except FileNotFoundError:
+                # Superseded while we read it; keep the current mapping until the next call
+                return self.manifest is not None
+        else:
+            vectors = np.empty((0, manifest.dimension), dtype=np.float32)
+            ids = np.empty(0, dtype=np.int64)
+
+        self.manifest, self.vectors, self.ids = manifest, vectors, ids
+        self._manifest_mtime = mtime
+        return True
+
+    def age(self) -> float:
+        """Seconds since the snapshot was last refreshed (infinite if missing)."""
+        if not self.reload():
+            return float("inf")
+        return time.time() - self.manifest.refreshed_at
+
+    def vector(self, id: int) -> Optional[np.ndarray]:
+        """Get the normalised vector stored for a row id."""
+        if not self.reload():
+            return None
+        position = int(np.searchsorted(self.ids, id))
+        if position < len(self.ids) and self.ids[position] == id:
+            return np.asarray(self.vectors[position])
+        return None
+
+    def search(
+        self,
+        query: Union[np.ndarray, Sequence[float]],
+        k: int = 10,
+        similarity_threshold: Optional[float] = None,
+        exclude_ids: Iterable[int] = (),
+        block_size: int = 65536
+    ) -> List[Tuple[int, float]]:
+        """
+        Exact cosine top-k over the snapshot, scanning `block_size` rows at a
+        time so temporary memory stays bounded. Returns (id, similarity) pairs.
+        """
+        if not self.reload() or not len(self.ids):
+            return []
+        query = _normalise(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        excluded = np.fromiter(exclude_ids, dtype=np.int64)
+        # Over-fetch per block so exclusions cannot starve the result
+        per_block = k + len(excluded)
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_positions = np.empty(0, dtype=np.int64)
+        for start in range(0, len(self.ids), block_size):
+            scores = self.vectors[start:start + block_size] @ query
+            if len(scores) > per_block:
+                top = np.argpartition(scores, -per_block)[-per_block:]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_positions = np.concatenate([best_positions, top + start])
+            if len(best_scores) > per_block:
+                keep = np.argpartition(best_scores, -per_block)[-per_block:]
+                best_scores, best_positions = best_scores[keep], best_positions[keep]
+
+        order = np.argsort(-best_scores)
+        ids = self.ids[best_positions[order]]
+        scores = best_scores[order]
+        mask = ~np.isin(ids, excluded)
+        if similarity_threshold is not None:
+            mask &= scores > similarity_threshold
+        return [(int(id), float(score)) for id, score in zip(ids[mask][:k], scores[mask][:k])]
+
+
+class SnapshotWriter:
+    """Builds and incrementally refreshes a table snapshot from the database."""
+
+    def __init__(self, engine: AsyncEngine, directory: Union[str, Path], table: str, batch_size: int = 10000):
+        if table not in SNAPSHOT_TABLES:
+            raise ValueError(f"Table {table} has no embeddings")
+        self.engine = engine
+        self.path = Path(directory) / table
+        self.table = table
+        self.batch_size = batch_size
+
+    def _read_manifest(self) -> Optional[SnapshotManifest]:
+        manifest_path = self.path / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        return SnapshotManifest(**json.loads(manifest_path.read_text()))
+
+    async def _fetch_changes(
+        self,
+        since: Optional[datetime]
+    ) -> Tuple[Dict[int, Optional[np.ndarray]], Optional[datetime], int]:
+        """Read rows changed since `since` (all rows if None), keyset-paginated."""
+        changes: Dict[int, Optional[np.ndarray]] = {}
+        after_updated_at, after_id = since, 0
+        async with self.engine.connect() as conn:
+            while True:
+                rows = (await conn.execute(
+                    text(f"""
+                        SELECT id, updated_at, embedding::text AS embedding
+                        FROM geolens.{self.table}
+                        WHERE CAST(:after_updated_at AS timestamptz) IS NULL
+                        OR (updated_at, id) > (CAST(:after_updated_at AS timestamptz), :after_id)
+                        ORDER BY updated_at, id
+                        LIMIT :batch_size
+                    """),
+                    {
+                        "after_updated_at": after_updated_at,
+                        "after_id": after_id,
+                        "batch_size": self.batch_size
+                    }
+                )).all()
+                if not rows:
+                    break
+                for row in rows:
+                    changes[row.id] = to_float32_array(row.embedding)
+                after_updated_at, after_id = rows[-1].updated_at, rows[-1].id
+                if len(rows) < self.batch_size:
+                    break
+        return changes, after_updated_at, after_id
+
+    def _write_generation(
+        self,
+        previous: Optional[SnapshotManifest],
+        changes: Dict[int, Optional[np.ndarray]],
+        refreshed_at: float,
+        watermark_updated_at: Optional[datetime],
+        watermark_id: int,
+        merge: bool = True
+    ) -> SnapshotManifest:
+        """
+        Publish a new generation holding `changes`, merged into the previous
+        generation's rows unless `merge` is False.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        if merge and previous is not None and previous.count:
+            old_ids = np.load(self.path / previous.ids_file())
+            old_vectors = np.memmap(
+                self.path / previous.vectors_file(),
+                dtype=np.float32,
+                mode="r",
+                shape=(previous.count, previous.dimension),
+            )
+        else:
+            old_ids = np.empty(0, dtype=np.int64)
+            old_vectors = None
+
+        changed_ids = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        removed = np.array([id for id, vector in changes.items() if vector is None], dtype=np.int64)
+        ids = np.union1d(old_ids, changed_ids)
+        ids = ids[~np.isin(ids, removed)]
+
+        dimension = next(
+            (len(vector) for vector in changes.values() if vector is not None),
+            previous.dimension if previous is not None else 0
+        )
+        generation = previous.generation + 1 if previous is not None else 1
+        manifest = SnapshotManifest(
+            table=self.table,
+            dimension=dimension,
+            count=len(ids),
+            generation=generation,
+            refreshed_at=refreshed_at,
+            watermark_updated_at=watermark_updated_at.isoformat() if watermark_updated_at else None,
+            watermark_id=watermark_id,
+        )
+
+        if len(ids):
+            vectors = np.memmap(
+                self.path / manifest.vectors_file(),
+                dtype=np.float32,
+                mode="w+",
+                shape=(len(ids), dimension),
+            )
+            # Carry over unchanged rows block by block to bound memory
+            if old_vectors is not None:
+                kept = ~np.isin(old_ids, changed_ids)
+                for start in range(0, len(old_ids), self.batch_size):
+                    block = slice(start, start + self.batch_size)
+                    block_kept = kept[block]
+                    targets = np.searchsorted(ids, old_ids[block][block_kept])
+                    vectors[targets] = old_vectors[block][block_kept]
+            updated = np.array(
+                [id for id, vector in changes.items() if vector is not None],
+                dtype=np.int64
+            )
+            if len(updated):
+                new_vectors = np.stack([changes[int(id)] for id in updated])
+                vectors[np.searchsorted(ids, updated)] = _normalise(new_vectors)
+            vectors.flush()
+            del vectors
+            np.save(self.path / manifest.ids_file(), ids)
+
+        manifest_tmp = self.path / "manifest.json.tmp"
+        manifest_tmp.write_text(json.dumps(asdict(manifest)))
+        os.replace(manifest_tmp, self.path / "manifest.json")
+
+        # Readers still mapping the old generation keep their open file handles
+        if previous is not None:
+            for name in (previous.vectors_file(), previous.ids_file()):
+                (self.path / name).unlink(missing_ok=True)
+        return manifest
+
+    async def build(self) -> SnapshotManifest:
+        """Write a complete snapshot of the table, dropping rows deleted since."""
+        started_at = time.time()
+        changes, updated_at, last_id = await self._fetch_changes(None)
+        return self._write_generation(
+            self._read_manifest(), changes, started_at, updated_at, last_id, merge=False
+        )
+
+    async def refresh(self) -> SnapshotManifest:
+        """Merge rows changed since the last watermark, building if no snapshot exists."""
+        previous = self._read_manifest()
+        if previous is None or previous.watermark_updated_at is None:
+            return await self.build()
+
+        started_at = time.time()
+        watermark = datetime.fromisoformat(previous.watermark_updated_at)
+        changes, updated_at, last_id = await self._fetch_changes(watermark - WATERMARK_OVERLAP)
+        if updated_at is None or updated_at < watermark:
+            updated_at, last_id = watermark, previous.watermark_id
+        return self._write_generation(previous, changes, started_at, updated_at, last_id)
+
+
+class SnapshotSimilaritySearch:
+    """
+    Similarity search served from local snapshots, falling back to the
+    database when the snapshot is missing or older than `max_staleness`.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_staleness: float = 300.0):
+        self.max_staleness = max_staleness
+        self.snapshots = {table: VectorSnapshot(directory, table) for table in SNAPSHOT_TABLES}
+
+    def is_fresh(self, table: str) -> bool:
+        return self.snapshots[table].age() <= self.max_staleness
+
+    async def find_similar_architecture(
+        self,
+        service: DatabaseService,
+        feature_id: int,
+        similarity_threshold: float = 0.7,
+        limit: int = 10
+    ) -> List[Tuple[int, float]]:
+        """Find features similar to a feature, as (feature id, similarity) pairs."""
+        snapshot = self.snapshots["architectural_features"]
+        if self.is_fresh("architectural_features"):
+            query = snapshot.vector(feature_id)
+            if query is not None:
+                return snapshot.search(query, limit, similarity_threshold, exclude_ids=[feature_id])
+
+        results = await service.find_similar_architecture(
+            feature_id, similarity_threshold, limit, columns=["id"]
+        )
+        return [(row.id, similarity) for row, similarity in results]
+
+    async def find_similar_architecture_by_embedding(
+        self,
+        service: DatabaseService,
+        embedding: Union[np.ndarray, Sequence[float]],
+        similarity_threshold: float = 0.7,
+        limit: int = 10
+    ) -> List[Tuple[int, float]]:
+        """Find features similar to a query embedding, as (feature id, similarity) pairs."""
+        if self.is_fresh("architectural_features"):
+            return self.snapshots["architectural_features"].search(
+                embedding, limit, similarity_threshold
+            )
+
+        results = await service.find_similar_architecture_by_embedding(
+            embedding, similarity_threshold, limit, columns=["id"]
+        )
+        return [(row.id, similarity) for row, similarity in results]
+
+    async def find_similar_events(
+        self,
+        service: DatabaseService,
+        event_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        similarity_threshold: float = 0.7,
+        limit: int = 10
+    ) -> List[Tuple[int, float]]:
+        """
+        Find events similar to an event, as (event id, similarity) pairs.
+        Snapshots hold no dates, so date-bounded searches go to the database.
+        """
+        snapshot = self.snapshots["historical_events"]
+        if start_date is None and end_date is None and self.is_fresh("historical_events"):
+            query = snapshot.vector(event_id)
+            if query is not None:
+                return snapshot.search(query, limit, similarity_threshold, exclude_ids=[event_id])
+
+        results = await service.find_similar_events(
+            event_id, start_date, end_date, similarity_threshold, limit, columns=["id"]
+        )
+        return [(row.id, similarity) for row, similarity in results]
@@ -0,0 +1,249 @@
+"""
+Warm-up run before a process reports itself ready.
+
+A fresh process opens pooled connections lazily, finds the vector and spatial
+indexes cold in shared buffers, and loads the embedding model on its first
+request. `warm_up` does all of that up front:
+
+* opens as many connections as the pool keeps, at once, so they stay pooled,
+* loads the vector (ivfflat, hnsw) and spatial (GiST, SP-GiST) indexes of the
+  `geolens` schema into shared buffers with `pg_prewarm`,
+* runs each hot `DatabaseService` query once against a sample row, and
+* loads the embedding model and runs a dummy batch through it.
+
+Call it from application startup, then answer readiness probes with
+`is_ready()`. `geolens warm-up` runs it from the command line, which warms
+the server's buffers and the model files but not another process's pool.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from ..config import get_settings
+from .database import DatabaseService
+from .embeddings import get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Index access methods loaded by pg_prewarm
+PREWARM_ACCESS_METHODS = ("ivfflat", "hnsw", "gist", "spgist")
+
+# Texts run through the embedding model
+WARMUP_TEXTS = ["Gothic cathedral with flying buttresses"] * 32
+
+_ready = False
+
+
+@dataclass
+class WarmupReport:
+    """What a warm-up did and how long it took."""
+    connections: int = 0
+    # Blocks loaded per index
+    prewarmed: Dict[str, int] = field(default_factory=dict)
+    statements: List[str] = field(default_factory=list)
+    model_seconds: float = 0.0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+def is_ready() -> bool:
+    """Whether a warm-up of this process has finished."""
+    return _ready
+
+
+def _pool_capacity(pool: Any) -> Optional[int]:
+    """Connections `pool` can hand out at once, None if it has no limit."""
+    size = getattr(pool, "size", None)
+    if not callable(size):
+        return None
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    return None if max_overflow < 0 else size() + max_overflow
+
+
+async def prime_pool(engine: AsyncEngine, connections: Optional[int] = None) -> int:
+    """
+    Open `connections` (default: the pool size) connections at once, leaving
+    them pooled. Asking for more than the pool can hand out opens only that many.
+    """
+    if connections is None:
+        size = getattr(engine.pool, "size", None)
+        connections = size() if callable(size) else get_settings().DATABASE_POOL_SIZE
+    capacity = _pool_capacity(engine.pool)
+    if capacity is not None:
+        # More would wait on a connection held by this warm-up until the pool times out
+        connections = min(connections, capacity)
+
+    opened = 0
+    all_open = asyncio.Event()
+
+    async def open_one():
+        nonlocal opened
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                opened += 1
+                if opened == connections:
+                    all_open.set()
+                # Hold it until every connection is open, so none is reused
+                await all_open.wait()
+        except BaseException:
+            all_open.set()
+            raise
+
+    await asyncio.gather(*(open_one() for _ in range(connections)))
+    return connections
+
+
+async def prewarm_indexes(engine: AsyncEngine) -> Dict[str, int]:
+    """Load vector and spatial indexes into shared buffers. Returns blocks per index."""
+    async with engine.begin() as conn:
+        available = (await conn.execute(
+            text("SELECT to_regproc('pg_prewarm') IS NOT NULL")
+        )).scalar()
+        if not available:
+            logger.warning("pg_prewarm is not installed; indexes stay cold")
+            return {}
+        indexes = (await conn.execute(
+            text("""
+                SELECT c.oid::regclass::text
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE n.nspname = 'geolens'
+                AND c.relkind = 'i'
+                AND am.amname = ANY(CAST(:methods AS text[]))
+                ORDER BY 1
+            """),
+            {"methods": list(PREWARM_ACCESS_METHODS)}
+        )).scalars().all()
+        return {
+            index: (await conn.execute(
+                text("SELECT pg_prewarm(CAST(:index AS regclass))"), {"index": index}
+            )).scalar()
+            for index in indexes
+        }
+
+
+def _hot_statements(sample: Any) -> Dict[str, Callable[[DatabaseService], Awaitable[Any]]]:
+    """One call of each hot `DatabaseService` query, for the rows `sample` has."""
+    statements: Dict[str, Callable[[DatabaseService], Awaitable[Any]]] = {
+        "search_locations": lambda db: db.search_locations("cathedral"),
+        "resolve_location_names": lambda db: db.resolve_location_names(["cathedral"]),
+    }
+    if sample.location_id is not None:
+        statements.update({
+            "find_locations_near": lambda db: db.find_locations_near(sample.lat, sample.lon, columns=["id"]),
+            "find_nearest_locations": lambda db: db.find_nearest_locations(sample.lat, sample.lon),
+            "find_locations_in_bbox": lambda db: db.find_locations_in_bbox(
+                sample.lon - 0.1, sample.lat - 0.1, sample.lon + 0.1, sample.lat + 0.1, columns=["id"]
+            ),
+            "find_historical_timeline": lambda db: db.find_historical_timeline(sample.location_id, columns=["id"]),
+            "event_heatmap": lambda db: db.event_heatmap(
+                sample.lon - 1, sample.lat - 1, sample.lon + 1, sample.lat + 1, 1000, 1999
+            ),
+            "find_architectural_influences": lambda db: db.find_architectural_influences(sample.location_id),
+        })
+    if sample.feature_id is not None:
+        statements["find_similar_architecture"] = lambda db: db.find_similar_architecture(sample.feature_id)
+    if sample.embedding is not None:
+        statements.update({
+            "find_similar_architecture_by_embedding": (
+                lambda db: db.find_similar_architecture_by_embedding(sample.embedding)
+            ),
+            "hybrid_search": lambda db: db.hybrid_search("cathedral", sample.embedding),
+        })
+    if sample.event_id is not None:
+        statements["find_similar_events"] = lambda db: db.find_similar_events(sample.event_id)
+    return statements
+
+
+async def run_hot_statements(engine: AsyncEngine, report: WarmupReport) -> None:
+    """Run each hot query once, recording failures in the report."""
+    async with AsyncSession(engine) as session:
+        sample = (await session.execute(text("""
+            SELECT
+                l.id AS location_id,
+                ST_Y(l.geometry::geometry) AS lat,
+                ST_X(l.geometry::geometry) AS lon,
+                (SELECT min(id) FROM geolens.architectural_features) AS feature_id,
+                (SELECT embedding::text FROM geolens.architectural_features
+                 WHERE embedding IS NOT NULL ORDER BY id LIMIT 1) AS embedding,
+                (SELECT min(id) FROM geolens.historical_events) AS event_id
+            FROM (SELECT 1) one
+            LEFT JOIN LATERAL (
+                SELECT id, geometry FROM geolens.locations WHERE geometry IS NOT NULL ORDER BY id LIMIT 1
+            ) l ON true
+        """))).one()
+        service = DatabaseService(session)
+        for name, run in _hot_statements(sample).items():
+            try:
+                await run(service)
+                report.statements.append(name)
+            except Exception as exc:
+                await session.rollback()
+                report.errors.append(f"{name}: {exc}")
+        await session.rollback()
+
+
+def warm_up_model() -> float:
+    """Load the embedding model and run a dummy batch. Returns the seconds taken."""
+    started = time.perf_counter()
+    # Straight through the model: the cache would skip the forward pass
+    get_embedding_service().model.encode(WARMUP_TEXTS)
+    return time.perf_counter() - started
+
+
+async def warm_up(
+    engine: Optional[AsyncEngine] = None,
+    connections: Optional[int] = None,
+    prewarm: bool = True,
+    statements: bool = True,
+    model: bool = True
+) -> WarmupReport:
+    """
+    Warm up this process and the database for `engine` (default: the
+    application engine), then mark the process ready.
+    """
+    global _ready
+    if engine is None:
+        from ..database.engine import engine
+    started = time.perf_counter()
+    report = WarmupReport()
+
+    model_task = asyncio.create_task(asyncio.to_thread(warm_up_model)) if model else None
+    try:
+        try:
+            report.connections = await prime_pool(engine, connections)
+        except Exception as exc:
+            report.errors.append(f"pool: {exc}")
+        if prewarm:
+            try:
+                report.prewarmed = await prewarm_indexes(engine)
+            except Exception as exc:
+                report.errors.append(f"pg_prewarm: {exc}")
+        if statements:
+            try:
+                await run_hot_statements(engine, report)
+            except Exception as exc:
+                report.errors.append(f"statements: {exc}")
+    finally:
+        if model_task is not None:
+            try:
+                report.model_seconds = await model_task
+            except Exception as exc:
+                report.errors.append(f"model: {exc}")
+
+    report.seconds = time.perf_counter() - started
+    for error in report.errors:
+        logger.warning("Warm-up step failed: %s", error)
+    logger.info(
+        "Warmed up in %.1fs: %d connections, %d indexes, %d statements",
+        report.seconds, report.connections, len(report.prewarmed), len(report.statements)
+    )
+    _ready = True
+    return report
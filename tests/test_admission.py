@@ -0,0 +1,81 @@
+"""
+Tests for admission control.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from geolens.config import QueryClassLimits
+from geolens.services.admission import AdmissionController, QueryShedError
+from geolens.services.database import DatabaseService
+
+pytestmark = pytest.mark.asyncio
+
+def controller(queue_size: int = 1, queue_timeout: float = 1.0) -> AdmissionController:
+    """Helper building a controller with a single-slot "graph" class."""
+    return AdmissionController({
+        "graph": QueryClassLimits(
+            concurrency=1, queue_size=queue_size, queue_timeout=queue_timeout, statement_timeout_ms=1000
+        )
+    })
+
+async def hold(admission: AdmissionController, release: asyncio.Event) -> None:
+    """Helper occupying a graph slot until `release` is set."""
+    async with admission.admit("graph"):
+        await release.wait()
+
+async def test_excess_queries_are_shed_when_queue_full():
+    """Test that queries beyond the slot and queue are rejected at once."""
+    admission = controller(queue_size=1)
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(admission, release))
+    queued = asyncio.create_task(hold(admission, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(QueryShedError):
+        async with admission.admit("graph"):
+            pass
+
+    release.set()
+    await asyncio.gather(running, queued)
+    metrics = admission.metrics()["graph"]
+    assert metrics["admitted"] == 2
+    assert metrics["shed_queue_full"] == 1
+    assert metrics["waiting"] == metrics["running"] == 0
+
+async def test_queued_queries_are_shed_after_deadline():
+    """Test that a query waiting longer than the queue timeout is rejected."""
+    admission = controller(queue_timeout=0.05)
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(admission, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(QueryShedError):
+        async with admission.admit("graph"):
+            pass
+
+    release.set()
+    await running
+    assert admission.metrics()["graph"]["shed_timeout"] == 1
+
+async def test_other_classes_are_not_blocked():
+    """Test that a saturated class leaves other and nested queries alone."""
+    admission = controller(queue_size=0)
+    async with admission.admit("graph") as limits:
+        assert limits.statement_timeout_ms == 1000
+        # Nested calls of a running query don't queue again
+        async with admission.admit("graph") as nested:
+            assert nested is None
+        async with admission.admit("spatial") as unlimited:
+            assert unlimited is None
+
+async def test_statement_timeout_is_set_per_class(db_session: AsyncSession):
+    """Test that service queries run under their class's statement timeout."""
+    service = DatabaseService(db_session, admission=controller())
+
+    await service.find_architectural_influences(1)
+    timeout = (await db_session.execute(text("SHOW statement_timeout"))).scalar_one()
+
+    assert timeout == "1s"
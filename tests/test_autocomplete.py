@@ -0,0 +1,70 @@
+"""
+Tests for the in-process place-name autocomplete index.
+"""
+import asyncio
+import random
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from geolens.services.autocomplete import PlaceNameAutocomplete, PlaceNameIndex, name_keys, normalise_name
+
+def brute_force(index: PlaceNameIndex, prefix: str, limit: int):
+    """Reference completion scanning every name."""
+    prefix = normalise_name(prefix)
+    matches = [id for id, name in index.names.items() if any(key.startswith(prefix) for key in name_keys(name))]
+    matches.sort(key=lambda id: (-index.popularity[id], index.names[id], id))
+    return [(id, index.names[id]) for id in matches[:limit]]
+
+def test_complete_matches_any_word_ignoring_case_and_accents():
+    """Prefixes match from any word, case- and accent-insensitively, most popular first."""
+    index = PlaceNameIndex()
+    index.build([
+        (1, "Notre-Dame Cathedral", 5),
+        (2, "St. Paul's Cathedral", 9),
+        (3, "São Paulo Cathedral", 1),
+        (4, "Sagrada Família", 7),
+    ])
+    assert index.complete("cath") == [(2, "St. Paul's Cathedral"), (1, "Notre-Dame Cathedral"), (3, "São Paulo Cathedral")]
+    assert index.complete("SAO") == [(3, "São Paulo Cathedral")]
+    assert [id for id, _ in index.complete("pau")] == [2, 3]
+    assert index.complete("familia") == [(4, "Sagrada Família")]
+    assert index.complete("notre dame c") == [(1, "Notre-Dame Cathedral")]
+    assert index.complete("xyz") == []
+
+def test_cached_rankings_follow_updates():
+    """Broad prefixes served from the cache stay exact through upserts, removals and selections."""
+    rng = random.Random(3)
+    words = ["saint", "san", "santa", "sankt", "sea", "south", "stone", "old", "new", "port"]
+    index = PlaceNameIndex(scan_limit=20, cache_size=10)
+    index.build((id, f"{rng.choice(words)} {rng.choice(words)} {id}", rng.randint(0, 50)) for id in range(300))
+    prefixes = ["s", "sa", "san", "st", "o", "p"]
+    for step in range(300):
+        operation = rng.random()
+        id = rng.randrange(350)
+        if operation < 0.4:
+            index.upsert(id, f"{rng.choice(words)} {rng.choice(words)} {id}", rng.randint(0, 50))
+        elif operation < 0.6:
+            index.remove(id)
+        else:
+            index.record_selection(id, rng.randint(1, 20))
+        prefix = rng.choice(prefixes)
+        assert index.complete(prefix, 5) == brute_force(index, prefix, 5)
+
+@pytest.mark.asyncio
+async def test_concurrent_completions_refresh_once():
+    """Requests arriving while a refresh is due share a single load."""
+    autocomplete = PlaceNameAutocomplete(engine=None)
+    fetches = []
+
+    async def fetch(since):
+        fetches.append(since)
+        await asyncio.sleep(0.01)
+        return [SimpleNamespace(id=1, name="Notre-Dame Cathedral", relationships=2,
+                                updated_at=datetime(2026, 1, 1, tzinfo=timezone.utc))]
+
+    autocomplete._fetch = fetch
+    results = await asyncio.gather(*(autocomplete.complete("notre") for _ in range(10)))
+    assert fetches == [None]
+    assert all(result == [(1, "Notre-Dame Cathedral")] for result in results)
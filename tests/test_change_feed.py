@@ -0,0 +1,122 @@
+"""
+Tests for the change feed.
+"""
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+from geoalchemy2 import WKTElement
+from sqlalchemy import delete, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from geolens.database.changes import prune_change_log
+from geolens.database.models import ChangeFeedConsumer, Location
+from geolens.services.change_feed import ChangeEvent, ChangeFeed, coalesce
+
+def test_coalesce_keeps_net_change_per_row():
+    """Test that several changes to one row collapse into its net effect."""
+    events = [
+        ChangeEvent("locations", "INSERT", 1, 10, 1),
+        ChangeEvent("locations", "UPDATE", 1, 10, 2),
+        ChangeEvent("locations", "INSERT", 2, 10, 3),
+        ChangeEvent("locations", "DELETE", 2, 11, 4),
+        ChangeEvent("relationships", "UPDATE", 1, 11, 5),
+        ChangeEvent("relationships", "DELETE", 1, 12, 6),
+        ChangeEvent("locations", "DELETE", 3, 12, 7),
+        ChangeEvent("locations", "INSERT", 3, 12, 8),
+    ]
+
+    assert [(event.table, event.operation, event.row_id) for event in coalesce(events)] == [
+        ("locations", "INSERT", 1),
+        ("relationships", "DELETE", 1),
+        ("locations", "UPDATE", 3),
+    ]
+
+@pytest.mark.asyncio
+async def test_change_feed_resumes_after_restart(async_engine: AsyncEngine):
+    """Test that a consumer sees committed changes once, across restarts."""
+    consumer = f"test-{uuid.uuid4()}"
+    await ChangeFeed(async_engine, consumer).position()
+
+    async with AsyncSession(async_engine) as session:
+        location = Location(
+            name="Change feed test",
+            location_type="test",
+            geometry=WKTElement("POINT(2.35 48.85)", srid=4326)
+        )
+        session.add(location)
+        await session.flush()
+        await session.execute(update(Location).where(Location.id == location.id).values(name="Renamed"))
+        await session.commit()
+        location_id = location.id
+
+    async def next_batch(feed: ChangeFeed):
+        async for batch in feed:
+            await feed.commit()
+            return batch
+
+    feed = ChangeFeed(async_engine, consumer, tables=["locations"], poll_interval=0.2)
+    batch = await asyncio.wait_for(next_batch(feed), 10)
+    assert ("locations", "INSERT", location_id) in [(e.table, e.operation, e.row_id) for e in batch]
+
+    async with AsyncSession(async_engine) as session:
+        await session.execute(delete(Location).where(Location.id == location_id))
+        await session.commit()
+
+    restarted = ChangeFeed(async_engine, consumer, tables=["locations"], poll_interval=0.2)
+    try:
+        batch = await asyncio.wait_for(next_batch(restarted), 10)
+        assert [(e.operation, e.row_id) for e in batch] == [("DELETE", location_id)]
+    finally:
+        async with AsyncSession(async_engine) as session:
+            await session.execute(delete(ChangeFeedConsumer).where(ChangeFeedConsumer.name == consumer))
+            await session.commit()
+
+@pytest.mark.asyncio
+async def test_change_feed_stops_listening_when_closed(async_engine: AsyncEngine):
+    """Test that a closed feed leaves no listener on the pooled connection it used."""
+    engine = create_async_engine(async_engine.url, pool_size=2, max_overflow=0)
+    consumer = f"test-{uuid.uuid4()}"
+    try:
+        feed = ChangeFeed(engine, consumer, tables=["locations"], poll_interval=0.2)
+        await feed.position()
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "UPDATE geolens.locations SET name = name WHERE id = (SELECT min(id) FROM geolens.locations)"
+            ))
+        batches = feed.__aiter__()
+        assert await asyncio.wait_for(batches.__anext__(), 10)
+        await batches.aclose()
+
+        async with engine.connect() as first, engine.connect() as second:
+            for conn in (first, second):
+                channels = (await conn.execute(text("SELECT pg_listening_channels()"))).scalars().all()
+                assert channels == []
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(ChangeFeedConsumer).where(ChangeFeedConsumer.name == consumer))
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_prune_drops_lagging_consumers(async_engine: AsyncEngine):
+    """Test that pruning keeps entries a consumer needs, until the consumer falls too far behind."""
+    consumer = f"test-{uuid.uuid4()}"
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM geolens.change_feed_consumers"))
+        await conn.execute(
+            text("INSERT INTO geolens.change_feed_consumers (name, txid, change_id) VALUES (:name, 0, 0)"),
+            {"name": consumer}
+        )
+        await conn.execute(text("""
+            INSERT INTO geolens.change_log (table_name, operation, row_id, changed_at)
+            VALUES ('locations', 'UPDATE', 1, now() - interval '2 days')
+        """))
+
+    assert await prune_change_log(async_engine) == 0
+    assert await prune_change_log(async_engine, max_lag=timedelta(days=3)) == 0
+    assert await prune_change_log(async_engine, max_lag=timedelta(days=1)) > 0
+
+    async with async_engine.connect() as conn:
+        assert (await conn.execute(text("SELECT count(*) FROM geolens.change_feed_consumers"))).scalar() == 0
+        assert (await conn.execute(text("SELECT count(*) FROM geolens.change_log"))).scalar() == 0
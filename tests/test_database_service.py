@@ -1,12 +1,16 @@
 """
 Tests for the database service layer.
 """
+from datetime import date
+
+import numpy as np
 import pytest
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from geolens.database.models import Location, ArchitecturalFeature
+from geolens.database.models import Location, ArchitecturalFeature, HistoricalEvent
 from geolens.services.database import DatabaseService
+from geolens.services.embeddings import get_embedding_service
 
 pytestmark = pytest.mark.asyncio
 
@@ -75,4 +79,192 @@ async def test_find_architectural_influences(db_session: AsyncSession):
     )
     
     assert influences is not None
-    assert len(influences) > 0
\ No newline at end of file
+    assert len(influences) > 0
+
+async def test_find_architectural_influences_strongest_path(db_session: AsyncSession):
+    """Test that each influenced location appears once per depth."""
+    service = DatabaseService(db_session)
+
+    location_id = await get_notre_dame_id(db_session)
+    influences = await service.find_architectural_influences(
+        location_id=location_id,
+        max_depth=3
+    )
+
+    keys = [(influence["to_location"], influence["depth"]) for influence in influences]
+    assert len(keys) == len(set(keys))
+    assert all(influence["depth"] <= 3 for influence in influences)
+
+async def test_find_architectural_influences_pruned(db_session: AsyncSession):
+    """Test that pruning options bound the traversal and return full paths."""
+    service = DatabaseService(db_session)
+
+    location_id = await get_notre_dame_id(db_session)
+    influences = await service.find_architectural_influences(
+        location_id=location_id,
+        max_depth=4,
+        min_strength=0.1,
+        beam_width=2,
+        max_fanout=3
+    )
+
+    for depth in range(1, 5):
+        assert len([i for i in influences if i["depth"] == depth]) <= 2
+    for influence in influences:
+        assert influence["influence_strength"] >= 0.1
+        assert influence["path"][0] == "Notre-Dame Cathedral"
+        assert influence["path"][-1] == influence["to_location"]
+        assert len(influence["path"]) == influence["depth"] + 1
+
+async def test_find_similar_architecture_projection(db_session: AsyncSession):
+    """Test that similarity results only carry the requested columns."""
+    service = DatabaseService(db_session)
+
+    location_id = await get_notre_dame_id(db_session)
+    stmt = select(ArchitecturalFeature.id).where(
+        ArchitecturalFeature.location_id == location_id
+    )
+    result = await db_session.execute(stmt)
+    feature_id = result.scalar_one()
+
+    similar = await service.find_similar_architecture(
+        feature_id=feature_id,
+        similarity_threshold=0.5,
+        columns=["id", "style"],
+        include_embedding=True
+    )
+
+    assert len(similar) > 0
+    row, similarity = similar[0]
+    assert row._fields == ("id", "style", "embedding")
+    assert row.embedding.dtype == np.float32
+    assert row.embedding.shape == (384,)
+
+async def test_find_locations_near_projection(db_session: AsyncSession):
+    """Test finding locations near a point as lightweight rows."""
+    service = DatabaseService(db_session)
+
+    locations = await service.find_locations_near(
+        lat=48.8529,
+        lon=2.3488,
+        distance_meters=10000,
+        columns=["id", "name"]
+    )
+
+    assert [loc._fields for loc in locations][0] == ("id", "name")
+    assert "Notre-Dame Cathedral" in [loc.name for loc in locations]
+
+async def test_find_similar_events_in_range(db_session: AsyncSession):
+    """Test that similar events respect the date range."""
+    service = DatabaseService(db_session)
+
+    location_id = await get_notre_dame_id(db_session)
+    stmt = select(HistoricalEvent.id).where(
+        HistoricalEvent.location_id == location_id
+    ).limit(1)
+    event_id = (await db_session.execute(stmt)).scalar_one()
+
+    similar = await service.find_similar_events(
+        event_id=event_id,
+        start_date=date(1000, 1, 1),
+        end_date=date(1999, 12, 31),
+        similarity_threshold=0.0,
+        columns=["id", "event_date"]
+    )
+
+    assert all(row.id != event_id for row, _ in similar)
+    assert all(date(1000, 1, 1) <= row.event_date <= date(1999, 12, 31) for row, _ in similar)
+
+async def test_find_locations_in_bbox_with_properties(db_session: AsyncSession):
+    """Test that attribute filters combine with the viewport in one query."""
+    service = DatabaseService(db_session)
+
+    paris = dict(min_lon=2.2, min_lat=48.8, max_lon=2.5, max_lat=48.9)
+    locations = await service.find_locations_in_bbox(**paris, columns=["id", "name"])
+    assert "Notre-Dame Cathedral" in [location.name for location in locations]
+
+    filtered = await service.find_locations_in_bbox(
+        **paris,
+        properties={"no_such_attribute": True},
+        columns=["id", "name"]
+    )
+    assert filtered == []
+
+async def test_hybrid_search_finds_proper_nouns(db_session: AsyncSession):
+    """Test that keyword matches on names rank first in hybrid search."""
+    service = DatabaseService(db_session)
+    embedding = get_embedding_service().get_embedding("Maurice de Sully")
+
+    for fusion in ("rrf", "weighted"):
+        events = await service.hybrid_search(
+            '"Maurice de Sully"',
+            embedding,
+            table="historical_events",
+            fusion=fusion,
+            lexical_weight=2.0,
+            columns=["id", "description"]
+        )
+        assert "Maurice de Sully" in events[0][0].description
+
+    features = await service.hybrid_search("Wren", embedding, columns=["id", "architect"])
+    assert features[0][0].architect == "Christopher Wren"
+
+    locations = await service.search_locations("cathedral", columns=["id", "name"])
+    assert "Notre-Dame Cathedral" in [location.name for location, _ in locations]
+
+async def test_resolve_location_names(db_session: AsyncSession):
+    """Test exact, fuzzy and missing names resolved in one call."""
+    service = DatabaseService(db_session)
+    await db_session.execute(text("SELECT set_config('pg_trgm.similarity_threshold', '0.6', true)"))
+    resolved = await service.resolve_location_names(
+        ["notre-dame cathedral", "St Pauls Cathedral", "Atlantis"], columns=["id", "name"]
+    )
+    # The transaction's own threshold is left as it was
+    threshold = await db_session.scalar(text("SELECT current_setting('pg_trgm.similarity_threshold')"))
+    assert float(threshold) == 0.6
+
+    assert resolved["notre-dame cathedral"][0][0].name == "Notre-Dame Cathedral"
+    assert resolved["notre-dame cathedral"][0][1] == 1.0
+    location, similarity = resolved["St Pauls Cathedral"][0]
+    assert location.name == "St. Paul's Cathedral" and similarity < 1.0
+    assert resolved["Atlantis"] == []
+
+async def test_find_influence_paths(db_session: AsyncSession):
+    """Test that paths between two locations run from one to the other, strongest first."""
+    service = DatabaseService(db_session)
+
+    notre_dame_id = await get_notre_dame_id(db_session)
+    st_pauls_id = (await db_session.execute(
+        select(Location.id).where(Location.name == "St. Paul's Cathedral")
+    )).scalar_one()
+    paths = await service.find_influence_paths(notre_dame_id, st_pauls_id, max_depth=3, limit=3)
+
+    assert paths[0]["path"] == ["Notre-Dame Cathedral", "St. Paul's Cathedral"]
+    assert paths[0]["influence_strength"] == pytest.approx(0.7)
+    strengths = [path["influence_strength"] for path in paths]
+    assert strengths == sorted(strengths, reverse=True)
+    assert await service.find_influence_paths(st_pauls_id, notre_dame_id, max_depth=1) == []
+
+async def test_event_heatmap_and_trend(db_session: AsyncSession):
+    """Test that cube queries count events, including ones inserted since."""
+    service = DatabaseService(db_session)
+    paris = dict(min_lon=2.0, min_lat=48.5, max_lon=2.7, max_lat=49.2)
+
+    heatmap = await service.event_heatmap(**paris, start_year=1100, end_year=1299)
+    assert len(heatmap) == 1
+    before = heatmap[0]["events"]
+
+    db_session.add(HistoricalEvent(
+        location_id=await get_notre_dame_id(db_session),
+        event_date=date(1250, 6, 1),
+        event_type="construction",
+        description="Transept facades completed"
+    ))
+    await db_session.flush()
+
+    heatmap = await service.event_heatmap(**paris, start_year=1100, end_year=1299, resolution=5)
+    assert heatmap[0]["cell"].startswith("u09") and heatmap[0]["events"] == before + 1
+
+    trend = await service.event_trend(**paris, start_year=1100, end_year=1299, bucket="century")
+    assert [(t["period_start"], t["event_type"]) for t in trend] == [(1100, "construction"), (1200, "construction")]
+    assert await service.event_heatmap(**paris, start_year=1300, end_year=1399, event_types=["construction"]) == []
@@ -0,0 +1,38 @@
+"""
+Tests for location dossiers.
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from geolens.database.models import Location
+from geolens.services.dossier import location_dossier, single_query_dossier
+
+pytestmark = pytest.mark.asyncio
+
+async def test_fan_out_matches_single_query(async_engine: AsyncEngine):
+    """Test that both variants build the same complete dossier."""
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    async with session_factory() as session:
+        location_id = (await session.execute(
+            select(Location.id).where(Location.name == "Notre-Dame Cathedral")
+        )).scalar_one()
+        single = await single_query_dossier(session, location_id)
+
+    dossier = await location_dossier(location_id, deadline=5.0, session_factory=session_factory)
+
+    assert dossier.complete and single.complete
+    assert dossier.location["name"] == single.location["name"] == "Notre-Dame Cathedral"
+    assert location_id not in [location["id"] for location in dossier.nearby]
+    assert [event["id"] for event in dossier.timeline] == [event["id"] for event in single.timeline]
+    assert [feature["id"] for feature in dossier.similar_architecture] == [
+        feature["id"] for feature in single.similar_architecture
+    ]
+    assert len(dossier.influences) == len(single.influences)
+
+async def test_unknown_location(async_engine: AsyncEngine):
+    """Test that an unknown location has no dossier."""
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    assert await location_dossier(-1, session_factory=session_factory) is None
+    async with AsyncSession(async_engine) as session:
+        assert await single_query_dossier(session, -1) is None
@@ -0,0 +1,69 @@
+"""
+Tests for the embedding cache.
+"""
+import numpy as np
+
+from geolens.services.embedding_cache import CachedEmbeddingService, EmbeddingCache, cache_key
+
+def vector(seed: int, dimension: int = 8) -> np.ndarray:
+    """Helper building a reproducible random vector."""
+    return np.random.default_rng(seed).normal(size=dimension).astype(np.float32)
+
+class CountingModel:
+    """Model stand-in recording which texts it was asked to embed."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.stack([vector(len(text)) for text in texts])
+
+class CountingService:
+    def __init__(self):
+        self.model = CountingModel()
+        self.dimension = 8
+
+def test_disk_tier_is_shared_and_persistent(tmp_path):
+    """A second cache on the same directory finds vectors written by the first."""
+    first = EmbeddingCache("model", 8, tmp_path, memory_entries=2, disk_entries=100)
+    keys = [cache_key("model", f"text {i}") for i in range(10)]
+    first.put_many(keys, [vector(i) for i in range(10)])
+
+    second = EmbeddingCache("model", 8, tmp_path, memory_entries=2, disk_entries=100)
+    found = second.get_many(keys + [cache_key("model", "unknown")])
+    assert all(np.array_equal(found[i], vector(i)) for i in range(10))
+    assert found[-1] is None
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["misses"], stats["memory_entries"], stats["disk_entries"]) == (10, 1, 2, 10)
+
+def test_eviction_keeps_recently_used(tmp_path):
+    """A full disk tier evicts its least recently used entries first."""
+    cache = EmbeddingCache("model", 8, tmp_path, memory_entries=0, disk_entries=4, eviction_batch=1)
+    keys = [cache_key("model", f"text {i}") for i in range(6)]
+    for i, key in enumerate(keys):
+        cache.put(key, vector(i))
+    found = cache.get_many(keys)
+    assert found[0] is None and found[1] is None
+    assert all(np.array_equal(found[i], vector(i)) for i in range(2, 6))
+    assert cache.stats()["evictions"] == 2
+
+def test_batch_larger_than_disk_tier(tmp_path):
+    """A batch with more new keys than disk slots keeps only what fits on disk."""
+    cache = EmbeddingCache("model", 8, tmp_path, memory_entries=0, disk_entries=4, eviction_batch=1)
+    cache.put(cache_key("model", "old"), vector(99))
+    keys = [cache_key("model", f"text {i}") for i in range(6)]
+    cache.put_many(keys, [vector(i) for i in range(6)])
+    found = cache.get_many(keys)
+    assert all(np.array_equal(found[i], vector(i)) for i in range(4))
+    assert found[4] is None and found[5] is None
+    assert cache.get(cache_key("model", "old")) is None
+    assert cache.stats()["disk_entries"] == 4
+
+def test_cached_service_embeds_each_text_once():
+    """Repeated and whitespace-variant texts are embedded once."""
+    service = CachedEmbeddingService(CountingService(), EmbeddingCache("model", 8))
+    first = service.get_batch_embeddings(["Gothic  nave", "Gothic nave", "Baroque dome"])
+    second = service.get_batch_embeddings(["Baroque dome", " Gothic nave "])
+    assert service.model.encoded == ["Gothic nave", "Baroque dome"]
+    assert first[0] == first[1] == second[1] and first[2] == second[0]
@@ -0,0 +1,77 @@
+"""
+Tests for multi-process embedding.
+"""
+import numpy as np
+import pytest
+from multiprocessing.shared_memory import SharedMemory
+
+from geolens.services import embedding_pool
+from geolens.services.embedding_cache import CachedEmbeddingService, EmbeddingCache
+from geolens.services.embedding_pool import EmbeddingPool
+
+class StubService:
+    """Worker service without a real model: a text's vector is its number and length."""
+    dimension = 2
+
+    def __init__(self, model_name):
+        self.model = self
+
+    def encode(self, texts, convert_to_numpy=True):
+        if "fail" in texts:
+            raise RuntimeError("model failed")
+        return np.array([[float(text.split()[-1]), len(text)] for text in texts], dtype=np.float32)
+
+@pytest.fixture(scope="module")
+def pool():
+    """Two workers running the stub service."""
+    with EmbeddingPool(workers=2, chunk_size=3, service_factory=StubService) as pool:
+        yield pool
+
+def test_chunks_reassembled_in_input_order(pool):
+    """Test that vectors from chunks finishing in any order come back in input order."""
+    texts = [f"text {i}" for i in range(10)]
+    progress = []
+
+    vectors = pool.encode(texts, progress=lambda done, total: progress.append((done, total)))
+
+    assert vectors.shape == (10, 2)
+    assert vectors[:, 0].tolist() == list(range(10))
+    # One call per chunk of 3, ending with everything done
+    assert len(progress) == 4
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+    assert progress[-1] == (10, 10)
+    assert pool.get_batch_embeddings(["text 7"]) == ["[7.0,6.0]"]
+
+def test_shared_memory_released_when_a_worker_fails(pool, monkeypatch):
+    """Test that a failing chunk raises and still unlinks the shared array."""
+    created = []
+
+    class RecordingSharedMemory(SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.name)
+
+    monkeypatch.setattr(embedding_pool, "SharedMemory", RecordingSharedMemory)
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        pool.encode(["text 1", "text 2", "text 3", "fail"])
+
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=created[0])
+    # The pool keeps working after a failed batch
+    assert pool.encode(["text 5"])[0].tolist() == [5.0, 6.0]
+
+def test_cache_sends_only_misses_to_pool(pool, tmp_path, monkeypatch):
+    """Test that a cached pool embeds each distinct uncached text once."""
+    batches = []
+    encode = pool.encode
+    monkeypatch.setattr(pool, "encode", lambda texts: batches.append(list(texts)) or encode(texts))
+    service = CachedEmbeddingService(pool, EmbeddingCache("stub", 2, tmp_path, memory_entries=100))
+
+    first = service.encode(["text 1", "text 2", "text 1"])
+    second = service.encode(["text 2", "text 3"])
+
+    assert batches == [["text 1", "text 2"], ["text 3"]]
+    assert first[:, 0].tolist() == [1, 2, 1]
+    assert second[:, 0].tolist() == [2, 3]
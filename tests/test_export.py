@@ -0,0 +1,84 @@
+"""
+Tests for streaming table export.
+"""
+import json
+import struct
+from datetime import date, datetime, timezone
+
+import pytest
+
+from geolens.services.export import EMBEDDING_DIMENSION, EXPORT_COLUMNS, geojson_feature, id_ranges
+
+def test_id_ranges_cover_every_id_once():
+    """Ranges are contiguous, cover [min, max] and never outnumber the ids."""
+    for min_id, max_id, parts in [(1, 1000, 4), (5, 7, 8), (1, 1, 3), (10, 1009, 7)]:
+        ranges = id_ranges(min_id, max_id, parts)
+        assert len(ranges) <= min(parts, max_id - min_id + 1)
+        assert ranges[0][0] == min_id and ranges[-1][1] == max_id + 1
+        assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+
+def test_geojson_feature_encodes_row():
+    """Geometry becomes the Feature geometry; JSON and dates are decoded and formatted."""
+    names = [name for name, _, _ in EXPORT_COLUMNS["historical_events"]]
+    values = {
+        "id": 3,
+        "location_id": 1,
+        "event_date": date(1889, 3, 31),
+        "event_type": "construction",
+        "description": "Completed",
+        "properties": '{"source": "archive"}',
+        "created_at": None,
+        "updated_at": None,
+        "embedding": [0.5, 0.25],
+        "geometry": '{"type":"Point","coordinates":[2.2945,48.8584]}',
+    }
+    feature = json.loads(geojson_feature("historical_events", [values[name] for name in names]))
+    assert feature["id"] == 3
+    assert feature["geometry"] == {"type": "Point", "coordinates": [2.2945, 48.8584]}
+    assert feature["properties"]["event_date"] == "1889-03-31"
+    assert feature["properties"]["properties"] == {"source": "archive"}
+    assert "geometry" not in feature["properties"]
+
+def test_geoparquet_metadata():
+    """Tables with geometry carry GeoParquet metadata; relationships don't."""
+    pytest.importorskip("pyarrow")
+    from geolens.services.export import arrow_schema
+
+    schema = arrow_schema("architectural_features")
+    geo = json.loads(schema.metadata[b"geo"])
+    assert geo["primary_column"] == "geometry"
+    assert geo["columns"]["geometry"]["encoding"] == "WKB"
+    assert schema.field("embedding").type.list_size == 384
+    assert arrow_schema("relationships").metadata is None
+
+def test_parquet_part_round_trip(tmp_path):
+    """Rows written through row groups read back unchanged, with a group per `row_group_size` rows."""
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from geolens.services.export import _ParquetPart
+
+    names = [name for name, _, _ in EXPORT_COLUMNS["historical_events"]]
+    rows = [
+        [
+            id, 1, date(1163 + id, 1, 1), "construction", f"Event {id}", '{"source": "archive"}',
+            datetime(2024, 1, 1, tzinfo=timezone.utc), None,
+            [id / 1000] * EMBEDDING_DIMENSION,
+            struct.pack("<BIdd", 1, 1, 2.3488, 48.8529),
+        ]
+        for id in range(1, 6)
+    ]
+    path = tmp_path / "part-00000.parquet"
+    part = _ParquetPart(path, "historical_events", row_group_size=2)
+    part.write(rows[:3])
+    part.write(rows[3:])
+    part.close()
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    assert json.loads(parquet.schema_arrow.metadata[b"geo"])["primary_column"] == "geometry"
+    table = parquet.read()
+    assert table.column_names == names
+    assert table.column("id").to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column("event_date").to_pylist()[0] == date(1164, 1, 1)
+    assert table.column("geometry").to_pylist()[0] == rows[0][-1]
+    assert table.column("embedding").to_pylist()[4] == pytest.approx([0.005] * EMBEDDING_DIMENSION)
@@ -0,0 +1,223 @@
+"""
+Tests for influence graph maintenance and traversal on a multi-path graph.
+"""
+from typing import Dict, List, Tuple
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from geolens.database.closure import DELETE_ORPHANS, REBUILD
+from geolens.services.database import DatabaseService
+
+pytestmark = pytest.mark.asyncio
+
+# A diamond A -> {B, C} -> D, a cycle back from D to A, a tail D -> E and a weak edge A -> F
+EDGES = [
+    ("A", "B", 0.9),
+    ("A", "C", 0.5),
+    ("A", "F", 0.3),
+    ("B", "D", 0.8),
+    ("C", "D", 0.9),
+    ("D", "A", 0.5),
+    ("D", "E", 0.6),
+]
+
+async def add_edges(session: AsyncSession, ids: Dict[str, int], edges: List[Tuple[str, str, float]]) -> None:
+    """Helper inserting `influences` edges in one statement."""
+    await session.execute(
+        text("""
+            INSERT INTO geolens.relationships (from_location_id, to_location_id, relationship_type, strength)
+            SELECT from_id, to_id, 'influences', strength
+            FROM unnest(CAST(:from_ids AS integer[]), CAST(:to_ids AS integer[]), CAST(:strengths AS float8[]))
+                AS e(from_id, to_id, strength)
+        """),
+        {
+            "from_ids": [ids[source] for source, _, _ in edges],
+            "to_ids": [ids[target] for _, target, _ in edges],
+            "strengths": [strength for _, _, strength in edges],
+        }
+    )
+
+@pytest_asyncio.fixture
+async def graph(async_engine: AsyncEngine):
+    """Session holding the seeded graph (rolled back afterwards) and location ids by letter."""
+    async with AsyncSession(async_engine) as session:
+        ids = {}
+        for offset, letter in enumerate("ABCDEF"):
+            ids[letter] = (await session.execute(
+                text("""
+                    INSERT INTO geolens.locations (name, location_type, geometry)
+                    VALUES (:name, 'landmark', ST_SetSRID(ST_MakePoint(:lon, 10), 4326))
+                    RETURNING id
+                """),
+                {"name": f"Graph {letter}", "lon": offset}
+            )).scalar_one()
+        await add_edges(session, ids, EDGES)
+        yield session, ids
+        await session.rollback()
+
+async def closure_rows(session: AsyncSession, ids: Dict[str, int], source: str) -> List[tuple]:
+    """Helper reading a source's closure as (target, depth, strength, via, path, path count) in letters."""
+    letters = {id: letter for letter, id in ids.items()}
+    result = await session.execute(
+        text("""
+            SELECT target_location_id, depth, strength, via_location_id, path, path_count
+            FROM geolens.influence_closure
+            WHERE source_location_id = :source
+        """),
+        {"source": ids[source]}
+    )
+    return sorted(
+        (
+            letters[row.target_location_id],
+            row.depth,
+            round(row.strength, 6),
+            letters[row.via_location_id],
+            "".join(letters[id] for id in row.path),
+            row.path_count,
+        )
+        for row in result
+    )
+
+async def whole_closure(session: AsyncSession) -> List[tuple]:
+    """Helper reading every closure row."""
+    result = await session.execute(text("""
+        SELECT source_location_id, target_location_id, depth, round(strength::numeric, 6), via_location_id, path, path_count
+        FROM geolens.influence_closure
+        ORDER BY 1, 2, 3
+    """))
+    return [tuple(row) for row in result]
+
+async def assert_matches_rebuild(session: AsyncSession) -> None:
+    """Helper checking the trigger-maintained closure against a full rebuild."""
+    maintained = await whole_closure(session)
+    await session.execute(text(DELETE_ORPHANS))
+    await session.execute(text(REBUILD))
+    assert maintained == await whole_closure(session)
+
+async def test_closure_of_diamond_with_cycle(graph):
+    """Test that each location and depth keeps its strongest path and counts every path."""
+    session, ids = graph
+
+    assert await closure_rows(session, ids, "A") == [
+        ("A", 3, 0.36, "D", "ABDA", 2),
+        ("B", 1, 0.9, "A", "AB", 1),
+        ("C", 1, 0.5, "A", "AC", 1),
+        ("D", 2, 0.72, "B", "ABD", 2),
+        ("E", 3, 0.432, "D", "ABDE", 2),
+        ("F", 1, 0.3, "A", "AF", 1),
+    ]
+    assert await closure_rows(session, ids, "E") == []
+
+async def test_closure_maintained_on_insert_and_delete(graph):
+    """Test that edge changes re-derive exactly the affected sources."""
+    session, ids = graph
+
+    await add_edges(session, ids, [("C", "E", 0.9)])
+    assert await closure_rows(session, ids, "A") == [
+        ("A", 3, 0.36, "D", "ABDA", 2),
+        ("B", 1, 0.9, "A", "AB", 1),
+        ("C", 1, 0.5, "A", "AC", 1),
+        ("D", 2, 0.72, "B", "ABD", 2),
+        ("E", 2, 0.45, "C", "ACE", 1),
+        ("E", 3, 0.432, "D", "ABDE", 2),
+        ("F", 1, 0.3, "A", "AF", 1),
+    ]
+    # D reaches C through the cycle, so its closure changes too
+    assert ("E", 3, 0.225, "C", "DACE", 1) in await closure_rows(session, ids, "D")
+    await assert_matches_rebuild(session)
+
+    await session.execute(
+        text("""
+            DELETE FROM geolens.relationships
+            WHERE from_location_id = :from_id AND to_location_id = :to_id
+        """),
+        {"from_id": ids["B"], "to_id": ids["D"]}
+    )
+    assert await closure_rows(session, ids, "A") == [
+        ("A", 3, 0.225, "D", "ACDA", 1),
+        ("B", 1, 0.9, "A", "AB", 1),
+        ("C", 1, 0.5, "A", "AC", 1),
+        ("D", 2, 0.45, "C", "ACD", 1),
+        ("E", 2, 0.45, "C", "ACE", 1),
+        ("E", 3, 0.27, "D", "ACDE", 1),
+        ("F", 1, 0.3, "A", "AF", 1),
+    ]
+    assert await closure_rows(session, ids, "B") == []
+    await assert_matches_rebuild(session)
+
+def traversal(influences: List[dict]) -> List[tuple]:
+    """Helper reducing influence rows to (path in letters, strength), in result order."""
+    return [
+        ("".join(name[-1] for name in influence["path"]), round(influence["influence_strength"], 6))
+        for influence in influences
+    ]
+
+async def test_fanout_follows_strongest_edges(graph):
+    """Test that max_fanout expands only each location's strongest edges and never re-enters a path."""
+    session, ids = graph
+    service = DatabaseService(session)
+
+    single = await service.find_architectural_influences(ids["A"], max_depth=6, max_fanout=1)
+    assert traversal(single) == [("AB", 0.9), ("ABD", 0.72), ("ABDE", 0.432)]
+
+    double = await service.find_architectural_influences(ids["A"], max_depth=6, max_fanout=2)
+    # Paths reaching A again end there instead of going round the cycle
+    assert traversal(double) == [
+        ("AB", 0.9), ("AC", 0.5),
+        ("ABD", 0.72), ("ACD", 0.45),
+        ("ABDE", 0.432), ("ABDA", 0.36), ("ACDE", 0.27), ("ACDA", 0.225),
+    ]
+
+async def test_beam_keeps_strongest_paths_per_depth(graph):
+    """Test that beam_width bounds every level, including the direct influences."""
+    session, ids = graph
+    service = DatabaseService(session)
+
+    influences = await service.find_architectural_influences(ids["A"], max_depth=6, beam_width=2)
+
+    assert traversal(influences) == [
+        ("AB", 0.9), ("AC", 0.5),
+        ("ABD", 0.72), ("ACD", 0.45),
+        ("ABDE", 0.432), ("ABDA", 0.36),
+    ]
+
+async def test_min_strength_and_limit(graph):
+    """Test that weak paths are never expanded and the limit keeps the shallowest, strongest paths."""
+    session, ids = graph
+    service = DatabaseService(session)
+
+    strong = await service.find_architectural_influences(ids["A"], max_depth=6, min_strength=0.4)
+    assert traversal(strong) == [("AB", 0.9), ("AC", 0.5), ("ABD", 0.72), ("ACD", 0.45), ("ABDE", 0.432)]
+
+    limited = await service.find_architectural_influences(ids["A"], max_depth=6, limit=3)
+    assert traversal(limited) == [("AB", 0.9), ("AC", 0.5), ("AF", 0.3)]
+
+async def test_influence_paths_ranked_by_strength(graph):
+    """Test that paths met from both ends are joined and ranked strongest first."""
+    session, ids = graph
+    service = DatabaseService(session)
+
+    # Forwards from A and backwards from E meet at B and C
+    paths = await service.find_influence_paths(ids["A"], ids["E"])
+    assert traversal(paths) == [("ABDE", 0.432), ("ACDE", 0.27)]
+    assert (paths[0]["from_location"], paths[0]["to_location"], paths[0]["depth"]) == ("Graph D", "Graph E", 3)
+
+    # Through the cycle edge D -> A
+    assert traversal(await service.find_influence_paths(ids["B"], ids["A"])) == [("BDA", 0.4)]
+    assert traversal(await service.find_influence_paths(ids["D"], ids["B"])) == [("DAB", 0.45)]
+    assert await service.find_influence_paths(ids["E"], ids["A"]) == []
+
+async def test_influence_paths_limits(graph):
+    """Test that limit, min_strength and max_depth cut the ranked paths."""
+    session, ids = graph
+    service = DatabaseService(session)
+
+    assert traversal(await service.find_influence_paths(ids["A"], ids["E"], limit=1)) == [("ABDE", 0.432)]
+    assert traversal(await service.find_influence_paths(ids["A"], ids["E"], min_strength=0.3)) == [("ABDE", 0.432)]
+    assert await service.find_influence_paths(ids["A"], ids["E"], max_depth=2) == []
+    assert traversal(await service.find_influence_paths(ids["A"], ids["D"], max_depth=2)) == [
+        ("ABD", 0.72), ("ACD", 0.45),
+    ]
@@ -0,0 +1,121 @@
+"""
+Tests for historical event partition planning.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from geolens.database.cube import BUCKETS, EVENTS_TRIGGER_FUNCTION, EVENTS_TRIGGERS, RESOLUTIONS
+from geolens.database.ddl import UPDATED_AT_FUNCTION
+from geolens.database.partitions import (
+    LEGACY_TABLE,
+    MIRROR_FUNCTION,
+    MIRROR_TRIGGER,
+    PARTITIONED_INDEXES,
+    SHADOW_TABLE,
+    _swap_tables,
+    partition_name,
+    partition_ranges,
+    shadow_index_name,
+)
+
+# A geolens schema as migrations 005 and 015 leave it, before the swap
+PRE_SWAP_SCHEMA = [
+    "CREATE SCHEMA geolens",
+    "CREATE TABLE geolens.locations (id serial PRIMARY KEY, geometry geography)",
+    UPDATED_AT_FUNCTION,
+    """
+    CREATE TABLE geolens.historical_events (
+        id serial PRIMARY KEY,
+        location_id integer NOT NULL REFERENCES geolens.locations (id),
+        event_date date NOT NULL,
+        event_type varchar NOT NULL,
+        embedding vector(3),
+        updated_at timestamptz DEFAULT now()
+    )
+    """,
+    f"""
+    CREATE TABLE geolens.{SHADOW_TABLE} (
+        LIKE geolens.historical_events INCLUDING DEFAULTS INCLUDING GENERATED,
+        PRIMARY KEY (id, event_date),
+        FOREIGN KEY (location_id) REFERENCES geolens.locations (id)
+    ) PARTITION BY RANGE (event_date)
+    """,
+    f"CREATE TABLE geolens.{SHADOW_TABLE}_default PARTITION OF geolens.{SHADOW_TABLE} DEFAULT",
+    *(
+        f"CREATE INDEX {shadow_index_name(name)} ON geolens.{SHADOW_TABLE} {definition}"
+        for name, definition in PARTITIONED_INDEXES.items()
+    ),
+    MIRROR_FUNCTION,
+    MIRROR_TRIGGER,
+    """
+    CREATE TABLE geolens.event_cube (
+        resolution integer NOT NULL,
+        bucket varchar NOT NULL,
+        period_start integer NOT NULL,
+        event_type varchar NOT NULL,
+        cell varchar NOT NULL,
+        lon double precision NOT NULL,
+        lat double precision NOT NULL,
+        event_count bigint NOT NULL,
+        PRIMARY KEY (resolution, bucket, period_start, event_type, cell)
+    )
+    """,
+    EVENTS_TRIGGER_FUNCTION,
+    *EVENTS_TRIGGERS,
+]
+
+def test_partition_ranges_are_aligned():
+    """Test that partition ranges cover the years on aligned boundaries."""
+    ranges = partition_ranges(1163, 1345)
+
+    assert ranges == [
+        (date(1100, 1, 1), date(1200, 1, 1)),
+        (date(1200, 1, 1), date(1300, 1, 1)),
+        (date(1300, 1, 1), date(1400, 1, 1)),
+    ]
+    assert partition_name(*ranges[0]) == "historical_events_1100_1200"
+    assert shadow_index_name("idx_historical_events_date") == "idx_historical_events_partitioned_date"
+
+def test_partition_ranges_reject_empty_span():
+    """Test that a non-positive span is rejected."""
+    with pytest.raises(ValueError):
+        partition_ranges(1900, 2000, span_years=0)
+
+@pytest.mark.asyncio
+async def test_swap_moves_event_cube_triggers(async_engine: AsyncEngine):
+    """Test that events inserted after the swap still reach the event cube."""
+    async with async_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            # A scratch pre-swap schema in place of the real one, until the rollback
+            await conn.execute(text("ALTER SCHEMA geolens RENAME TO geolens_saved"))
+            for statement in PRE_SWAP_SCHEMA:
+                await conn.execute(text(statement))
+
+            await _swap_tables(conn)
+
+            location_id = (await conn.execute(text(
+                "INSERT INTO geolens.locations (geometry) "
+                "VALUES (ST_SetSRID(ST_MakePoint(2.3488, 48.8529), 4326)::geography) RETURNING id"
+            ))).scalar_one()
+            await conn.execute(
+                text("""
+                    INSERT INTO geolens.historical_events (location_id, event_date, event_type)
+                    VALUES (:location_id, '1163-01-01', 'construction')
+                """),
+                {"location_id": location_id}
+            )
+            counted = (await conn.execute(text("SELECT sum(event_count) FROM geolens.event_cube"))).scalar()
+            legacy_triggers = (await conn.execute(text(f"""
+                SELECT count(*) FROM pg_trigger
+                WHERE tgrelid = 'geolens.{LEGACY_TABLE}'::regclass AND tgname LIKE 'event_cube%'
+            """))).scalar()
+        finally:
+            await transaction.rollback()
+
+    # One cell per resolution and bucket
+    assert counted == len(RESOLUTIONS) * len(BUCKETS)
+    assert legacy_triggers == 0
@@ -0,0 +1,87 @@
+"""
+Tests for incremental re-embedding.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from geolens.services.embeddings import get_embedding_service
+from geolens.services.reembed import Checkpoint, content_hash, embedded_text, reembed, reembed_table
+
+class RecordingService:
+    """Embedding service recording which texts it was asked to embed."""
+
+    def __init__(self):
+        self.texts = []
+
+    def get_batch_embeddings(self, texts):
+        self.texts.extend(texts)
+        return get_embedding_service().get_batch_embeddings(texts)
+
+class Interrupted(Exception):
+    pass
+
+def test_checkpoint_clears_only_given_tables(tmp_path):
+    """Clearing one table keeps the other's position on disk."""
+    path = tmp_path / "checkpoint.json"
+    checkpoint = Checkpoint(path)
+    checkpoint.save("architectural_features", 10)
+    checkpoint.save("historical_events", 20)
+
+    checkpoint.clear(["architectural_features"])
+    assert Checkpoint(path).positions == {"historical_events": 20}
+    checkpoint.clear()
+    assert not path.exists()
+
+def test_content_hash_matches_embedded_text():
+    """Texts and hashes match what the SQL expressions compute; null columns are skipped."""
+    assert embedded_text("architectural_features", {"style": "Gothic", "description": None}) == "Gothic"
+    # encode(sha256(convert_to(concat_ws(' ', 'Gothic', NULL), 'UTF8')), 'hex')
+    assert content_hash("Gothic") == "e7dd6b4ae6702ccf525a00a6a65785a691250fc69fbb30738a59452d89e7e1a0"
+
+@pytest.mark.asyncio
+async def test_reembed_detects_changed_text(async_engine: AsyncEngine):
+    """Sample rows are current; only a row whose text changed is re-embedded."""
+    service = RecordingService()
+    assert (await reembed_table(async_engine, "architectural_features", service)).embedded == 0
+
+    async with async_engine.begin() as conn:
+        feature_id, description = (await conn.execute(text(
+            "SELECT id, description FROM geolens.architectural_features WHERE style = 'English Baroque'"
+        ))).one()
+        await conn.execute(
+            text("UPDATE geolens.architectural_features SET description = 'Domed cathedral' WHERE id = :id"),
+            {"id": feature_id}
+        )
+    try:
+        result = await reembed_table(async_engine, "architectural_features", service)
+        assert result.embedded == 1
+        assert service.texts == ["English Baroque Domed cathedral"]
+    finally:
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                text("UPDATE geolens.architectural_features SET description = :description WHERE id = :id"),
+                {"id": feature_id, "description": description}
+            )
+        await reembed_table(async_engine, "architectural_features", service)
+
+@pytest.mark.asyncio
+async def test_reembed_resumes_from_checkpoint(async_engine: AsyncEngine, tmp_path):
+    """An interrupted run resumes after the last committed batch."""
+    async with async_engine.begin() as conn:
+        stale = (await conn.execute(text(
+            "UPDATE geolens.architectural_features SET embedding = NULL RETURNING id"
+        ))).scalars().all()
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json")
+
+    def interrupt(result):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        await reembed(async_engine, RecordingService(), ["architectural_features"], 1, checkpoint, interrupt)
+    assert Checkpoint(tmp_path / "checkpoint.json").get("architectural_features") == min(stale)
+
+    service = RecordingService()
+    results = await reembed(async_engine, service, ["architectural_features"], 1, checkpoint)
+    assert results[0].embedded == len(stale) - 1
+    assert not (tmp_path / "checkpoint.json").exists()
@@ -0,0 +1,84 @@
+"""
+Tests for region and corridor queries.
+"""
+import math
+
+import pytest
+from geoalchemy2 import WKTElement
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from geolens.database.models import Region, RegionPart
+from geolens.services.database import DatabaseService
+
+pytestmark = pytest.mark.asyncio
+
+def city_polygon(lon: float, lat: float, radius_km: float, vertices: int = 5000) -> str:
+    """Helper building a detailed, irregular city-boundary-like polygon as WKT."""
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        # Ragged edge: several overlapping waves like a real administrative boundary
+        radius = radius_km * (1 + 0.15 * math.sin(7 * angle) + 0.05 * math.sin(53 * angle))
+        points.append((
+            lon + radius / (111.32 * math.cos(math.radians(lat))) * math.cos(angle),
+            lat + radius / 110.57 * math.sin(angle),
+        ))
+    points.append(points[0])
+    return "POLYGON((" + ", ".join(f"{x} {y}" for x, y in points) + "))"
+
+def river_line(start_lon: float, end_lon: float, lat: float, vertices: int = 4000) -> str:
+    """Helper building a meandering river-like linestring as WKT."""
+    points = []
+    for i in range(vertices):
+        fraction = i / (vertices - 1)
+        lon = start_lon + (end_lon - start_lon) * fraction
+        points.append((lon, lat + 0.01 * math.sin(fraction * 40)))
+    return "LINESTRING(" + ", ".join(f"{x} {y}" for x, y in points) + ")"
+
+async def add_region(session: AsyncSession, name: str, region_type: str, wkt: str) -> Region:
+    """Helper inserting a region; its parts are created by trigger."""
+    region = Region(name=name, region_type=region_type, geometry=WKTElement(wkt, srid=4326))
+    session.add(region)
+    await session.flush()
+    return region
+
+async def test_region_is_subdivided(db_session: AsyncSession):
+    """Test that a large polygon is stored as many small parts."""
+    region = await add_region(db_session, "Paris", "city", city_polygon(2.3488, 48.8566, 8))
+
+    parts = (await db_session.execute(
+        select(func.ST_NPoints(func.geometry(RegionPart.geometry))).where(
+            RegionPart.region_id == region.id
+        )
+    )).scalars().all()
+
+    assert len(parts) > 1
+    assert max(parts) <= 256
+
+async def test_find_locations_in_region(db_session: AsyncSession):
+    """Test point-in-polygon against a detailed city boundary."""
+    service = DatabaseService(db_session)
+    paris = await add_region(db_session, "Paris", "city", city_polygon(2.3488, 48.8566, 8))
+    london = await add_region(db_session, "London", "city", city_polygon(-0.1276, 51.5072, 15))
+
+    in_paris = await service.find_locations_in_region(paris.id, columns=["id", "name"])
+    in_london = await service.find_locations_in_region(london.id, columns=["id", "name"])
+
+    assert "Notre-Dame Cathedral" in [location.name for location in in_paris]
+    assert "Notre-Dame Cathedral" not in [location.name for location in in_london]
+    assert "St. Paul's Cathedral" in [location.name for location in in_london]
+
+async def test_find_within_distance_of_corridor(db_session: AsyncSession):
+    """Test corridor queries along a long, detailed river line."""
+    service = DatabaseService(db_session)
+    seine = await add_region(db_session, "Seine", "river", river_line(2.0, 2.7, 48.8529))
+
+    near = await service.find_locations_in_region(seine.id, distance_meters=2000, columns=["id", "name"])
+    events = await service.find_events_in_region(seine.id, distance_meters=2000, columns=["id", "location_id"])
+    features = await service.find_architecture_in_region(seine.id, distance_meters=2000, columns=["id", "style"])
+
+    assert "Notre-Dame Cathedral" in [location.name for location in near]
+    assert "St. Paul's Cathedral" not in [location.name for location in near]
+    assert {event.location_id for event in events} <= {location.id for location in near}
+    assert len(features) > 0
@@ -0,0 +1,187 @@
+"""
+Tests for geographic sharding and scatter-gather merging.
+"""
+from collections import namedtuple
+
+import pytest
+from geoalchemy2 import WKTElement
+
+from geolens.config import ShardSpec, get_settings
+from geolens.database.init import init_database
+from geolens.database.models import Location
+from geolens.services.sharding import (
+    ShardedDatabaseService,
+    ShardMap,
+    ShardRouter,
+    geohash_encode,
+)
+
+SHARDS = [
+    ShardSpec(name="europe", url="postgresql+asyncpg://europe/geolens", prefixes=["u", "g", "e", "s"]),
+    ShardSpec(name="americas", url="postgresql+asyncpg://americas/geolens", prefixes=["9", "c", "d", "f", "6", "7"]),
+    ShardSpec(name="rest", url="postgresql+asyncpg://rest/geolens", prefixes=[""]),
+]
+
+PARIS = (48.8529, 2.3488)
+NEW_YORK = (40.7128, -74.0060)
+
+def test_geohash_encode_reference_value():
+    """Test geohash encoding against the published reference point."""
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+def test_shard_for_point_longest_prefix():
+    """Test that points are placed by their longest matching prefix."""
+    shard_map = ShardMap(SHARDS)
+
+    assert shard_map.shard_for_point(*PARIS) == "europe"
+    assert shard_map.shard_for_point(*NEW_YORK) == "americas"
+    assert shard_map.shard_for_point(-33.8688, 151.2093) == "rest"
+
+def test_queries_inside_one_area_hit_one_shard():
+    """Test that routing only fans out when a query crosses shard areas."""
+    shard_map = ShardMap(SHARDS)
+
+    assert shard_map.shards_for_radius(*PARIS, 5000) == ["europe"]
+    assert shard_map.shards_for_bbox(2.2, 48.8, 2.5, 48.9) == ["europe"]
+    assert shard_map.shards_for_bbox(-80.0, 30.0, 60.0, 55.0) == ["europe", "americas", "rest"]
+
+def test_shard_map_must_cover_globe():
+    """Test that a shard map with gaps is rejected."""
+    with pytest.raises(ValueError):
+        ShardMap([ShardSpec(name="europe", url="postgresql+asyncpg://europe/geolens", prefixes=["u"])])
+
+class FakeSession:
+    """Session stand-in answering feature lookups by id."""
+
+    def __init__(self, features):
+        self.features = features
+
+    async def execute(self, statement, params):
+        row = self.features.get(params["feature_id"])
+        return namedtuple("Result", ["one_or_none"])(lambda: row)
+
+class FakeService:
+    """Per-shard stand-in returning canned nearest-neighbour results."""
+
+    def __init__(self, rows, features=None):
+        self.rows = rows
+        self.session = FakeSession(features or {})
+
+    async def find_nearest_locations(
+        self, lat, lon, k=10, columns=None, max_distance_meters=None, properties=None, property_path=None
+    ):
+        rows = [(row, distance) for row, distance in self.rows
+                if max_distance_meters is None or distance <= max_distance_meters]
+        return rows[:k]
+
+    async def find_locations_in_bbox(self, *args):
+        return [row for row, _ in self.rows]
+
+class FakeRouter(ShardRouter):
+    """Router running calls against fake per-shard services."""
+
+    def __init__(self, services):
+        super().__init__(ShardMap(SHARDS), {name: None for name in services})
+        self.services = services
+        self.calls = []
+
+    async def run(self, shard, call):
+        self.calls.append(shard)
+        return await call(self.services[shard])
+
+@pytest.mark.asyncio
+async def test_nearest_merges_top_k_across_shards():
+    """Test that KNN keeps the global top-k and skips shards out of range."""
+    router = FakeRouter({
+        "europe": FakeService([("paris", 10.0), ("lyon", 390_000.0)]),
+        "americas": FakeService([("new york", 5_837_000.0)]),
+        "rest": FakeService([("tunis", 1_470_000.0)]),
+    })
+    service = ShardedDatabaseService(router)
+
+    nearest = await service.find_nearest_locations(*PARIS, k=2)
+    assert nearest == [("paris", 10.0), ("lyon", 390_000.0)]
+    assert router.calls == ["europe"]
+
+    router.calls.clear()
+    nearest = await service.find_nearest_locations(*PARIS, k=4)
+    assert [name for name, _ in nearest] == ["paris", "lyon", "tunis", "new york"]
+    assert router.calls[0] == "europe"
+
+@pytest.mark.asyncio
+async def test_radius_search_merges_nearest_across_shards():
+    """Test that radius search returns the nearest `limit` rows, like the single-database search."""
+    router = FakeRouter({
+        "europe": FakeService([("ne", 1_000.0), ("ne far", 30_000.0), ("ne out", 90_000.0)]),
+        "americas": FakeService([("sw", 2_000.0), ("sw far", 50_000.0)]),
+        "rest": FakeService([("se", 20_000.0)]),
+    })
+    service = ShardedDatabaseService(router)
+
+    # A circle around (0, 0) touches every shard
+    near = await service.find_locations_near(0.0, 0.0, distance_meters=60_000, limit=3)
+
+    assert near == ["ne", "sw", "se"]
+    assert sorted(router.calls) == ["americas", "europe", "rest"]
+
+    router.calls.clear()
+    nearest = await service.find_nearest_locations(0.0, 0.0, k=3, max_distance_meters=60_000)
+    assert nearest == [("ne", 1_000.0), ("sw", 2_000.0), ("se", 20_000.0)]
+
+@pytest.mark.asyncio
+async def test_bbox_keeps_rows_sharing_an_id():
+    """Test that rows from different shards with the same id are all kept, in (id, shard) order."""
+    Row = namedtuple("LocationRow", ["id", "name"])
+    router = FakeRouter({
+        "europe": FakeService([(Row(1, "paris"), 0.0), (Row(3, "lyon"), 0.0)]),
+        "americas": FakeService([(Row(1, "new york"), 0.0), (Row(2, "boston"), 0.0)]),
+        "rest": FakeService([]),
+    })
+    service = ShardedDatabaseService(router)
+
+    rows = await service.find_locations_in_bbox(-80.0, 30.0, 60.0, 55.0, columns=["id", "name"])
+
+    assert [row.name for row in rows] == ["paris", "new york", "boston", "lyon"]
+
+@pytest.mark.asyncio
+async def test_similar_architecture_rejects_ids_on_several_shards():
+    """Test that a feature id found on more than one shard is refused rather than guessed."""
+    Feature = namedtuple("Feature", ["embedding"])
+    router = FakeRouter({
+        "europe": FakeService([], {1: Feature("[1,0]")}),
+        "americas": FakeService([], {1: Feature("[0,1]")}),
+        "rest": FakeService([]),
+    })
+    service = ShardedDatabaseService(router)
+
+    with pytest.raises(ValueError, match="2 shards"):
+        await service.find_similar_architecture(1)
+    assert await service.find_similar_architecture(2) == []
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not get_settings().SHARDS, reason="SHARDS is not configured")
+async def test_scatter_gather_on_local_shards():
+    """Test placement and cross-shard KNN against real shard databases."""
+    router = ShardRouter.from_settings(get_settings())
+    try:
+        for engine in router.engines.values():
+            await init_database(engine)
+        await router.provision_id_ranges()
+        for name, (lat, lon) in (("Paris", PARIS), ("New York", NEW_YORK)):
+            async with router.session_for_point(lat, lon) as session:
+                session.add(Location(
+                    name=f"Shard test {name}",
+                    location_type="test",
+                    geometry=WKTElement(f"POINT({lon} {lat})", srid=4326)
+                ))
+                await session.commit()
+
+        service = ShardedDatabaseService(router)
+        near_paris = await service.find_locations_near(*PARIS, distance_meters=1000, columns=["id", "name"])
+        nearest = await service.find_nearest_locations(*PARIS, k=50, columns=["id", "name"])
+
+        assert "Shard test Paris" in [row.name for row in near_paris]
+        names = [row.name for row, _ in nearest]
+        assert names.index("Shard test Paris") < names.index("Shard test New York")
+    finally:
+        await router.dispose()
@@ -0,0 +1,72 @@
+"""
+Tests for the feature similarity join.
+"""
+import numpy as np
+
+from geolens.services.similarity_join import FeatureVectors, strongest_location_pairs, top_k_pairs
+
+def random_features(count: int = 300, dimension: int = 16, seed: int = 7) -> FeatureVectors:
+    """Helper building normalised random features, some without a year."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    years = rng.integers(1000, 2000, size=count).astype(np.float64)
+    years[::17] = np.nan
+    return FeatureVectors(
+        feature_ids=np.arange(1, count + 1),
+        location_ids=rng.integers(0, count // 2, size=count),
+        years=years,
+        vectors=vectors,
+    )
+
+def brute_force(features: FeatureVectors, k: int, temporal: bool):
+    """Reference top-k computed row by row over the full matrix."""
+    scores = features.vectors @ features.vectors.T
+    excluded = features.location_ids[:, None] == features.location_ids[None, :]
+    if temporal:
+        excluded |= ~(features.years[None, :] < features.years[:, None])
+    scores[excluded] = -np.inf
+    expected = set()
+    for target, row in enumerate(scores):
+        for source in np.argsort(-row)[:k]:
+            if np.isfinite(row[source]):
+                expected.add((target, int(source)))
+    return expected
+
+def test_blocked_join_matches_brute_force():
+    """Test that blocking over rows and columns gives the exact top-k."""
+    features = random_features()
+
+    for temporal in (False, True):
+        targets, sources, scores = top_k_pairs(
+            features.vectors, features.location_ids, features.years,
+            0, len(features.vectors), k=5, block_size=64, temporal=temporal
+        )
+        assert set(zip(targets.tolist(), sources.tolist())) == brute_force(features, 5, temporal)
+        np.testing.assert_allclose(
+            scores, np.sum(features.vectors[targets] * features.vectors[sources], axis=1), rtol=1e-5
+        )
+        if temporal:
+            assert np.all(features.years[sources] < features.years[targets])
+
+def test_location_pairs_keep_strongest_feature_pair():
+    """Test that each location pair is proposed once, with its best score."""
+    features = random_features()
+    targets, sources, scores = top_k_pairs(
+        features.vectors, features.location_ids, features.years,
+        0, len(features.vectors), k=5, temporal=False
+    )
+
+    from_locations, to_locations, from_features, to_features, similarities = strongest_location_pairs(
+        features, targets, sources, scores
+    )
+
+    pairs = list(zip(from_locations.tolist(), to_locations.tolist()))
+    assert len(pairs) == len(set(pairs))
+    best = {}
+    for target, source, score in zip(targets, sources, scores):
+        key = (features.location_ids[source], features.location_ids[target])
+        best[key] = max(best.get(key, -1.0), score)
+    assert {pair: float(score) for pair, score in zip(pairs, similarities)} == {
+        (int(a), int(b)): float(score) for (a, b), score in best.items()
+    }
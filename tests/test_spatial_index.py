@@ -0,0 +1,74 @@
+"""
+Tests for the in-memory spatial index.
+"""
+import numpy as np
+
+from geolens.database.projections import row_factory
+from geolens.services.spatial_index import LocationIndex, haversine_meters
+
+LANDMARKS = [
+    (1, "Notre-Dame Cathedral", 2.3488, 48.8529),
+    (2, "Sagrada Familia", 2.1744, 41.4036),
+    (3, "St. Paul's Cathedral", -0.0983, 51.5138),
+    (4, "Sainte-Chapelle", 2.3450, 48.8554),
+    (5, "Fiji Museum", 178.4250, -18.1497),
+    (6, "Samoa Cultural Village", -171.7600, -13.8300),
+]
+
+def build_index() -> LocationIndex:
+    """Helper building an index without a database."""
+    index = LocationIndex(columns=["id", "name"])
+    make_row = row_factory("LocationRow", index.columns)
+    index.apply([(make_row((id, name)), lon, lat) for id, name, lon, lat in LANDMARKS])
+    return index
+
+def test_haversine_paris_to_london():
+    """Test great-circle distance against a known value (~344 km)."""
+    distance = haversine_meters(np.array([-0.0983]), np.array([51.5138]), 2.3488, 48.8529)[0]
+    assert 340_000 < distance < 348_000
+
+def test_find_locations_near():
+    """Test radius search returns nearest first with the projection shape."""
+    index = build_index()
+
+    locations = index.find_locations_near(lat=48.8529, lon=2.3488, distance_meters=1000)
+
+    assert [loc.name for loc in locations] == ["Notre-Dame Cathedral", "Sainte-Chapelle"]
+    assert locations[0]._fields == ("id", "name")
+
+def test_find_nearest_across_antimeridian():
+    """Test k-nearest search wraps around the antimeridian."""
+    index = build_index()
+
+    nearest = index.find_nearest(lat=-16.0, lon=179.9, k=2)
+
+    assert [row.id for row, _ in nearest] == [5, 6]
+    assert nearest[0][1] < nearest[1][1]
+
+def test_apply_moves_existing_location():
+    """Test that a changed row replaces the indexed entry."""
+    index = build_index()
+    make_row = row_factory("LocationRow", index.columns)
+
+    index.apply([(make_row((3, "St. Paul's Cathedral")), 2.35, 48.85)])
+
+    assert len(index) == len(LANDMARKS)
+    names = [loc.name for loc in index.find_locations_in_bbox(2.3, 48.8, 2.4, 48.9)]
+    assert "St. Paul's Cathedral" in names
+
+def test_default_columns_exclude_geometry():
+    """Test that an index built with default columns holds the light columns, not geometry."""
+    index = LocationIndex()
+
+    assert index.columns[0] == "id"
+    assert "name" in index.columns
+    assert "geometry" not in index.columns
+
+def test_find_locations_in_bbox_across_antimeridian():
+    """Test that a box with min_lon > max_lon wraps around the antimeridian."""
+    index = build_index()
+
+    locations = index.find_locations_in_bbox(178.0, -20.0, -171.0, -13.0)
+
+    assert [loc.id for loc in locations] == [5, 6]
+    assert index.find_locations_in_bbox(-171.0, -20.0, 178.0, -13.0) == []
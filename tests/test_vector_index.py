@@ -0,0 +1,63 @@
+"""
+Tests for vector index planning and search settings.
+"""
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from geolens.services import vector_index
+from geolens.services.vector_index import (
+    IndexReport, apply_search_settings, plan_index, record_report
+)
+
+@pytest.mark.parametrize("rows, lists, probes", [
+    (0, 1, 1),
+    (500, 1, 1),
+    (50_000, 50, 7),
+    (1_000_000, 1000, 31),
+    (4_000_000, 2000, 44),
+])
+def test_ivfflat_plan(rows, lists, probes):
+    """Lists grow with rows / 1000 up to a million rows, then with their square root."""
+    plan = plan_index("architectural_features", rows)
+    assert plan.build_params == {"lists": lists}
+    assert plan.search_settings() == {"ivfflat.probes": probes}
+
+@pytest.mark.parametrize("rows, m, ef_construction, ef_search", [
+    (1_000, 16, 64, 40),
+    (1_000_000, 16, 64, 40),
+    (1_000_001, 24, 128, 100),
+])
+def test_hnsw_plan(rows, m, ef_construction, ef_search):
+    """HNSW graphs get denser past a million rows."""
+    plan = plan_index("historical_events", rows, "hnsw")
+    assert plan.build_params == {"m": m, "ef_construction": ef_construction}
+    assert plan.search_settings() == {"hnsw.ef_search": ef_search}
+
+def test_plan_rejects_unknown_table_and_method():
+    """Only the embedding tables and pgvector's index methods are planned."""
+    with pytest.raises(ValueError):
+        plan_index("locations", 1000)
+    with pytest.raises(ValueError):
+        plan_index("architectural_features", 1000, "btree")
+
+@pytest.mark.asyncio
+async def test_recorded_settings_apply_to_queries(async_engine: AsyncEngine):
+    """Searches run with the probes recorded for the index, not the server default."""
+    plan = replace(plan_index("architectural_features", 0), search_params={"probes": 3})
+    await record_report(async_engine, IndexReport(plan=plan))
+    try:
+        async with AsyncSession(async_engine) as session:
+            await apply_search_settings(session, "architectural_features")
+            probes = text("SELECT current_setting('ivfflat.probes', true)")
+            assert (await session.execute(probes)).scalar_one() == "3"
+            await session.rollback()
+            assert (await session.execute(probes)).scalar_one() != "3"
+    finally:
+        async with async_engine.begin() as conn:
+            await conn.execute(text(
+                f"COMMENT ON INDEX geolens.{plan.index_name} IS NULL"
+            ))
+        vector_index._search_settings.clear()
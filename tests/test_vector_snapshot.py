@@ -0,0 +1,76 @@
+"""
+Tests for in-process vector snapshots.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from geolens.services.vector_snapshot import SnapshotSimilaritySearch, SnapshotWriter, VectorSnapshot
+
+def write_snapshot(directory, vectors_by_id, previous=None):
+    """Helper publishing a snapshot generation without a database."""
+    writer = SnapshotWriter(engine=None, directory=directory, table="architectural_features", batch_size=7)
+    return writer._write_generation(previous, vectors_by_id, 0.0, None, 0)
+
+def test_search_matches_brute_force(tmp_path):
+    """Test that blocked search returns the exact cosine top-k."""
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((100, 16)).astype(np.float32)
+    write_snapshot(tmp_path, {id: vectors[id] for id in range(100)})
+
+    snapshot = VectorSnapshot(tmp_path, "architectural_features")
+    query = rng.standard_normal(16).astype(np.float32)
+    results = snapshot.search(query, k=5, exclude_ids=[0], block_size=8)
+
+    normalised = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalised @ (query / np.linalg.norm(query))
+    scores[0] = -np.inf
+    expected = list(np.argsort(-scores)[:5])
+    assert [id for id, _ in results] == expected
+    assert np.allclose([score for _, score in results], scores[expected], atol=1e-5)
+
+def test_incremental_refresh_merges_changes(tmp_path):
+    """Test that a refresh updates, appends and removes rows."""
+    manifest = write_snapshot(tmp_path, {1: np.array([1, 0], np.float32), 3: np.array([0, 1], np.float32)})
+    write_snapshot(
+        tmp_path,
+        {3: None, 2: np.array([1, 1], np.float32), 1: np.array([0, 2], np.float32)},
+        previous=manifest
+    )
+
+    snapshot = VectorSnapshot(tmp_path, "architectural_features")
+    assert snapshot.reload()
+    assert list(snapshot.ids) == [1, 2]
+    assert np.allclose(snapshot.vector(1), [0, 1])
+    assert snapshot.vector(3) is None
+
+class RecordingService:
+    """Stands in for `DatabaseService`, recording the searches that reach the database."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def find_similar_events(self, event_id, start_date, end_date, similarity_threshold, limit, columns):
+        self.calls.append((event_id, start_date, end_date))
+        return []
+
+@pytest.mark.asyncio
+async def test_similar_events_served_from_snapshot(tmp_path):
+    """Test that event searches use a fresh snapshot unless bounded by date."""
+    writer = SnapshotWriter(engine=None, directory=tmp_path, table="historical_events")
+    writer._write_generation(
+        None,
+        {1: np.array([1, 0], np.float32), 2: np.array([1, 0.1], np.float32), 3: np.array([0, 1], np.float32)},
+        time.time(), None, 0
+    )
+    search = SnapshotSimilaritySearch(tmp_path)
+    service = RecordingService()
+
+    results = await search.find_similar_events(service, 1, similarity_threshold=0.5)
+    assert [id for id, _ in results] == [2]
+    assert service.calls == []
+
+    await search.find_similar_events(service, 1, start_date=datetime(1200, 1, 1))
+    assert service.calls == [(1, datetime(1200, 1, 1), None)]
@@ -0,0 +1,56 @@
+"""
+Tests for the startup warm-up.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from geolens.services import warmup
+
+pytestmark = pytest.mark.asyncio
+
+async def test_warm_up_primes_pool_and_runs_hot_statements(async_engine: AsyncEngine):
+    """Test that the pool is filled, the hot queries run cleanly and the process turns ready."""
+    report = await warmup.warm_up(async_engine, model=False)
+
+    assert report.errors == []
+    assert report.connections == async_engine.pool.size()
+    assert async_engine.pool.checkedin() >= report.connections
+    assert {"find_locations_near", "find_similar_architecture", "hybrid_search"} <= set(report.statements)
+    assert warmup.is_ready()
+
+async def test_prime_pool_opens_at_most_pool_capacity(async_engine: AsyncEngine):
+    """Test that asking for more connections than size + overflow opens only that many."""
+    engine = create_async_engine(async_engine.url, pool_size=2, max_overflow=1)
+    try:
+        assert await warmup.prime_pool(engine, 10) == 3
+        assert engine.pool.checkedin() == 2
+    finally:
+        await engine.dispose()
+
+async def test_warm_up_records_pool_failure():
+    """Test that an unreachable database is reported as an error rather than raised."""
+    engine = create_async_engine("postgresql+asyncpg://geolens@/geolens?host=/nonexistent")
+    try:
+        report = await warmup.warm_up(engine, prewarm=False, statements=False, model=False)
+    finally:
+        await engine.dispose()
+
+    assert report.connections == 0
+    assert len(report.errors) == 1 and report.errors[0].startswith("pool: ")
+    assert warmup.is_ready()
+
+async def test_warm_up_records_model_failure(monkeypatch):
+    """Test that a failing model load is reported and the process still turns ready."""
+    def broken_model():
+        raise OSError("model files missing")
+
+    monkeypatch.setattr(warmup, "warm_up_model", broken_model)
+    monkeypatch.setattr(warmup, "_ready", False)
+    engine = create_async_engine("postgresql+asyncpg://geolens@/geolens?host=/nonexistent")
+    try:
+        report = await warmup.warm_up(engine, prewarm=False, statements=False)
+    finally:
+        await engine.dispose()
+
+    assert "model: model files missing" in report.errors
+    assert warmup.is_ready()